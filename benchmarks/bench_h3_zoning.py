@@ -0,0 +1,95 @@
+"""Benchmark H3 zoning: legacy per-row closure vs the batched engine.
+
+Usage:
+    python benchmarks/bench_h3_zoning.py --rows 1000000 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import h3
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.config import CDMX_BBOX, DEFAULT_H3_RESOLUTION
+from mobility_pulse.transform.geo import add_zone_id
+
+
+def _legacy_add_zone_id(df: pd.DataFrame, res: int) -> pd.DataFrame:
+    """Pre-vectorization implementation, kept as the benchmark baseline."""
+
+    def _to_h3(lat: float, lon: float) -> str | None:
+        if pd.isna(lat) or pd.isna(lon):
+            return None
+        try:
+            if hasattr(h3, "geo_to_h3"):
+                return h3.geo_to_h3(lat, lon, res)
+            return h3.latlng_to_cell(lat, lon, res)
+        except Exception:  # noqa: BLE001
+            return None
+
+    df = df.copy()
+    df["zone_id"] = [
+        _to_h3(lat, lon) for lat, lon in zip(df["lat"], df["lon"], strict=False)
+    ]
+    return df
+
+
+def _sample_frame(rows: int, nan_share: float, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(CDMX_BBOX["min_lat"], CDMX_BBOX["max_lat"], rows)
+    lon = rng.uniform(CDMX_BBOX["min_lon"], CDMX_BBOX["max_lon"], rows)
+    lat[rng.random(rows) < nan_share] = np.nan
+    return pd.DataFrame({"lat": lat, "lon": lon})
+
+
+def _time(label: str, rows: int, func) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f}s {rows / elapsed:14,.0f} rows/s")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--nan_share", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk_size", type=int, default=250_000)
+    args = parser.parse_args()
+
+    res = DEFAULT_H3_RESOLUTION
+    df = _sample_frame(args.rows, args.nan_share)
+    print(f"{args.rows:,} rows, resolution {res}")
+
+    base = _time(
+        "legacy list-comprehension", args.rows, lambda: _legacy_add_zone_id(df, res)
+    )
+    for output in ("str", "category", "uint64"):
+        elapsed = _time(
+            f"batched ({output})",
+            args.rows,
+            lambda output=output: add_zone_id(df, resolution=res, output=output),
+        )
+        print(f"{'':<28} speedup x{base / elapsed:.2f}")
+    if args.workers > 1:
+        elapsed = _time(
+            f"batched uint64, {args.workers} workers",
+            args.rows,
+            lambda: add_zone_id(
+                df,
+                resolution=res,
+                output="uint64",
+                chunk_size=args.chunk_size,
+                workers=args.workers,
+            ),
+        )
+        print(f"{'':<28} speedup x{base / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
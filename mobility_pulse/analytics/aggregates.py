@@ -5,57 +5,185 @@ from __future__ import annotations
 import logging
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
-import h3
 
-from mobility_pulse.config import ANALYTICS_DIR, PROCESSED_DIR
+from mobility_pulse.analytics.anomalies import ALERT_LEVELS, update_alerts
+from mobility_pulse.analytics.cube import kpi_cube, rollup, update_cube
+from mobility_pulse.analytics.od import build_od, od_tables
+from mobility_pulse.analytics.pyramid import zone_pyramid
+from mobility_pulse.analytics.zones import build_zone_geometry, build_zone_metadata
+from mobility_pulse.config import (
+    ANALYTICS_DIR,
+    CDMX_BBOX,
+    DEFAULT_H3_RESOLUTION,
+    H3_PYRAMID_RESOLUTIONS,
+    PROCESSED_DIR,
+)
+from mobility_pulse.context import BuildContext
+from mobility_pulse.storage import remove_path
+from mobility_pulse.transform.geo import (
+    H3_NULL,
+    bbox_ring_limit,
+    cell_centroids,
+    cell_resolutions,
+    edge_length_m,
+    grid_ring_distances,
+    zone_cells,
+)
 
 LOGGER = logging.getLogger(__name__)
 
-
-def _load_optional(path: Path) -> pd.DataFrame | None:
-    if not path.exists():
-        LOGGER.warning("Missing processed file: %s", path)
-        return None
-    return pd.read_parquet(path)
-
-
-def _add_time_parts(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df["hour"] = df["timestamp"].dt.hour
-    df["day_of_week"] = df["timestamp"].dt.day_name()
-    df["month"] = df["timestamp"].dt.to_period("M").astype(str)
-    return df
-
-
-def _count_by(df: pd.DataFrame, by: list[str]) -> pd.DataFrame:
-    return df.groupby(by, dropna=False).size().reset_index(name="count")
+# Processed event datasets with per-dataset count tables.
+EVENT_SOURCES = {
+    "c5": "c5_incidents.parquet",
+    "ecobici_trips": "ecobici_trips.parquet",
+}
+
+# Published per-dataset count tables: ``<dataset>_<table>`` -> roll-up keys.
+COUNT_TABLES: dict[str, tuple[str, ...]] = {
+    "hourly": ("zone_id", "hour"),
+    "dow": ("zone_id", "day_of_week"),
+    "monthly": ("zone_id", "month"),
+    "zones": ("zone_id",),
+    "hourly_total": ("hour",),
+    "dow_total": ("day_of_week",),
+    "zone_daily": ("zone_id", "date"),
+}
+
+# Datasets with seasonal anomaly alerts (``<dataset>_alerts_<level>``).
+ALERT_SOURCES = ("c5",)
+
+# Count tables also published on parent cells as ``<dataset>_<table>_r<res>``.
+ZONE_TABLES = tuple(table for table, by in COUNT_TABLES.items() if "zone_id" in by)
+
+
+def _zone_pyramid_tables(cube: pd.DataFrame) -> dict[int, dict[str, pd.DataFrame]]:
+    """Roll the cube up to each parent resolution, then into the zone tables."""
+    events = cube.drop(columns="partition", errors="ignore")
+    return {
+        res: {table: rollup(coarse, list(COUNT_TABLES[table])) for table in ZONE_TABLES}
+        for res, coarse in zone_pyramid(events)
+    }
 
 
-def build_analytics() -> dict[str, Path]:
-    """Build aggregated analytics tables."""
+def _count_tables(cube: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Roll one event cube up into every count table (published or reused)."""
+    tables = {table: rollup(cube, list(by)) for table, by in COUNT_TABLES.items()}
+    tables["daily_total"] = rollup(cube, ["date"])
+    tables["monthly_total"] = rollup(cube, ["month"])
+    return tables
+
+
+def analytics_outputs() -> tuple[Path, ...]:
+    """Every path ``build_analytics`` may write, whether or not it exists.
+
+    Tables a build has no data for are absent; the build task's fingerprint
+    records them as missing, so deleting any published table triggers a
+    rebuild.
+    """
+    gps_like = ("monthly", "hourly", "dow", "zones", "zone_hour", "risk", "od")
+    names = [
+        *(f"{name}_{table}" for name in EVENT_SOURCES for table in COUNT_TABLES),
+        *(
+            f"{name}_{table}_r{res}"
+            for name in EVENT_SOURCES
+            for table in ZONE_TABLES
+            for res in H3_PYRAMID_RESOLUTIONS
+        ),
+        *(f"{name}_kpi_cube" for name in EVENT_SOURCES),
+        *(f"{name}_alerts_{level}" for name in ALERT_SOURCES for level in ALERT_LEVELS),
+        "c5_daily",
+        "c5_anomalies",
+        "c5_pressure",
+        *(f"gps_like_{table}" for table in gps_like),
+        *(
+            f"gps_like_{table}_r{res}"
+            for table in ("zones", "zone_hour")
+            for res in H3_PYRAMID_RESOLUTIONS
+        ),
+        "zone_metadata",
+        "zone_geometry",
+        "accessibility_zones",
+        "impact_zones",
+        *od_tables(),
+    ]
+    return (
+        ANALYTICS_DIR / "cubes",
+        *(ANALYTICS_DIR / f"{name}.parquet" for name in names),
+    )
+
+
+def build_analytics(
+    full: bool = False, context: BuildContext | None = None
+) -> dict[str, Path]:
+    """Build aggregated analytics tables.
+
+    Event counts come from per-dataset cubes stored under
+    ``ANALYTICS_DIR/cubes``; only processed partitions that are new or changed
+    since the previous build are re-read (see ``cube.update_cube``). All
+    published tables, including non-additive ones (z-scores, anomalies), are
+    then derived from the merged cubes. Zone count tables are also published
+    on parent cells for every ``H3_PYRAMID_RESOLUTIONS`` level. Seasonal
+    anomaly baselines (``anomalies.update_alerts``) only fold the days after
+    their stored watermark. Zone labels and centroids are written to
+    ``zone_metadata.parquet`` (see ``zones.build_zone_metadata``), H3 cell
+    centres and boundaries to ``zone_geometry.parquet``. Each cube is also
+    published as ``<dataset>_kpi_cube.parquet`` (``cube.kpi_cube``).
+
+    Args:
+        full: Recount every partition and refold every day instead of reusing
+            stored cubes and baselines.
+        context: Shared build context; processed datasets are read through it
+            and the updated cubes are left in ``context.cubes``.
+    """
     ANALYTICS_DIR.mkdir(parents=True, exist_ok=True)
-
-    datasets = {
-        "c5": _load_optional(PROCESSED_DIR / "c5_incidents.parquet"),
-        "ecobici_trips": _load_optional(PROCESSED_DIR / "ecobici_trips.parquet"),
-    }
+    context = context or BuildContext(PROCESSED_DIR)
 
     output_paths: dict[str, Path] = {}
+    rollups: dict[str, dict[str, pd.DataFrame]] = {}
+    pyramids: dict[str, dict[int, dict[str, pd.DataFrame]]] = {}
+    for name, filename in EVENT_SOURCES.items():
+        source = PROCESSED_DIR / filename
+        if not source.exists():
+            LOGGER.warning("Missing processed file: %s", source)
+            continue
+        cube = update_cube(source, ANALYTICS_DIR / "cubes", name, full=full)
+        if cube is not None:
+            context.cubes[name] = cube
+            rollups[name] = _count_tables(cube)
+            kpi_path = ANALYTICS_DIR / f"{name}_kpi_cube.parquet"
+            kpi_cube(cube).to_parquet(kpi_path, index=False)
+            output_paths[f"{name}_kpi_cube"] = kpi_path
+            pyramids[name] = _zone_pyramid_tables(cube)
+            if name in ALERT_SOURCES:
+                alerts = update_alerts(cube, ANALYTICS_DIR / "cubes", name, full=full)
+                for level, table in alerts.items():
+                    path = ANALYTICS_DIR / f"{name}_alerts_{level}.parquet"
+                    table.to_parquet(path, index=False)
+                    output_paths[f"{name}_alerts_{level}"] = path
+
+    zone_meta_path = build_zone_metadata(context)
+    if zone_meta_path is not None:
+        output_paths["zone_metadata"] = zone_meta_path
+    zone_geometry_path = build_zone_geometry(context)
+    if zone_geometry_path is not None:
+        output_paths["zone_geometry"] = zone_geometry_path
 
     # Accessibility proxy from GTFS stops (Phase 2 MVP)
-    stops_df = _load_optional(PROCESSED_DIR / "gtfs_stops.parquet")
-    c5_df = _load_optional(PROCESSED_DIR / "c5_incidents.parquet")
+    stops_df = context.frame("gtfs_stops", ["zone_id"])
+    c5_zones = rollups["c5"]["zones"] if "c5" in rollups else None
     if stops_df is not None and "zone_id" in stops_df.columns:
         stops_counts = (
             stops_df.groupby("zone_id", dropna=False).size().reset_index(name="stops")
         )
-        zone_ids = set(stops_counts["zone_id"].dropna().astype(str))
-        if c5_df is not None and "zone_id" in c5_df.columns:
-            zone_ids |= set(c5_df["zone_id"].dropna().astype(str))
-        if zone_ids:
-            zones_df = pd.DataFrame({"zone_id": sorted(zone_ids)})
+        zone_ids = stops_counts["zone_id"].dropna()
+        if c5_zones is not None:
+            zone_ids = pd.concat([zone_ids, c5_zones["zone_id"].dropna()])
+        if not zone_ids.empty:
+            zones_df = pd.DataFrame(
+                {"zone_id": zone_ids.drop_duplicates().sort_values(ignore_index=True)}
+            )
             stops_counts = zones_df.merge(
                 stops_counts, on="zone_id", how="left"
             ).fillna({"stops": 0})
@@ -63,66 +191,36 @@ def build_analytics() -> dict[str, Path]:
             max_stops = stops_counts["stops"].max() or 1
             stops_counts["stops_norm"] = stops_counts["stops"] / max_stops
 
-            stop_zone_set = set(stops_counts.loc[stops_counts["stops"] > 0, "zone_id"])
-
-            def _grid_disk(cell: str, k: int) -> set[str]:
-                if hasattr(h3, "grid_disk"):
-                    return set(h3.grid_disk(cell, k))
-                return set(h3.k_ring(cell, k))
-
-            def _edge_length_m(resolution: int) -> float:
-                if hasattr(h3, "average_hexagon_edge_length"):
-                    return float(h3.average_hexagon_edge_length(resolution, unit="m"))
-                if hasattr(h3, "hexagon_edge_length"):
-                    return float(h3.hexagon_edge_length(resolution, unit="m"))
-                # Fallback to known average edge lengths (meters) by resolution.
-                edge_m = [
-                    1107712.591,
-                    418676.0055,
-                    158244.6558,
-                    59810.85794,
-                    22606.3794,
-                    8544.408276,
-                    3229.482772,
-                    1220.629759,
-                    461.354684,
-                    174.375668,
-                    65.907807,
-                    24.910561,
-                    9.415526,
-                    3.559893,
-                    1.348575,
-                    0.509713,
-                ]
-                if 0 <= resolution < len(edge_m):
-                    return float(edge_m[resolution])
-                return 0.0
-
-            distances = []
-            rings = []
-            max_k = 6
-            for cell in stops_counts["zone_id"]:
-                if cell in stop_zone_set:
-                    rings.append(0)
-                    distances.append(0.0)
-                    continue
-                found_k = None
-                for k in range(1, max_k + 1):
-                    if _grid_disk(cell, k) & stop_zone_set:
-                        found_k = k
-                        break
-                if found_k is None:
-                    found_k = max_k + 1
-                rings.append(found_k)
-                res = (
-                    h3.get_resolution(cell)
-                    if hasattr(h3, "get_resolution")
-                    else h3.h3_get_resolution(cell)
-                )
-                distances.append(found_k * _edge_length_m(int(res)))
+            zone_cell_ids = zone_cells(stops_counts["zone_id"])
+            stop_cells = zone_cell_ids[stops_counts["stops"].to_numpy() > 0]
+
+            # One multi-source BFS from every stop zone labels all rings. Zones
+            # outside the city bbox (bad coordinates) are not searched for, and
+            # the search never runs past the bbox diagonal.
+            lat, lon = cell_centroids(zone_cell_ids)
+            inside = (
+                (lat >= CDMX_BBOX["min_lat"])
+                & (lat <= CDMX_BBOX["max_lat"])
+                & (lon >= CDMX_BBOX["min_lon"])
+                & (lon <= CDMX_BBOX["max_lon"])
+            )
+            resolutions = cell_resolutions(zone_cell_ids, DEFAULT_H3_RESOLUTION)
+            max_k = max(
+                (bbox_ring_limit(CDMX_BBOX, r) for r in np.unique(resolutions)),
+                default=0,
+            )
+            rings = grid_ring_distances(
+                np.where(inside, zone_cell_ids, H3_NULL), stop_cells, max_k
+            )
+            unreached = rings < 0
+            if unreached.any():
+                # Null, out-of-bbox or unreachable cells (or no stops at all):
+                # one ring beyond the farthest.
+                rings[unreached] = int(rings.max(initial=0)) + 1
+            edge_m = np.array([edge_length_m(r) for r in range(16)])
 
-            stops_counts["nearest_stop_ring"] = rings
-            stops_counts["access_distance_m"] = distances
+            stops_counts["nearest_stop_ring"] = rings.astype(np.int64)
+            stops_counts["access_distance_m"] = rings * edge_m[resolutions]
 
             max_dist = stops_counts["access_distance_m"].max() or 1
             stops_counts["distance_norm"] = 1 - (
@@ -150,12 +248,8 @@ def build_analytics() -> dict[str, Path]:
             output_paths["accessibility_zones"] = access_path
 
             # Impact index: high incidents + low access
-            if c5_df is not None and "zone_id" in c5_df.columns:
-                inc_counts = (
-                    c5_df.groupby("zone_id", dropna=False)
-                    .size()
-                    .reset_index(name="incidents")
-                )
+            if c5_zones is not None:
+                inc_counts = c5_zones.rename(columns={"count": "incidents"})
                 impact = stops_counts.merge(
                     inc_counts, on="zone_id", how="left"
                 ).fillna({"incidents": 0})
@@ -169,53 +263,19 @@ def build_analytics() -> dict[str, Path]:
                 impact.to_parquet(impact_path, index=False)
                 output_paths["impact_zones"] = impact_path
 
-    for name, df in datasets.items():
-        if df is None or "timestamp" not in df.columns:
-            continue
-        df = _add_time_parts(df)
-        if "zone_id" not in df.columns:
-            df["zone_id"] = None
-        df["date"] = pd.to_datetime(df["timestamp"], errors="coerce").dt.date
-
-        hourly = _count_by(df, ["zone_id", "hour"])
-        daily = _count_by(df, ["zone_id", "day_of_week"])
-        monthly = _count_by(df, ["zone_id", "month"])
-        zone_counts = _count_by(df, ["zone_id"])
-        hour_total = _count_by(df, ["hour"])
-        dow_total = _count_by(df, ["day_of_week"])
-        zone_daily = _count_by(df, ["zone_id", "date"])
-
-        hourly_path = ANALYTICS_DIR / f"{name}_hourly.parquet"
-        daily_path = ANALYTICS_DIR / f"{name}_dow.parquet"
-        monthly_path = ANALYTICS_DIR / f"{name}_monthly.parquet"
-        zone_path = ANALYTICS_DIR / f"{name}_zones.parquet"
-        hour_total_path = ANALYTICS_DIR / f"{name}_hourly_total.parquet"
-        dow_total_path = ANALYTICS_DIR / f"{name}_dow_total.parquet"
-        zone_daily_path = ANALYTICS_DIR / f"{name}_zone_daily.parquet"
-
-        hourly.to_parquet(hourly_path, index=False)
-        daily.to_parquet(daily_path, index=False)
-        monthly.to_parquet(monthly_path, index=False)
-        zone_counts.to_parquet(zone_path, index=False)
-        hour_total.to_parquet(hour_total_path, index=False)
-        dow_total.to_parquet(dow_total_path, index=False)
-        zone_daily.to_parquet(zone_daily_path, index=False)
-
-        output_paths[f"{name}_hourly"] = hourly_path
-        output_paths[f"{name}_dow"] = daily_path
-        output_paths[f"{name}_monthly"] = monthly_path
-        output_paths[f"{name}_zones"] = zone_path
-        output_paths[f"{name}_hourly_total"] = hour_total_path
-        output_paths[f"{name}_dow_total"] = dow_total_path
-        output_paths[f"{name}_zone_daily"] = zone_daily_path
+    for name, tables in rollups.items():
+        for table in COUNT_TABLES:
+            path = ANALYTICS_DIR / f"{name}_{table}.parquet"
+            tables[table].to_parquet(path, index=False)
+            output_paths[f"{name}_{table}"] = path
+        for res, level in pyramids[name].items():
+            for table, counts in level.items():
+                path = ANALYTICS_DIR / f"{name}_{table}_r{res}.parquet"
+                counts.to_parquet(path, index=False)
+                output_paths[f"{name}_{table}_r{res}"] = path
 
         if name == "c5":
-            daily_counts = (
-                df.assign(date=pd.to_datetime(df["timestamp"], errors="coerce").dt.date)
-                .groupby("date", dropna=False)
-                .size()
-                .reset_index(name="count")
-            )
+            daily_counts = tables["daily_total"]
             if not daily_counts.empty:
                 mean = daily_counts["count"].mean()
                 std = daily_counts["count"].std(ddof=0) or 1
@@ -229,13 +289,12 @@ def build_analytics() -> dict[str, Path]:
                 output_paths["c5_daily"] = daily_path
                 output_paths["c5_anomalies"] = anomalies_path
 
-            stops_df = _load_optional(PROCESSED_DIR / "gtfs_stops.parquet")
             if stops_df is not None and "zone_id" in stops_df.columns:
                 stops_counts = (
                     stops_df.groupby("zone_id", dropna=False).size().rename("stops")
                 )
-                inc_counts = zone_counts.set_index("zone_id")["count"].rename(
-                    "incidents"
+                inc_counts = (
+                    tables["zones"].set_index("zone_id")["count"].rename("incidents")
                 )
                 pressure = pd.concat([inc_counts, stops_counts], axis=1).fillna(0)
                 pressure["incidents_per_stop"] = pressure["incidents"] / (
@@ -249,38 +308,30 @@ def build_analytics() -> dict[str, Path]:
                 pressure.to_parquet(pressure_path, index=False)
                 output_paths["c5_pressure"] = pressure_path
 
-    # GPS-like proxy analytics using C5 incidents (public CDMX data)
-    c5_df = datasets.get("c5")
-    if c5_df is not None and "timestamp" in c5_df.columns:
-        c5_df = _add_time_parts(c5_df)
-        gps_like_monthly = _count_by(c5_df, ["month"])
-        gps_like_hourly = _count_by(c5_df, ["hour"])
-        gps_like_dow = _count_by(c5_df, ["day_of_week"])
-        gps_like_zones = _count_by(c5_df, ["zone_id"])
-        gps_like_zone_hour = _count_by(c5_df, ["zone_id", "hour"])
-
-        gps_like_monthly_path = ANALYTICS_DIR / "gps_like_monthly.parquet"
-        gps_like_hourly_path = ANALYTICS_DIR / "gps_like_hourly.parquet"
-        gps_like_dow_path = ANALYTICS_DIR / "gps_like_dow.parquet"
-        gps_like_zones_path = ANALYTICS_DIR / "gps_like_zones.parquet"
-        gps_like_zone_hour_path = ANALYTICS_DIR / "gps_like_zone_hour.parquet"
+    # GPS-like proxy analytics using C5 incidents (public CDMX data); these
+    # reuse the C5 roll-ups instead of rescanning the incidents.
+    c5_tables = rollups.get("c5")
+    if c5_tables is not None:
+        gps_like_tables = {
+            "monthly": c5_tables["monthly_total"],
+            "hourly": c5_tables["hourly_total"],
+            "dow": c5_tables["dow_total"],
+            "zones": c5_tables["zones"],
+            "zone_hour": c5_tables["hourly"],
+        }
+        for table, counts in gps_like_tables.items():
+            path = ANALYTICS_DIR / f"gps_like_{table}.parquet"
+            counts.to_parquet(path, index=False)
+            output_paths[f"gps_like_{table}"] = path
+        for res, level in pyramids["c5"].items():
+            for table, source in (("zones", "zones"), ("zone_hour", "hourly")):
+                path = ANALYTICS_DIR / f"gps_like_{table}_r{res}.parquet"
+                level[source].to_parquet(path, index=False)
+                output_paths[f"gps_like_{table}_r{res}"] = path
+        gps_like_zones = gps_like_tables["zones"]
         gps_like_risk_path = ANALYTICS_DIR / "gps_like_risk.parquet"
-        gps_like_od_path = ANALYTICS_DIR / "gps_like_od.parquet"
-
-        gps_like_monthly.to_parquet(gps_like_monthly_path, index=False)
-        gps_like_hourly.to_parquet(gps_like_hourly_path, index=False)
-        gps_like_dow.to_parquet(gps_like_dow_path, index=False)
-        gps_like_zones.to_parquet(gps_like_zones_path, index=False)
-        gps_like_zone_hour.to_parquet(gps_like_zone_hour_path, index=False)
-
-        output_paths["gps_like_monthly"] = gps_like_monthly_path
-        output_paths["gps_like_hourly"] = gps_like_hourly_path
-        output_paths["gps_like_dow"] = gps_like_dow_path
-        output_paths["gps_like_zones"] = gps_like_zones_path
-        output_paths["gps_like_zone_hour"] = gps_like_zone_hour_path
 
         # Risk ranking proxy: incidents per stop with z-score
-        stops_df = _load_optional(PROCESSED_DIR / "gtfs_stops.parquet")
         if stops_df is not None and "zone_id" in stops_df.columns:
             stops_counts = (
                 stops_df.groupby("zone_id", dropna=False).size().rename("stops")
@@ -297,18 +348,19 @@ def build_analytics() -> dict[str, Path]:
             risk.to_parquet(gps_like_risk_path, index=False)
             output_paths["gps_like_risk"] = gps_like_risk_path
 
-        # Synthetic OD matrix from top zones (outer product of counts)
-        top = gps_like_zones.sort_values("count", ascending=False).head(12)
-        if not top.empty:
-            top["weight"] = top["count"] / top["count"].sum()
-            od = top.merge(top, how="cross", suffixes=("_o", "_d"))
-            od["flow"] = (
-                (od["weight_o"] * od["weight_d"] * top["count"].sum())
-                .round(0)
-                .astype(int)
-            )
-            od = od[["zone_id_o", "zone_id_d", "flow"]]
-            od.to_parquet(gps_like_od_path, index=False)
-            output_paths["gps_like_od"] = gps_like_od_path
+    # Observed OD flows from ECOBICI trips; ``gps_like_od`` keeps its schema
+    # (zone_id_o, zone_id_d, flow) but now holds the top real flows. Without
+    # trips it is removed so the app does not serve an earlier build's flows.
+    od_paths = build_od(context=context)
+    output_paths.update(od_paths)
+    gps_like_od_path = ANALYTICS_DIR / "gps_like_od.parquet"
+    if "ecobici_od_top" not in od_paths:
+        remove_path(gps_like_od_path)
+    else:
+        top = pd.read_parquet(od_paths["ecobici_od_top"])
+        top.rename(columns={"trips": "flow"})[
+            ["zone_id_o", "zone_id_d", "flow"]
+        ].to_parquet(gps_like_od_path, index=False)
+        output_paths["gps_like_od"] = gps_like_od_path
 
     return output_paths
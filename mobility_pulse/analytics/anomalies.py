@@ -0,0 +1,314 @@
+"""Streaming seasonal anomaly detection on event cubes.
+
+Each alert level keeps a seasonal baseline per zone and weekly slot
+(day-of-week, or day-of-week × hour): an exponentially weighted mean and mean
+absolute deviation of the counts seen in that slot. Days are folded into the
+baseline in order. Every day is scored against the baseline *before* it is
+folded, and observations are clipped to ``mean ± CLIP_Z·scale`` when they
+update it, so a spike raises an alert without inflating the baseline.
+
+Baselines and alerts are persisted next to the event cubes with a day
+watermark that trails the newest day by ``ALERT_REFOLD_DAYS``. A rebuild
+folds only the days after the watermark, so the last ``ALERT_REFOLD_DAYS``
+are re-scored every time and late rows for them are picked up; it never
+rescans older history. Zones are tracked from their first event and only
+alert after ``WARMUP_WEEKS`` observations of a slot.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.transform.geo import H3_NULL, cells_to_zone_array, zone_cells
+
+LOGGER = logging.getLogger(__name__)
+
+# Alert level -> (per zone, per hour). "daily"/"hourly" are city-wide totals.
+ALERT_LEVELS: dict[str, tuple[bool, bool]] = {
+    "daily": (False, False),
+    "hourly": (False, True),
+    "zone_daily": (True, False),
+    "zone_hourly": (True, True),
+}
+
+EWMA_ALPHA = 0.15  # weight of the newest week of a slot (~6 weeks of memory)
+MAD_TO_SIGMA = 1.2533  # mean absolute deviation -> standard deviation (normal)
+CLIP_Z = 3.0
+ALERT_Z = 3.0
+MIN_ALERT_COUNT = 5
+WARMUP_WEEKS = 4
+# Trailing days re-scored on every update, so late rows for them still count.
+ALERT_REFOLD_DAYS = 7
+
+# Bump when the stored baseline layout or scoring changes; stores are rebuilt.
+BASELINE_VERSION = 2
+
+
+@dataclass
+class SeasonalBaseline:
+    """EWMA mean/absolute deviation per zone and weekly slot.
+
+    Attributes:
+        zones: uint64 H3 cells (``H3_NULL`` for the city-wide series).
+        mean: float64 ``(zones, slots)`` expected counts.
+        dev: float64 ``(zones, slots)`` mean absolute deviations.
+        seen: int32 ``(zones, slots)`` observations folded per slot.
+        started: bool per zone, set from the zone's first event on.
+    """
+
+    zones: np.ndarray
+    mean: np.ndarray
+    dev: np.ndarray
+    seen: np.ndarray
+    started: np.ndarray
+
+    @classmethod
+    def empty(cls, slots: int) -> SeasonalBaseline:
+        return cls(
+            np.empty(0, dtype=np.uint64),
+            np.zeros((0, slots)),
+            np.zeros((0, slots)),
+            np.zeros((0, slots), dtype=np.int32),
+            np.zeros(0, dtype=bool),
+        )
+
+    def zone_codes(self, cells: np.ndarray) -> np.ndarray:
+        """Row positions of ``cells``, appending rows for unseen zones."""
+        codes, uniques = pd.factorize(cells)
+        positions = pd.Index(self.zones).get_indexer(uniques)
+        new = positions < 0
+        if new.any():
+            positions[new] = len(self.zones) + np.arange(int(new.sum()))
+            grow = int(new.sum())
+            slots = self.mean.shape[1]
+            self.zones = np.concatenate([self.zones, uniques[new].astype(np.uint64)])
+            self.mean = np.vstack([self.mean, np.zeros((grow, slots))])
+            self.dev = np.vstack([self.dev, np.zeros((grow, slots))])
+            self.seen = np.vstack([self.seen, np.zeros((grow, slots), np.int32)])
+            self.started = np.concatenate([self.started, np.zeros(grow, bool)])
+        return positions[codes]
+
+    def fold(
+        self, cols: slice, counts: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Score ``counts`` for the slots ``cols``, then fold them in.
+
+        Returns:
+            ``(expected, zscore, warm)`` arrays shaped like ``counts``.
+        """
+        self.started |= counts.sum(axis=1) > 0
+        rows = self.started
+        mean = self.mean[:, cols].copy()
+        dev = self.dev[:, cols].copy()
+        # Poisson floor keeps sparse (mostly zero) slots from alerting on noise.
+        scale = np.maximum(MAD_TO_SIGMA * dev, np.sqrt(mean + 1))
+        zscore = (counts - mean) / scale
+        warm = (self.seen[:, cols] >= WARMUP_WEEKS) & rows[:, None]
+
+        # Huber-style update: spikes move the baseline by at most CLIP_Z·scale.
+        clipped = np.where(
+            warm, np.clip(counts, mean - CLIP_Z * scale, mean + CLIP_Z * scale), counts
+        )
+        resid = clipped - mean
+        self.mean[rows, cols] = (mean + EWMA_ALPHA * resid)[rows]
+        self.dev[rows, cols] = (dev + EWMA_ALPHA * (np.abs(resid) - dev))[rows]
+        self.seen[rows, cols] += 1
+        return mean, zscore, warm
+
+
+def _daily_events(cube: pd.DataFrame, by_zone: bool, hourly: bool) -> pd.DataFrame:
+    """Cube counts per (zone, date[, hour]); the city series uses ``H3_NULL``."""
+    cube = cube[cube["date"].notna()]
+    cells = zone_cells(cube["zone_id"]) if by_zone else np.zeros(len(cube), np.uint64)
+    events = pd.DataFrame(
+        {
+            "zone": cells,
+            "date": pd.to_datetime(cube["date"]).to_numpy(),
+            "hour": cube["hour"].to_numpy(dtype=np.int64, na_value=0) if hourly else 0,
+            "count": cube["count"].to_numpy(),
+        }
+    )
+    if by_zone:
+        events = events[events["zone"] != H3_NULL]
+    return (
+        events.groupby(["date", "zone", "hour"], sort=True)["count"].sum().reset_index()
+    )
+
+
+def _fold_days(
+    baseline: SeasonalBaseline,
+    events: pd.DataFrame,
+    first_day: pd.Timestamp,
+    last_day: pd.Timestamp,
+    columns: list[str],
+) -> list[pd.DataFrame]:
+    """Fold every calendar day in ``[first_day, last_day]`` and collect alerts."""
+    per_day = 24 if "hour" in columns else 1
+    events = events[events["date"] >= first_day]
+    codes = baseline.zone_codes(events["zone"].to_numpy(dtype=np.uint64))
+    day_index = (events["date"] - first_day).dt.days.to_numpy()
+    flat = codes * per_day + events["hour"].to_numpy()
+    weights = events["count"].to_numpy(dtype=np.float64)
+    bounds = np.searchsorted(day_index, np.arange((last_day - first_day).days + 2))
+
+    alerts = []
+    for offset in range(len(bounds) - 1):
+        lo, hi = bounds[offset], bounds[offset + 1]
+        day = first_day + pd.Timedelta(days=offset)
+        counts = np.bincount(
+            flat[lo:hi], weights=weights[lo:hi], minlength=len(baseline.zones) * per_day
+        ).reshape(-1, per_day)
+        start = day.dayofweek * per_day
+        expected, zscore, warm = baseline.fold(slice(start, start + per_day), counts)
+        hit = warm & (zscore >= ALERT_Z) & (counts >= MIN_ALERT_COUNT)
+        if not hit.any():
+            continue
+        rows, hours = np.nonzero(hit)
+        alerts.append(
+            pd.DataFrame(
+                {
+                    "zone_id": cells_to_zone_array(baseline.zones[rows]),
+                    "date": day,
+                    "hour": hours.astype(np.int8),
+                    "count": counts[rows, hours].astype(np.int64),
+                    "expected": expected[rows, hours].round(2),
+                    "zscore": zscore[rows, hours].round(2),
+                }
+            )[columns]
+        )
+    return alerts
+
+
+_ALERT_DTYPES = {
+    "zone_id": "UInt64",
+    "date": "datetime64[ns]",
+    "hour": "int8",
+    "count": "int64",
+    "expected": "float64",
+    "zscore": "float64",
+}
+
+
+def _alert_columns(by_zone: bool, hourly: bool) -> list[str]:
+    return [
+        c
+        for c in _ALERT_DTYPES
+        if (c != "zone_id" or by_zone) and (c != "hour" or hourly)
+    ]
+
+
+def _load_state(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        LOGGER.warning("Ignoring unreadable baseline state %s: %s", path, exc)
+        return {}
+    return state if state.get("version") == BASELINE_VERSION else {}
+
+
+def _load_baseline(path: Path, slots: int) -> SeasonalBaseline | None:
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        baseline = SeasonalBaseline(**{k: data[k] for k in data.files})
+    return baseline if baseline.mean.shape[1] == slots else None
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("wb") as handle:
+        write(handle)
+    os.replace(tmp, path)
+
+
+def update_alerts(
+    cube: pd.DataFrame, store_dir: Path, name: str, full: bool = False
+) -> dict[str, pd.DataFrame]:
+    """Fold the days of ``cube`` newer than the stored watermark into baselines.
+
+    The stored baselines stop ``ALERT_REFOLD_DAYS`` before the newest day, so
+    each update re-scores that trailing window from the cube and replaces its
+    alerts. Late rows for older days are only counted after a ``full``
+    rebuild.
+
+    Args:
+        cube: Event cube (``zone_id``, ``date``, ``hour``, ``count``).
+        store_dir: Directory for ``<name>_<level>_baseline.npz``,
+            ``<name>_alerts_<level>.parquet`` and ``<name>_alerts.json``.
+        name: Dataset name used for the stored files.
+        full: Discard stored baselines and fold the whole history.
+
+    Returns:
+        Alert tables per level (``zone_id``, ``date``, ``hour``, ``count``,
+        ``expected``, ``zscore``) covering the whole history.
+    """
+    state_path = store_dir / f"{name}_alerts.json"
+    state = {} if full else _load_state(state_path)
+    dates = pd.to_datetime(cube["date"]).dropna()
+    if dates.empty:
+        return {}
+    last_day = dates.max()
+    watermark = pd.Timestamp(state["watermark"]) if state.get("watermark") else None
+    # New watermark: trail the newest day, but never move back.
+    checkpoint = last_day - pd.Timedelta(days=ALERT_REFOLD_DAYS)
+    if watermark is not None:
+        checkpoint = max(checkpoint, watermark)
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    tables = {}
+    for level, (by_zone, hourly) in ALERT_LEVELS.items():
+        slots = 7 * (24 if hourly else 1)
+        baseline_path = store_dir / f"{name}_{level}_baseline.npz"
+        alerts_path = store_dir / f"{name}_alerts_{level}.parquet"
+        baseline = None if watermark is None else _load_baseline(baseline_path, slots)
+        previous = []
+        if baseline is None:
+            baseline = SeasonalBaseline.empty(slots)
+            first = dates.min()
+        else:
+            first = watermark + pd.Timedelta(days=1)
+            if alerts_path.exists():
+                stored = pd.read_parquet(alerts_path)
+                previous = [stored[stored["date"] <= watermark]]
+
+        columns = _alert_columns(by_zone, hourly)
+        alerts = previous
+        if first <= last_day:
+            events = _daily_events(cube, by_zone, hourly)
+            alerts += _fold_days(baseline, events, first, checkpoint, columns)
+            _write_atomic(
+                baseline_path,
+                lambda handle, b=baseline: np.savez(handle, **vars(b)),
+            )
+            # The trailing window is scored on top of the saved checkpoint.
+            day = max(first, checkpoint + pd.Timedelta(days=1))
+            alerts += _fold_days(baseline, events, day, last_day, columns)
+        folded = max((last_day - first).days + 1, 0)
+        table = (
+            pd.concat(alerts, ignore_index=True)
+            if alerts
+            else pd.DataFrame({c: pd.Series(dtype=_ALERT_DTYPES[c]) for c in columns})
+        )
+        table = table.sort_values(
+            ["date", "zscore"], ascending=[True, False], ignore_index=True
+        )
+        _write_atomic(
+            alerts_path, lambda handle, t=table: t.to_parquet(handle, index=False)
+        )
+        tables[level] = table
+        LOGGER.info("%s %s: scored %s days, %s alerts", name, level, folded, len(table))
+
+    state = {"version": BASELINE_VERSION, "watermark": checkpoint.date().isoformat()}
+    payload = json.dumps(state, indent=2, sort_keys=True).encode("utf-8")
+    _write_atomic(state_path, lambda handle: handle.write(payload))
+    return tables
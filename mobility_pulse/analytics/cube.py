@@ -0,0 +1,265 @@
+"""Single-pass count cube behind the published analytics tables.
+
+Every dashboard table is a count of events by some subset of zone and time
+grain (zone×hour, zone×day-of-week, month, ...). Instead of one ``groupby``
+scan of the full event frame per table, ``build_cube`` encodes each event as
+one integer key (zone code × hour bucket since the first event) and counts
+the distinct keys in a single pass. Every table is then a ``rollup`` of the
+cube, so its cost scales with the number of distinct (zone, hour) keys rather
+than with the number of events.
+
+Cubes are additive, so ``update_cube`` persists one per processed dataset
+(tagged by top-level partition, e.g. ``month=2024-05``) together with a
+fingerprint per partition. A rebuild only re-reads partitions that are new or
+whose files changed, replaces their cube rows and keeps the rest.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+LOGGER = logging.getLogger(__name__)
+
+# Grain of the cube; every published table is a roll-up of these keys.
+CUBE_KEYS = ("zone_id", "date", "hour")
+
+# Calendar attributes derived per distinct cube row.
+DERIVED_KEYS = ("day_of_week", "month")
+
+EVENT_COLUMNS = ["timestamp", "zone_id"]
+
+# Grain of the published KPI cube (``weekday``: Monday = 0).
+KPI_KEYS = ("date", "hour", "weekday", "zone_id")
+
+# Bump when the stored cube layout changes; older stores are rebuilt.
+CUBE_VERSION = 1
+
+
+def _hour_buckets(timestamps: pd.Series) -> np.ndarray:
+    """Hours since the epoch as int64 (local wall time; NaT -> min int64)."""
+    ts = pd.to_datetime(timestamps, errors="coerce")
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_localize(None)
+    return ts.to_numpy(dtype="datetime64[ns]").astype("datetime64[h]").view(np.int64)
+
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Count events per (zone_id, date, hour) in one pass.
+
+    Args:
+        df: Events with a ``timestamp`` column and an optional ``zone_id``.
+
+    Returns:
+        One row per distinct key with ``zone_id`` (missing zones kept as NA),
+        ``date`` (midnight timestamps, NaT for unparseable times), ``hour``
+        (nullable Int8), ``day_of_week``, ``month`` and ``count``.
+    """
+    n = len(df)
+    if "zone_id" in df.columns:
+        zone_codes, zones = pd.factorize(df["zone_id"])
+    else:
+        zone_codes, zones = np.full(n, -1, dtype=np.intp), pd.Index([], dtype="UInt64")
+
+    hours = _hour_buckets(df["timestamp"])
+    valid = hours != np.iinfo(np.int64).min
+    first = int(hours[valid].min()) if valid.any() else 0
+    span = int(hours[valid].max()) - first + 2 if valid.any() else 1
+    # 0 = NaT, 1.. = hour buckets; zone code 0 = missing zone.
+    hour_codes = np.where(valid, hours - first + 1, 0)
+    keys = (zone_codes.astype(np.int64) + 1) * span + hour_codes
+
+    key_codes, unique_keys = pd.factorize(keys)
+    counts = np.bincount(key_codes, minlength=len(unique_keys))
+
+    zone_part = unique_keys // span - 1
+    hour_part = unique_keys % span
+    stamps = pd.Series(
+        np.where(hour_part > 0, hour_part + first - 1, np.iinfo(np.int64).min)
+        .view("datetime64[h]")
+        .astype("datetime64[ns]")
+    )
+    cube = pd.DataFrame(
+        {
+            "zone_id": pd.array(zones).take(zone_part, allow_fill=True),
+            "date": stamps.dt.normalize(),
+            "hour": stamps.dt.hour.astype("Int8"),
+            "count": counts.astype(np.int64),
+        }
+    )
+    cube["day_of_week"] = cube["date"].dt.day_name()
+    cube["month"] = cube["date"].dt.strftime("%Y-%m")
+    return cube
+
+
+def rollup(cube: pd.DataFrame, by: list[str]) -> pd.DataFrame:
+    """Sum cube counts by ``by`` (missing keys form their own group).
+
+    ``month`` comes back as a nullable string column on every supported
+    pandas version (missing months are ``<NA>``, not NaN or ``"NaT"``).
+    """
+    out = cube.groupby(by, dropna=False, sort=True)["count"].sum().reset_index()
+    if "date" in by:
+        out["date"] = out["date"].dt.date
+    if "month" in by:
+        out["month"] = out["month"].astype("string")
+    return out
+
+
+def kpi_cube(cube: pd.DataFrame) -> pd.DataFrame:
+    """Counts by date × hour × weekday × zone for the dashboard KPI cards.
+
+    Partitions are merged and rows without a valid timestamp dropped, so any
+    "count in range" or "peak hour/day" question is a masked sum over this
+    table. ``hour`` and ``weekday`` are int8; missing zones stay as NA.
+    """
+    valid = cube[cube["date"].notna()]
+    out = (
+        valid.groupby(["date", "hour", "zone_id"], dropna=False, sort=True)["count"]
+        .sum()
+        .reset_index()
+    )
+    out["hour"] = out["hour"].astype(np.int8)
+    out["weekday"] = out["date"].dt.dayofweek.astype(np.int8)
+    return out[[*KPI_KEYS, "count"]]
+
+
+def dataset_partitions(path: Path) -> dict[str, list[Path]]:
+    """Group the parquet files of a file or hive dataset by top-level partition.
+
+    A single file is one partition (``""``); files directly under a dataset
+    root share the ``""`` partition. Hidden/staging entries are ignored.
+    """
+    if path.is_file():
+        return {"": [path]}
+    partitions: dict[str, list[Path]] = {}
+    for file in sorted(path.rglob("*.parquet")):
+        rel = file.relative_to(path)
+        if not file.is_file() or any(p.startswith((".", "_")) for p in rel.parts):
+            continue
+        key = rel.parts[0] if len(rel.parts) > 1 else ""
+        partitions.setdefault(key, []).append(file)
+    return partitions
+
+
+def _footer(file: Path) -> bytes:
+    """Raw parquet footer (schema, row groups, column chunk statistics)."""
+    with file.open("rb") as handle:
+        handle.seek(-8, os.SEEK_END)
+        length = int.from_bytes(handle.read(4), "little")
+        handle.seek(-8 - length, os.SEEK_END)
+        return handle.read(length)
+
+
+def _fingerprint(files: list[Path], root: Path) -> str:
+    """Content fingerprint from file names, sizes and parquet footers.
+
+    The footer carries row counts, chunk offsets and per-column min/max/null
+    statistics, so rewriting a partition with corrected values changes it
+    even when the file size and row count stay the same. Modification times
+    are left out on purpose: atomic rewrites of unchanged partitions must not
+    invalidate them.
+    """
+    digest = hashlib.sha256()
+    for file in files:
+        rel = file.relative_to(root.parent).as_posix()
+        digest.update(f"{rel}:{file.stat().st_size}:".encode())
+        digest.update(hashlib.sha256(_footer(file)).digest())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _read_events(files: list[Path], columns: list[str]) -> pd.DataFrame:
+    dataset = ds.dataset([str(f) for f in files], format="parquet")
+    present = [c for c in columns if c in dataset.schema.names]
+    return dataset.to_table(columns=present).to_pandas()
+
+
+def _load_state(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        LOGGER.warning("Ignoring unreadable cube state %s: %s", path, exc)
+        return {}
+    return state if state.get("version") == CUBE_VERSION else {}
+
+
+def update_cube(
+    source: Path,
+    store_dir: Path,
+    name: str,
+    full: bool = False,
+    columns: list[str] | None = None,
+) -> pd.DataFrame | None:
+    """Bring the stored cube of ``source`` up to date and return it.
+
+    Args:
+        source: Processed parquet file or hive-partitioned dataset directory.
+        store_dir: Directory holding ``<name>.parquet`` cubes and their
+            ``<name>.json`` state (partition fingerprints).
+        name: Dataset name used for the stored files.
+        full: Ignore the stored cube and recount every partition.
+        columns: Event columns to read (default ``EVENT_COLUMNS``).
+
+    Returns:
+        The merged cube with a ``partition`` column, or None when ``source``
+        is missing or has no ``timestamp`` column.
+    """
+    cube_path = store_dir / f"{name}.parquet"
+    state_path = store_dir / f"{name}.json"
+    if not source.exists():
+        return None
+    schema = ds.dataset(source, format="parquet", partitioning="hive").schema
+    if "timestamp" not in schema.names:
+        return None
+
+    partitions = dataset_partitions(source)
+    if not partitions:
+        return None
+    fingerprints = {k: _fingerprint(v, source) for k, v in partitions.items()}
+    state = {} if full else _load_state(state_path)
+    stored = state.get("partitions", {})
+    cube = pd.read_parquet(cube_path) if stored and cube_path.exists() else None
+    if cube is None:
+        stored = {}
+    stale = [k for k, fp in fingerprints.items() if stored.get(k) != fp]
+    if cube is not None and not stale and set(stored) == set(fingerprints):
+        LOGGER.info("%s: cube up to date (%s partitions)", name, len(fingerprints))
+        return cube
+
+    fresh = []
+    for key in stale:
+        part = build_cube(_read_events(partitions[key], columns or EVENT_COLUMNS))
+        part["partition"] = key
+        fresh.append(part)
+    if cube is not None:
+        keep = cube["partition"].isin(set(fingerprints) - set(stale))
+        fresh.insert(0, cube[keep])
+    cube = pd.concat(fresh, ignore_index=True)
+    LOGGER.info(
+        "%s: recounted %s of %s partitions (%s cube rows)",
+        name,
+        len(stale),
+        len(fingerprints),
+        f"{len(cube):,}",
+    )
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cube_path.with_name(f".{cube_path.name}.tmp")
+    cube.to_parquet(tmp, index=False)
+    os.replace(tmp, cube_path)
+    state = {"version": CUBE_VERSION, "partitions": fingerprints}
+    tmp = state_path.with_name(f".{state_path.name}.tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, state_path)
+    return cube
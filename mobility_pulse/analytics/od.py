@@ -0,0 +1,176 @@
+"""Observed origin-destination flows from ECOBICI trips.
+
+Trips are counted into a sparse zone×zone×hour matrix: origin and
+destination cells share one integer code space, each trip becomes a single
+int64 key and distinct keys are counted in one pass. Only observed pairs are
+stored (COO rows sorted by origin), so dashboards filter and aggregate flows
+without ever materializing a dense zone cross join. The matrix can be
+coarsened to parent H3 resolutions and reduced to the top-k destinations of
+each origin.
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.analytics.pyramid import coarsen_zones, zone_pyramid
+from mobility_pulse.config import ANALYTICS_DIR, H3_PYRAMID_RESOLUTIONS, PROCESSED_DIR
+from mobility_pulse.context import BuildContext
+from mobility_pulse.storage import remove_path
+from mobility_pulse.transform.geo import H3_NULL, zone_cells
+
+LOGGER = logging.getLogger(__name__)
+
+OD_COLUMNS = ["zone_id_o", "zone_id_d", "hour", "trips"]
+OD_PARENT_RESOLUTIONS = H3_PYRAMID_RESOLUTIONS
+OD_TOP_K = 10
+
+_NO_HOUR = 24
+_OD_ZONES = ("zone_id_o", "zone_id_d")
+
+
+def od_counts(
+    origins: np.ndarray | pd.Series,
+    destinations: np.ndarray | pd.Series,
+    hours: np.ndarray | pd.Series | None = None,
+) -> pd.DataFrame:
+    """Count trips per (origin, destination, hour) with integer-encoded keys.
+
+    Args:
+        origins: Origin zone cells (uint64 or nullable UInt64).
+        destinations: Destination zone cells aligned with ``origins``.
+        hours: Departure hour 0-23 (NA/None = unknown hour).
+
+    Returns:
+        Sparse OD rows (``OD_COLUMNS``); trips without both zones are dropped.
+    """
+    o = zone_cells(pd.Series(origins))
+    d = zone_cells(pd.Series(destinations))
+    if hours is None:
+        h = np.full(len(o), _NO_HOUR, dtype=np.int64)
+    else:
+        h = (
+            pd.Series(hours)
+            .astype("Float64")
+            .fillna(_NO_HOUR)
+            .to_numpy(dtype=np.int64, na_value=_NO_HOUR)
+        )
+    valid = (o != H3_NULL) & (d != H3_NULL)
+    if not valid.all():
+        LOGGER.info("OD: skipping %s trips without both zones", int((~valid).sum()))
+    o, d, h = o[valid], d[valid], h[valid]
+
+    codes, cells = pd.factorize(np.concatenate([o, d]))
+    n_cells = max(len(cells), 1)
+    keys = (codes[: len(o)].astype(np.int64) * n_cells + codes[len(o) :]) * (
+        _NO_HOUR + 1
+    ) + h
+    key_codes, unique_keys = pd.factorize(keys)
+    counts = np.bincount(key_codes, minlength=len(unique_keys))
+
+    pair, hour = np.divmod(unique_keys, _NO_HOUR + 1)
+    o_code, d_code = np.divmod(pair, n_cells)
+    cells = np.asarray(cells, dtype=np.uint64)
+    od = pd.DataFrame(
+        {
+            "zone_id_o": pd.array(cells[o_code], dtype="UInt64"),
+            "zone_id_d": pd.array(cells[d_code], dtype="UInt64"),
+            "hour": pd.array(np.where(hour == _NO_HOUR, -1, hour), dtype="Int8"),
+            "trips": counts.astype(np.int64),
+        }
+    )
+    od.loc[od["hour"] == -1, "hour"] = pd.NA
+    return _sorted(od)
+
+
+def _sorted(od: pd.DataFrame) -> pd.DataFrame:
+    return od.sort_values(["zone_id_o", "zone_id_d", "hour"], ignore_index=True)
+
+
+def coarsen_od(od: pd.DataFrame, resolution: int) -> pd.DataFrame:
+    """Re-aggregate an OD matrix on parent cells at ``resolution``."""
+    return _sorted(coarsen_zones(od, resolution, ("trips",), _OD_ZONES))
+
+
+def top_k_flows(od: pd.DataFrame, k: int = OD_TOP_K) -> pd.DataFrame:
+    """The ``k`` largest destinations of each origin, summed over hours."""
+    flows = od.groupby(["zone_id_o", "zone_id_d"])["trips"].sum().reset_index()
+    flows = flows.sort_values(
+        ["zone_id_o", "trips", "zone_id_d"], ascending=[True, False, True]
+    )
+    flows["rank"] = flows.groupby("zone_id_o").cumcount() + 1
+    return flows[flows["rank"] <= k].reset_index(drop=True)
+
+
+def od_tables(
+    parent_resolutions: tuple[int, ...] = OD_PARENT_RESOLUTIONS,
+) -> tuple[str, ...]:
+    """Names of the tables ``build_od`` writes."""
+    return (
+        "ecobici_od",
+        "ecobici_od_top",
+        *(f"ecobici_od_r{res}" for res in parent_resolutions),
+    )
+
+
+def build_od(
+    parent_resolutions: tuple[int, ...] = OD_PARENT_RESOLUTIONS,
+    k: int = OD_TOP_K,
+    context: BuildContext | None = None,
+) -> dict[str, Path]:
+    """Write ECOBICI OD tables from ``ecobici_trips.parquet``.
+
+    Outputs (under ``ANALYTICS_DIR``):
+
+    - ``ecobici_od.parquet``: trips per origin/destination zone and hour.
+    - ``ecobici_od_r<res>.parquet``: the same on parent cells per resolution.
+    - ``ecobici_od_top.parquet``: top ``k`` destinations per origin.
+
+    Args:
+        parent_resolutions: Parent H3 resolutions to publish.
+        k: Destinations kept per origin in the top-flows table.
+        context: Shared build context (trips are read through it).
+
+    Returns:
+        Mapping of output name to path (empty without trip zones, in which
+        case tables from earlier builds are removed).
+    """
+    context = context or BuildContext(PROCESSED_DIR)
+    stale = [
+        ANALYTICS_DIR / f"{name}.parquet" for name in od_tables(parent_resolutions)
+    ]
+    names = context.columns("ecobici_trips")
+    if "zone_id" not in names or "zone_id_end" not in names:
+        if names:
+            LOGGER.warning("ECOBICI trips have no start/end zones; skipping OD")
+        for path in stale:
+            remove_path(path)
+        return {}
+    trips = context.frame("ecobici_trips", ["timestamp", "zone_id", "zone_id_end"])
+    hours = (
+        pd.to_datetime(trips["timestamp"], errors="coerce").dt.hour
+        if "timestamp" in trips.columns
+        else None
+    )
+    od = od_counts(trips["zone_id"], trips["zone_id_end"], hours)
+    if od.empty:
+        for path in stale:
+            remove_path(path)
+        return {}
+
+    tables = {"ecobici_od": od, "ecobici_od_top": top_k_flows(od, k)}
+    for res, coarse in zone_pyramid(od, parent_resolutions, ("trips",), _OD_ZONES):
+        tables[f"ecobici_od_r{res}"] = _sorted(coarse)
+    outputs = {}
+    for name, table in tables.items():
+        out = ANALYTICS_DIR / f"{name}.parquet"
+        table.to_parquet(out, index=False)
+        outputs[name] = out
+    LOGGER.info(
+        "OD: %s trips in %s zone pairs", f"{od['trips'].sum():,}", f"{len(od):,}"
+    )
+    return outputs
@@ -1,105 +1,276 @@
-"""Priority/Policy Readiness Index (PPI) calculations."""
+"""Priority/Policy Readiness Index (PPI) calculations.
+
+Scores are computed for every (zone, time window, weight set) combination at
+once: component counts form a ``(windows, zones, components)`` array that is
+standardized across zones per window and contracted with the
+``(weight_sets, components)`` weight matrix from ``config/ppi.yml``. Event
+counts come from the stored analytics cubes instead of the processed files,
+and every ``H3_PYRAMID_RESOLUTIONS`` level is scored from summed counts.
+"""
 
 from __future__ import annotations
 
 import logging
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from mobility_pulse.config import ANALYTICS_DIR, PROCESSED_DIR
+from mobility_pulse.analytics.cube import update_cube
+from mobility_pulse.config import (
+    ANALYTICS_DIR,
+    DEFAULT_H3_RESOLUTION,
+    H3_PYRAMID_RESOLUTIONS,
+    PROCESSED_DIR,
+    ConfigError,
+    PPIConfig,
+    load_ppi_config,
+)
+from mobility_pulse.context import BuildContext
+from mobility_pulse.storage import DatasetWriter
+from mobility_pulse.transform.geo import (
+    H3_NULL,
+    cells_to_parent,
+    cells_to_zone_array,
+    zone_cells,
+)
 
 LOGGER = logging.getLogger(__name__)
 
+PPI_COMPONENTS = ("incidents", "gtfs_stops", "ecobici_trips")
 
-def _load_optional(path: Path) -> pd.DataFrame | None:
-    if not path.exists():
-        LOGGER.warning("Missing processed file: %s", path)
-        return None
-    return pd.read_parquet(path)
+# Event components: cube name and processed dataset.
+_EVENT_COMPONENTS = {
+    "incidents": ("c5", "c5_incidents"),
+    "ecobici_trips": ("ecobici_trips", "ecobici_trips"),
+}
+# Fallback order of the legacy ``exposure`` column in ppi_zones.parquet.
+_EXPOSURE_COMPONENTS = ("gtfs_stops", "ecobici_trips")
+
+
+def weight_matrix(config: PPIConfig) -> np.ndarray:
+    """``(weight_sets, components)`` weights; unknown components are errors."""
+    weights = np.zeros((len(config.weight_sets), len(PPI_COMPONENTS)))
+    for row, (name, components) in enumerate(config.weight_sets.items()):
+        for component, weight in components.items():
+            if component not in PPI_COMPONENTS:
+                raise ConfigError(
+                    f"Unknown PPI component '{component}' in weight set '{name}'"
+                )
+            weights[row, PPI_COMPONENTS.index(component)] = weight
+    return weights
+
+
+def score_ppi(counts: np.ndarray, weights: np.ndarray) -> tuple[np.ndarray, ...]:
+    """Standardize counts across zones and apply every weight set.
+
+    Args:
+        counts: ``(windows, zones, components)`` counts.
+        weights: ``(weight_sets, components)`` weights.
+
+    Returns:
+        ``(zscores, ppi)`` shaped ``(windows, zones, components)`` and
+        ``(windows, weight_sets, zones)``. Constant components score 0.
+    """
+    mean = counts.mean(axis=1, keepdims=True)
+    std = counts.std(axis=1, keepdims=True)
+    zscores = np.divide(
+        counts - mean, std, out=np.zeros_like(counts, dtype=float), where=std > 0
+    )
+    return zscores, np.einsum("wzk,sk->wsz", zscores, weights)
+
+
+def _event_counts(
+    windows: dict[str, int | None], context: BuildContext
+) -> tuple[dict[str, tuple[np.ndarray, np.ndarray]], pd.Timestamp | None]:
+    """Per component: zone cells and per-window counts ``(windows, rows)``."""
+    cubes = {}
+    for component, (name, dataset) in _EVENT_COMPONENTS.items():
+        cube = context.cubes.get(name)
+        if cube is None and context.exists(dataset):
+            cube = update_cube(context.path(dataset), ANALYTICS_DIR / "cubes", name)
+        if cube is not None and "zone_id" in cube.columns:
+            cubes[component] = cube
+    dates = [c["date"].max() for c in cubes.values() if c["date"].notna().any()]
+    anchor = max(dates) if dates else None
+
+    counts = {}
+    for component, cube in cubes.items():
+        cells = zone_cells(cube["zone_id"])
+        values = cube["count"].to_numpy(dtype=float)
+        per_window = np.empty((len(windows), len(cube)))
+        for row, days in enumerate(windows.values()):
+            if days is None or anchor is None:
+                per_window[row] = values
+            else:
+                since = anchor - pd.Timedelta(days=days - 1)
+                per_window[row] = np.where(cube["date"] >= since, values, 0.0)
+        counts[component] = (cells, per_window)
+    return counts, anchor
+
+
+def _component_counts(
+    windows: dict[str, int | None], context: BuildContext
+) -> tuple[np.ndarray, np.ndarray]:
+    """Zone cells and ``(windows, zones, components)`` counts of all sources."""
+    sources, anchor = _event_counts(windows, context)
+    stops = context.frame("gtfs_stops", ["zone_id"])
+    if stops is not None and "zone_id" in stops.columns:
+        cells = zone_cells(stops["zone_id"])
+        sources["gtfs_stops"] = (cells, np.ones((len(windows), len(cells))))
+    if anchor is not None:
+        LOGGER.info("PPI windows end on %s", anchor.date())
+
+    all_cells = np.concatenate([cells for cells, _ in sources.values()] or [[]])
+    zones = np.unique(all_cells[all_cells != H3_NULL]).astype(np.uint64)
+    counts = np.zeros((len(windows), len(zones), len(PPI_COMPONENTS)))
+    for component, (cells, per_window) in sources.items():
+        codes = pd.Index(zones).get_indexer(cells)
+        known = codes >= 0
+        k = PPI_COMPONENTS.index(component)
+        for row in range(len(windows)):
+            counts[row, :, k] = np.bincount(
+                codes[known], weights=per_window[row, known], minlength=len(zones)
+            )
+    return zones, counts
+
+
+def _coarsen_counts(
+    zones: np.ndarray, counts: np.ndarray, resolution: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sum ``(windows, zones, components)`` counts on parent cells."""
+    codes, parents = pd.factorize(cells_to_parent(zones, resolution))
+    coarse = np.zeros((counts.shape[0], len(parents), counts.shape[2]))
+    np.add.at(coarse, (slice(None), codes), counts)
+    return np.asarray(parents, dtype=np.uint64), coarse
 
 
-def _zscore(series: pd.Series) -> pd.Series:
-    mean = series.mean()
-    std = series.std(ddof=0)
-    if std == 0 or pd.isna(std):
-        return pd.Series([0.0] * len(series), index=series.index)
-    return (series - mean) / std
+def _score_frame(
+    zones: np.ndarray,
+    counts: np.ndarray,
+    config: PPIConfig,
+    weights: np.ndarray,
+    resolution: int,
+) -> pd.DataFrame:
+    """Long table of every (window, weight set, zone) score."""
+    zscores, ppi = score_ppi(counts, weights)
+    n_windows, n_sets, n_zones = ppi.shape
+    shape = (n_windows, n_sets, n_zones, len(PPI_COMPONENTS))
+    wide_counts = np.broadcast_to(counts[:, None], shape).reshape(-1, shape[-1])
+    wide_z = np.broadcast_to(zscores[:, None], shape).reshape(-1, shape[-1])
+    frame = pd.DataFrame(
+        {"zone_id": cells_to_zone_array(np.tile(zones, n_windows * n_sets))}
+    )
+    for k, component in enumerate(PPI_COMPONENTS):
+        frame[component] = wide_counts[:, k].astype(np.int64)
+        frame[f"{component}_z"] = wide_z[:, k]
+    frame["ppi"] = ppi.ravel()
+    rank = np.argsort(np.argsort(-ppi, axis=-1, kind="stable"), axis=-1) + 1
+    frame["rank"] = rank.ravel().astype(np.int32)
+    frame["resolution"] = np.int8(resolution)
+    frame["window"] = np.repeat(list(config.windows), n_sets * n_zones)
+    frame["weight_set"] = np.tile(
+        np.repeat(list(config.weight_sets), n_zones), n_windows
+    )
+    return frame
 
 
-def build_ppi() -> Path | None:
+def _with_exposure(frame: pd.DataFrame, weight_set: dict[str, float]) -> pd.DataFrame:
+    """Add the single-exposure columns ``ppi_zones.parquet`` has always had.
+
+    Exposure is the first of GTFS stops / ECOBICI trips with data, trying the
+    components weighted in ``weight_set`` first; ``none`` leaves it at 0.
+    """
+    candidates = sorted(_EXPOSURE_COMPONENTS, key=lambda c: not weight_set.get(c))
+    source = next((c for c in candidates if frame[c].any()), None)
+    frame = frame.copy()
+    if source is None:
+        frame["exposure"] = np.int64(0)
+        frame["exposure_z"] = 0.0
+    else:
+        frame["exposure"] = frame[source]
+        frame["exposure_z"] = frame[f"{source}_z"]
+    frame["exposure_source"] = source or "none"
+    return frame
+
+
+def build_ppi(
+    config: PPIConfig | None = None, context: BuildContext | None = None
+) -> Path | None:
     """Compute Priority/Policy Readiness Index (PPI) scores by zone.
 
     PPI combines incident frequency and exposure to identify zones requiring
-    policy attention. Higher PPI indicates zones with high incidents relative
-    to transit/mobility exposure.
+    policy attention. For each time window and weight set of
+    ``config/ppi.yml``:
 
     Formula:
-        PPI = 0.7 × incidents_z + 0.3 × exposure_z
-
-    Where:
-        - incidents_z: Z-score of incident counts per zone
-        - exposure_z: Z-score of exposure metric (GTFS stops or bike trips)
+        PPI = Σ weight_c × z_c over components c (incidents, gtfs_stops,
+        ecobici_trips), with z-scores taken across zones in the window.
 
     Returns:
-        Path to saved analytics/ppi_zones.parquet file, or None if insufficient data.
-        Output columns:
-            - zone_id: H3 hexagon identifier
-            - incidents: Count of incidents in zone
-            - exposure: Count of transit stops or trips in zone
-            - incidents_z: Standardized incident score
-            - exposure_z: Standardized exposure score
+        Path to ``analytics/ppi_zones.parquet`` (first window and weight set
+        at the base resolution), or None if there is no zoned data. Every
+        combination, including parent resolutions, is written to the
+        ``analytics/ppi_scores.parquet`` dataset, partitioned by
+        ``resolution``, ``window`` and ``weight_set``. Columns:
+            - zone_id: H3 cell
+            - incidents, gtfs_stops, ecobici_trips: Component counts
+            - <component>_z: Standardized component scores
             - ppi: Combined priority index
-            - exposure_source: Data source used ('gtfs_stops', 'ecobici_trips', or 'none')
+            - rank: 1 = highest ppi within the partition
+        ``ppi_zones.parquet`` also keeps the single-exposure columns of
+        the original index, taken from the default weight set:
+            - exposure: Count of the exposure component
+            - exposure_z: Its standardized score
+            - exposure_source: 'gtfs_stops', 'ecobici_trips' or 'none'
 
     Example:
-        >>> ppi_path = build_ppi()
-        >>> ppi_df = pd.read_parquet(ppi_path)
-        >>> top_zones = ppi_df.nlargest(5, 'ppi')
-        >>> print(top_zones[['zone_id', 'ppi']])
+        >>> build_ppi()
+        >>> scores = pd.read_parquet(
+        ...     ANALYTICS_DIR / "ppi_scores.parquet",
+        ...     filters=[("window", "=", "last_30d"), ("weight_set", "=", "default")],
+        ... )
+        >>> print(scores.nsmallest(5, "rank")[["zone_id", "ppi"]])
+
+    Args:
+        config: Windows and weight sets (default ``config/ppi.yml``).
+        context: Shared build context; reuses the cubes ``build_analytics``
+            left in it instead of reloading them.
 
     Note:
-        Requires processed c5_incidents.parquet. Exposure uses GTFS stops if available,
-        falls back to ECOBICI trips, or sets exposure to 0 if neither exists.
+        Event counts come from the analytics cubes (``build_analytics`` keeps
+        them current); windows end on the latest event date. Components
+        without data count 0 and contribute a z-score of 0.
     """
     ANALYTICS_DIR.mkdir(parents=True, exist_ok=True)
+    config = config or load_ppi_config()
+    context = context or BuildContext(PROCESSED_DIR)
+    weights = weight_matrix(config)
 
-    incidents = _load_optional(PROCESSED_DIR / "c5_incidents.parquet")
-    if incidents is None or "zone_id" not in incidents.columns:
-        LOGGER.warning("No incidents data available for PPI")
+    zones, counts = _component_counts(config.windows, context)
+    if not len(zones):
+        LOGGER.warning("No zoned data available for PPI")
         return None
 
-    incidents_counts = (
-        incidents.groupby("zone_id", dropna=False).size().rename("incidents")
-    )
+    scores_path = ANALYTICS_DIR / "ppi_scores.parquet"
+    with DatasetWriter(
+        scores_path, partition_cols=["resolution", "window", "weight_set"]
+    ) as writer:
+        base = _score_frame(zones, counts, config, weights, DEFAULT_H3_RESOLUTION)
+        writer.write(base)
+        level_zones, level_counts = zones, counts
+        for res in sorted(H3_PYRAMID_RESOLUTIONS, reverse=True):
+            level_zones, level_counts = _coarsen_counts(level_zones, level_counts, res)
+            writer.write(_score_frame(level_zones, level_counts, config, weights, res))
 
-    exposure_source = None
-    exposure_df = _load_optional(PROCESSED_DIR / "gtfs_stops.parquet")
-    if exposure_df is not None and "zone_id" in exposure_df.columns:
-        exposure_counts = (
-            exposure_df.groupby("zone_id", dropna=False).size().rename("exposure")
-        )
-        exposure_source = "gtfs_stops"
-    else:
-        trips_df = _load_optional(PROCESSED_DIR / "ecobici_trips.parquet")
-        if trips_df is not None and "zone_id" in trips_df.columns:
-            exposure_counts = (
-                trips_df.groupby("zone_id", dropna=False).size().rename("exposure")
-            )
-            exposure_source = "ecobici_trips"
-        else:
-            exposure_counts = pd.Series(dtype=float, name="exposure")
-
-    table = pd.concat([incidents_counts, exposure_counts], axis=1).fillna(0)
-    table["incidents_z"] = _zscore(table["incidents"])
-    table["exposure_z"] = (
-        _zscore(table["exposure"]) if not table["exposure"].empty else 0
+    weight_set = next(iter(config.weight_sets))
+    first = (base["window"] == next(iter(config.windows))) & (
+        base["weight_set"] == weight_set
     )
-    table["ppi"] = 0.7 * table["incidents_z"] + 0.3 * table["exposure_z"]
-    table["exposure_source"] = exposure_source or "none"
-    table = table.reset_index().rename(columns={"index": "zone_id"})
-
+    zones_table = base.loc[first].drop(columns=["resolution", "window", "weight_set"])
     out_path = ANALYTICS_DIR / "ppi_zones.parquet"
-    table.to_parquet(out_path, index=False)
+    _with_exposure(zones_table, config.weight_sets[weight_set]).to_parquet(
+        out_path, index=False
+    )
     LOGGER.info("Wrote %s", out_path)
     return out_path
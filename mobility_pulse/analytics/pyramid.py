@@ -0,0 +1,61 @@
+"""Multi-resolution H3 roll-ups of zone tables.
+
+Zone tables are built at ``DEFAULT_H3_RESOLUTION``. Zoomed-out maps and
+coarse views read pre-aggregated parent levels (``<table>_r<res>.parquet``)
+instead of re-deriving parents per row at render time. Each level is rolled
+up from the previous, finer one with the integer parent mapping of
+``geo.cells_to_parent``, so the cost shrinks with every level.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+
+import pandas as pd
+
+from mobility_pulse.config import H3_PYRAMID_RESOLUTIONS
+from mobility_pulse.transform.geo import (
+    cells_to_parent,
+    cells_to_zone_array,
+    zone_cells,
+)
+
+
+def coarsen_zones(
+    table: pd.DataFrame,
+    resolution: int,
+    values: Sequence[str] = ("count",),
+    zone_cols: Sequence[str] = ("zone_id",),
+) -> pd.DataFrame:
+    """Sum ``values`` of ``table`` on parent cells at ``resolution``.
+
+    Every column that is neither a value nor a zone column is kept as a
+    group key; missing zones and keys form their own groups.
+    """
+    coarse = table.assign(
+        **{
+            col: cells_to_zone_array(
+                cells_to_parent(zone_cells(table[col]), resolution)
+            )
+            for col in zone_cols
+        }
+    )
+    keys = [c for c in table.columns if c not in values]
+    return (
+        coarse.groupby(keys, dropna=False, sort=True, observed=True)[list(values)]
+        .sum()
+        .reset_index()
+    )
+
+
+def zone_pyramid(
+    table: pd.DataFrame,
+    resolutions: Sequence[int] = H3_PYRAMID_RESOLUTIONS,
+    values: Sequence[str] = ("count",),
+    zone_cols: Sequence[str] = ("zone_id",),
+) -> Iterator[tuple[int, pd.DataFrame]]:
+    """Yield ``(resolution, table)`` levels from finest to coarsest."""
+    level = table
+    for resolution in sorted(resolutions, reverse=True):
+        level = coarsen_zones(level, resolution, values, zone_cols)
+        yield resolution, level
@@ -0,0 +1,321 @@
+"""Per-zone metadata: alcaldía, colonia, centroid and H3 parents.
+
+The dashboard labels zones with their most frequent alcaldía/colonia and
+places them at the mean position of their events. ``zone_metadata.parquet``
+is built once per ``build`` from C5 incidents and GTFS stops, with the modes
+taken by counting (zone, value) pairs in one grouped pass, so pages join a
+small table instead of regrouping the processed events on every render.
+
+``zone_geometry.parquet`` holds the H3 centre and boundary of every zone seen
+in the processed datasets (and of its pyramid parents). ``ZoneGeometry``
+keeps it as sorted arrays, so maps look up thousands of hexes with one
+``searchsorted`` instead of an h3 call per cell.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from mobility_pulse.config import ANALYTICS_DIR, H3_PYRAMID_RESOLUTIONS, PROCESSED_DIR
+from mobility_pulse.context import BuildContext
+from mobility_pulse.transform.geo import (
+    H3_NULL,
+    cell_boundaries,
+    cell_centroids,
+    cells_to_parent,
+    cells_to_zone_array,
+    zone_cells,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+ZONE_METADATA_SOURCES = ("c5_incidents", "gtfs_stops")
+# Published label -> source columns in order of preference.
+ZONE_LABELS = {
+    "alcaldia": ("alcaldia_catalogo", "alcaldia"),
+    "colonia": ("colonia_catalogo", "colonia"),
+}
+# Datasets whose zones (and their pyramid parents) get precomputed geometry.
+ZONE_GEOMETRY_SOURCES = (
+    "c5_incidents",
+    "ecobici_trips",
+    "ecobici_rt",
+    "gtfs_stops",
+    "gps_cdmx",
+)
+ZONE_GEOMETRY_COLUMNS = ("zone_id", "zone_id_end")
+SOURCE_COLUMNS = [
+    "zone_id",
+    *(col for candidates in ZONE_LABELS.values() for col in candidates),
+    "lat",
+    "lon",
+]
+
+
+def zone_modes(codes: np.ndarray, values: pd.Series, n_zones: int) -> np.ndarray:
+    """Most frequent non-null value per zone code (smallest on ties).
+
+    Matches ``groupby(...).agg(lambda x: x.mode().iloc[0])`` without a Python
+    call per zone. Rows with a negative code are ignored.
+
+    Returns:
+        Object array of length ``n_zones`` (None where a zone has no value).
+    """
+    out = np.full(n_zones, None, dtype=object)
+    valid = (codes >= 0) & values.notna().to_numpy()
+    if not valid.any():
+        return out
+    value_codes, uniques = pd.factorize(values[valid], sort=True)
+    pairs = pd.DataFrame({"zone": codes[valid], "value": value_codes})
+    counts = pairs.groupby(["zone", "value"]).size().reset_index(name="n")
+    best = counts.sort_values(
+        ["zone", "n", "value"], ascending=[True, False, True]
+    ).drop_duplicates("zone")
+    out[best["zone"].to_numpy()] = np.asarray(uniques, dtype=object)[
+        best["value"].to_numpy()
+    ]
+    return out
+
+
+def zone_metadata(frames: list[pd.DataFrame | None]) -> pd.DataFrame:
+    """Zone table from event/stop frames (``SOURCE_COLUMNS`` where present).
+
+    Returns:
+        One row per zone: ``zone_id``, ``alcaldia``, ``colonia``, ``lat``,
+        ``lon`` (mean position of its rows) and ``zone_id_r<res>`` parents
+        for every ``H3_PYRAMID_RESOLUTIONS`` level. Empty without zones.
+    """
+    parts = [
+        frame[[c for c in SOURCE_COLUMNS if c in frame.columns]]
+        for frame in frames
+        if frame is not None and "zone_id" in frame.columns
+    ]
+    if not parts:
+        return pd.DataFrame()
+    combined = pd.concat(parts, ignore_index=True)
+    cells = zone_cells(combined["zone_id"])
+    zones = np.unique(cells[cells != H3_NULL])
+    if not len(zones):
+        return pd.DataFrame()
+    codes = np.where(cells != H3_NULL, np.searchsorted(zones, cells), -1)
+
+    meta = pd.DataFrame({"zone_id": cells_to_zone_array(zones)})
+    for label, candidates in ZONE_LABELS.items():
+        source = next((c for c in candidates if c in combined.columns), None)
+        modes = (
+            zone_modes(codes, combined[source], len(zones))
+            if source
+            else np.full(len(zones), None, dtype=object)
+        )
+        meta[label] = pd.array(modes, dtype="string")
+    for axis in ("lat", "lon"):
+        values = (
+            pd.to_numeric(combined[axis], errors="coerce").to_numpy(
+                dtype=float, na_value=np.nan
+            )
+            if axis in combined.columns
+            else np.full(len(combined), np.nan)
+        )
+        ok = (codes >= 0) & ~np.isnan(values)
+        total = np.bincount(codes[ok], weights=values[ok], minlength=len(zones))
+        count = np.bincount(codes[ok], minlength=len(zones))
+        meta[axis] = np.divide(
+            total, count, out=np.full(len(zones), np.nan), where=count > 0
+        )
+    for res in H3_PYRAMID_RESOLUTIONS:
+        meta[f"zone_id_r{res}"] = cells_to_zone_array(cells_to_parent(zones, res))
+    return meta
+
+
+def build_zone_metadata(context: BuildContext | None = None) -> Path | None:
+    """Write ``ANALYTICS_DIR/zone_metadata.parquet`` (see ``zone_metadata``).
+
+    Args:
+        context: Shared build context (sources are read through it).
+
+    Returns:
+        The output path, or None when no source has zones.
+    """
+    context = context or BuildContext(PROCESSED_DIR)
+    meta = zone_metadata(
+        [context.frame(name, SOURCE_COLUMNS) for name in ZONE_METADATA_SOURCES]
+    )
+    if meta.empty:
+        return None
+    out_path = ANALYTICS_DIR / "zone_metadata.parquet"
+    meta.to_parquet(out_path, index=False)
+    LOGGER.info("Wrote %s (%s zones)", out_path, f"{len(meta):,}")
+    return out_path
+
+
+@dataclass(frozen=True)
+class ZoneGeometry:
+    """H3 centres and boundaries of a set of zones, as sorted arrays.
+
+    Attributes:
+        cells: Sorted distinct uint64 cells (no ``H3_NULL``).
+        lat: Centre latitude per cell.
+        lon: Centre longitude per cell.
+        offsets: Boundary of ``cells[i]`` is ``offsets[i]:offsets[i + 1]``
+            in ``boundary_lat``/``boundary_lon``.
+        boundary_lat: Flat boundary vertex latitudes.
+        boundary_lon: Flat boundary vertex longitudes.
+
+    Example:
+        >>> geometry = ZoneGeometry.read(ANALYTICS_DIR / "zone_geometry.parquet")
+        >>> lat, lon = geometry.centers(zone_cells(df["zone_id"]))
+    """
+
+    cells: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    offsets: np.ndarray
+    boundary_lat: np.ndarray
+    boundary_lon: np.ndarray
+
+    @classmethod
+    def from_cells(cls, cells: np.ndarray) -> ZoneGeometry:
+        """Compute the geometry of the distinct non-null ``cells``."""
+        cells = np.unique(np.asarray(cells, dtype=np.uint64))
+        cells = cells[cells != H3_NULL]
+        lat, lon = cell_centroids(cells)
+        offsets, boundary_lat, boundary_lon = cell_boundaries(cells)
+        return cls(cells, lat, lon, offsets, boundary_lat, boundary_lon)
+
+    @classmethod
+    def read(cls, path: Path) -> ZoneGeometry:
+        """Load a table written by ``write``."""
+        table = pq.read_table(path)
+        boundary_lat = table.column("boundary_lat").combine_chunks()
+        boundary_lon = table.column("boundary_lon").combine_chunks()
+        return cls(
+            table.column("zone_id").to_numpy().astype(np.uint64),
+            table.column("lat").to_numpy(),
+            table.column("lon").to_numpy(),
+            boundary_lat.offsets.to_numpy().astype(np.int64),
+            boundary_lat.values.to_numpy(),
+            boundary_lon.values.to_numpy(),
+        )
+
+    def write(self, path: Path) -> None:
+        """Write one row per zone with list columns for the boundary."""
+        offsets = pa.array(self.offsets, type=pa.int32())
+        table = pa.table(
+            {
+                "zone_id": pa.array(self.cells, type=pa.uint64()),
+                "lat": self.lat,
+                "lon": self.lon,
+                "boundary_lat": pa.ListArray.from_arrays(offsets, self.boundary_lat),
+                "boundary_lon": pa.ListArray.from_arrays(offsets, self.boundary_lon),
+            }
+        )
+        pq.write_table(table, path)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            a.nbytes
+            for a in (
+                self.cells,
+                self.lat,
+                self.lon,
+                self.offsets,
+                self.boundary_lat,
+                self.boundary_lon,
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def index(self, cells: np.ndarray) -> np.ndarray:
+        """Position of each cell in ``self.cells`` (-1 when unknown)."""
+        cells = np.asarray(cells, dtype=np.uint64)
+        pos = np.searchsorted(self.cells, cells)
+        pos = np.minimum(pos, max(len(self.cells) - 1, 0))
+        found = (
+            (self.cells[pos] == cells) & (cells != H3_NULL)
+            if len(self.cells)
+            else np.zeros(len(cells), dtype=bool)
+        )
+        return np.where(found, pos, -1)
+
+    def centers(self, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Centre ``(lat, lon)`` of each cell (NaN for unknown cells)."""
+        pos = self.index(cells)
+        found = pos >= 0
+        lat = np.full(len(pos), np.nan)
+        lon = np.full(len(pos), np.nan)
+        lat[found] = self.lat[pos[found]]
+        lon[found] = self.lon[pos[found]]
+        return lat, lon
+
+    def boundaries(self, cells: np.ndarray) -> list[np.ndarray | None]:
+        """Closed ``[lon, lat]`` vertex rings per cell (None when unknown).
+
+        The layout matches pydeck's ``PolygonLayer``/``get_polygon``.
+        """
+        pos = self.index(cells)
+        found = pos >= 0
+        out: list[np.ndarray | None] = [None] * len(pos)
+        if not found.any():
+            return out
+        starts = self.offsets[pos[found]]
+        sizes = self.offsets[pos[found] + 1] - starts
+        # Gather every vertex of the selected cells in one pass.
+        flat = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(
+            sizes.sum()
+        )
+        ring = np.column_stack([self.boundary_lon[flat], self.boundary_lat[flat]])
+        for i, vertices in zip(
+            np.flatnonzero(found), np.split(ring, np.cumsum(sizes)[:-1]), strict=True
+        ):
+            out[i] = np.vstack([vertices, vertices[:1]])
+        return out
+
+
+def zone_geometry(frames: list[pd.DataFrame | None]) -> ZoneGeometry:
+    """Geometry of every zone in ``frames`` and of its pyramid parents."""
+    cells = [
+        zone_cells(frame[col])
+        for frame in frames
+        if frame is not None
+        for col in ZONE_GEOMETRY_COLUMNS
+        if col in frame.columns
+    ]
+    zones = np.unique(np.concatenate(cells)) if cells else np.empty(0, np.uint64)
+    zones = zones[zones != H3_NULL]
+    parents = [cells_to_parent(zones, res) for res in H3_PYRAMID_RESOLUTIONS]
+    return ZoneGeometry.from_cells(np.concatenate([zones, *parents]))
+
+
+def build_zone_geometry(context: BuildContext | None = None) -> Path | None:
+    """Write ``ANALYTICS_DIR/zone_geometry.parquet`` (see ``zone_geometry``).
+
+    Args:
+        context: Shared build context (sources are read through it).
+
+    Returns:
+        The output path, or None when no source has zones.
+    """
+    context = context or BuildContext(PROCESSED_DIR)
+    frames = [
+        context.frame(name, [c for c in ZONE_GEOMETRY_COLUMNS if c in columns])
+        for name in ZONE_GEOMETRY_SOURCES
+        if (columns := context.columns(name))
+        and any(c in columns for c in ZONE_GEOMETRY_COLUMNS)
+    ]
+    geometry = zone_geometry(frames)
+    if not len(geometry):
+        return None
+    out_path = ANALYTICS_DIR / "zone_geometry.parquet"
+    geometry.write(out_path)
+    LOGGER.info("Wrote %s (%s zones)", out_path, f"{len(geometry):,}")
+    return out_path
@@ -0,0 +1,120 @@
+"""Caché de tablas compartida por todas las sesiones del panel.
+
+``st.cache_data`` guarda una copia por función, se indexa solo por argumentos
+(no nota que un parquet cambió) y devuelve una copia nueva en cada llamada.
+``TableCache`` vive en el proceso de Streamlit y la comparten todas las
+sesiones: cada entrada se indexa por sus archivos fuente y se valida con su
+huella (tamaño y mtime de cada archivo), así que un ``build`` solo invalida
+las tablas que de verdad reescribió. Las entradas se desalojan por LRU cuando
+superan ``APP_CACHE_BYTES``. Cada sesión recibe su propia copia de cada
+DataFrame, así que ninguna modificación suya alcanza a la caché: con
+copy-on-write (siempre en pandas 3, opcional en pandas 2) basta una copia
+superficial que comparte memoria hasta que alguien escribe; sin él se hace una
+copia profunda. El módulo no toca las opciones globales de pandas.
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from mobility_pulse.config import APP_CACHE_BYTES
+from mobility_pulse.storage import paths_fingerprint
+
+LOGGER = logging.getLogger(__name__)
+
+_PANDAS_3 = int(pd.__version__.split(".")[0]) >= 3
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    value: Any
+    nbytes: int
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return getattr(value, "nbytes", None) or sys.getsizeof(value)
+
+
+def _copy_on_write() -> bool:
+    return _PANDAS_3 or pd.get_option("mode.copy_on_write") is True
+
+
+def _share(value: Any) -> Any:
+    if not isinstance(value, pd.DataFrame):
+        return value
+    return value.copy(deep=not _copy_on_write())
+
+
+class TableCache:
+    """LRU de tablas por archivos fuente, acotada en bytes y segura entre hilos.
+
+    Example:
+        >>> cache = TableCache(max_bytes=256 * 1024**2)
+        >>> zones = cache.get([path], lambda: pd.read_parquet(path), "zones")
+    """
+
+    def __init__(self, max_bytes: int = APP_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, paths: list[Path] | tuple[Path, ...], load: Callable[[], Any], *key
+    ) -> Any:
+        """Valor de ``load()`` para ``paths`` y ``key``, recargado si cambian.
+
+        Args:
+            paths: Archivos o datasets de los que depende el valor.
+            load: Lector, llamado solo ante un fallo o una huella distinta.
+            key: Resto de la clave (columnas, filtros...), hashable.
+        """
+        paths = tuple(paths)
+        cache_key = (paths, key)
+        fingerprint = paths_fingerprint(paths)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self._entries.move_to_end(cache_key)
+                return _share(entry.value)
+
+        value = load()
+        size = _nbytes(value)
+        with self._lock:
+            stale = self._entries.pop(cache_key, None)
+            if stale is not None:
+                self.nbytes -= stale.nbytes
+            if size <= self.max_bytes:
+                self._entries[cache_key] = _Entry(fingerprint, value, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.nbytes -= evicted.nbytes
+            else:
+                LOGGER.info("Not caching %s (%s bytes over budget)", paths, size)
+        return _share(value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+# Una sola instancia por proceso: Streamlit re-ejecuta el script de la app en
+# cada interacción, pero los módulos importados persisten.
+TABLE_CACHE = TableCache()
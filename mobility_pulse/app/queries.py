@@ -0,0 +1,331 @@
+"""Consultas del dashboard sobre los parquet procesados.
+
+Los filtros globales (rango de fechas, horas y días de la semana) se traducen
+a una expresión de ``pyarrow.dataset`` que se evalúa durante el escaneo: solo
+se leen las columnas que usa el panel, los grupos de filas cuyas estadísticas
+de ``timestamp`` quedan fuera del rango se descartan sin decodificarse y, en
+datasets particionados por ``month``, se omiten particiones completas. La
+cobertura y completitud de la pestaña de calidad salen de los metadatos de
+parquet (filas, min/max y nulos por grupo de filas), sin leer datos. Los KPI
+(conteo, periodo anterior, hora y día pico) suman el cubo
+``<dataset>_kpi_cube.parquet`` publicado en ``build``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# Columnas que usa el panel de cada dataset procesado.
+INCIDENT_COLUMNS = [
+    "timestamp",
+    "zone_id",
+    "id_zona",
+    "lat",
+    "lon",
+    "latitud",
+    "longitud",
+    "alcaldia_catalogo",
+    "colonia_catalogo",
+]
+TRIP_COLUMNS = ["timestamp", "zone_id", "id_zona", "lat", "lon"]
+STOP_COLUMNS = ["stop_id", "stop_name", "timestamp", "zone_id", "id_zona", "lat", "lon"]
+STATION_COLUMNS = [
+    "station_id",
+    "name",
+    "timestamp",
+    "zone_id",
+    "id_zona",
+    "lat",
+    "lon",
+    "bikes_available",
+    "docks_available",
+]
+
+_DAYS_EN = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+_DAYS_ES = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+# Día en inglés o español -> ``pc.day_of_week`` (lunes = 0).
+_DAY_INDEX = {day: i for days in (_DAYS_EN, _DAYS_ES) for i, day in enumerate(days)}
+
+
+def _period(
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """``[inicio, fin + 1 día)``: ambos días del selector quedan incluidos."""
+    start, end = (pd.Timestamp(value) for value in date_range)
+    return start, end + pd.Timedelta(days=1)
+
+
+def day_indices(days: list[str] | tuple[str, ...]) -> list[int]:
+    """Días en inglés o español -> índices ``pc.day_of_week`` (lunes = 0)."""
+    return sorted({_DAY_INDEX[d] for d in days if d in _DAY_INDEX})
+
+
+def _dataset(path: Path) -> ds.Dataset | None:
+    if not path.exists():
+        return None
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+
+def event_filter(
+    schema: pa.Schema,
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: list[int] | tuple[int, ...] = (),
+    days: list[str] | tuple[str, ...] = (),
+) -> ds.Expression | None:
+    """Expresión de escaneo para los filtros globales del panel.
+
+    Args:
+        schema: Esquema del dataset (incluye columnas de partición).
+        date_range: Primer y último día, ambos incluidos (``[inicio, fin + 1 día)``).
+        hours: Horas 0-23 a conservar (vacío = todas).
+        days: Días de la semana en inglés o español (vacío = todos).
+
+    Returns:
+        La expresión, o None si ``timestamp`` no es una columna de fecha.
+    """
+    if "timestamp" not in schema.names:
+        return None
+    ts_type = schema.field("timestamp").type
+    if not pa.types.is_timestamp(ts_type):
+        return None
+    ts = pc.field("timestamp")
+    start, stop = _period(date_range)
+    end = stop - pd.Timedelta(days=1)
+    expr = (ts >= pa.scalar(start.to_pydatetime(), type=ts_type)) & (
+        ts < pa.scalar(stop.to_pydatetime(), type=ts_type)
+    )
+    if "month" in schema.names and pa.types.is_string(schema.field("month").type):
+        # Poda de particiones: month=YYYY-MM fuera del rango no se abre.
+        month = pc.field("month")
+        expr &= (month >= start.strftime("%Y-%m")) & (month <= end.strftime("%Y-%m"))
+    if hours:
+        expr &= pc.hour(ts).isin([int(h) for h in hours])
+    if days:
+        expr &= pc.day_of_week(ts).isin(day_indices(days))
+    return expr
+
+
+def load_events(
+    path: Path,
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: list[int] | tuple[int, ...] = (),
+    days: list[str] | tuple[str, ...] = (),
+    columns: list[str] | tuple[str, ...] | None = None,
+) -> pd.DataFrame:
+    """Lee solo las filas y columnas de ``path`` que pasan los filtros.
+
+    Sin columna ``timestamp`` de fecha se devuelven todas las filas (como
+    antes hacía el filtrado en memoria).
+    """
+    dataset = _dataset(path)
+    if dataset is None:
+        return pd.DataFrame()
+    names = dataset.schema.names
+    present = names if columns is None else [c for c in columns if c in names]
+    expr = event_filter(dataset.schema, date_range, hours, days)
+    return dataset.to_table(columns=present, filter=expr).to_pandas()
+
+
+def load_table(
+    path: Path, columns: list[str] | tuple[str, ...] | None = None
+) -> pd.DataFrame:
+    """Lee las ``columns`` presentes de un parquet procesado (vacío si falta)."""
+    dataset = _dataset(path)
+    if dataset is None:
+        return pd.DataFrame()
+    names = dataset.schema.names
+    present = names if columns is None else [c for c in columns if c in names]
+    return dataset.to_table(columns=present).to_pandas()
+
+
+def dataset_summary(
+    path: Path, columns: list[str] | tuple[str, ...] = ()
+) -> dict[str, Any] | None:
+    """Filas, rango de ``timestamp`` y nulos por columna desde los metadatos.
+
+    Las columnas sin estadísticas de nulos se leen proyectadas (solo esa
+    columna). Devuelve None si el dataset no existe.
+
+    Returns:
+        ``{"rows", "start", "end", "nulls": {columna: nulos}}``; ``start`` y
+        ``end`` son None sin timestamps.
+    """
+    dataset = _dataset(path)
+    if dataset is None:
+        return None
+    wanted = [c for c in columns if c in dataset.schema.names]
+    rows = 0
+    nulls = dict.fromkeys(wanted, 0)
+    seen: set[str] = set()
+    no_stats: set[str] = set()
+    bounds: list[pd.Timestamp] = []
+    for fragment in dataset.get_fragments():
+        meta = fragment.metadata
+        rows += meta.num_rows
+        for group in range(meta.num_row_groups):
+            row_group = meta.row_group(group)
+            for i in range(row_group.num_columns):
+                column = row_group.column(i)
+                name = column.path_in_schema
+                stats = column.statistics
+                if name in nulls:
+                    seen.add(name)
+                    if stats is not None and stats.has_null_count:
+                        nulls[name] += stats.null_count
+                    else:
+                        no_stats.add(name)
+                if name == "timestamp" and stats is not None and stats.has_min_max:
+                    bounds += [pd.Timestamp(stats.min), pd.Timestamp(stats.max)]
+    # Columnas de partición o sin estadísticas: conteo proyectado.
+    for name in (set(wanted) - seen) | no_stats:
+        nulls[name] = dataset.to_table(columns=[name]).column(name).null_count
+    return {
+        "rows": rows,
+        "start": min(bounds) if bounds else None,
+        "end": max(bounds) if bounds else None,
+        "nulls": nulls,
+    }
+
+
+def _cube_mask(
+    cube: pd.DataFrame,
+    hours: list[int] | tuple[int, ...],
+    days: list[str] | tuple[str, ...],
+) -> np.ndarray:
+    mask = np.ones(len(cube), dtype=bool)
+    if hours:
+        mask &= cube["hour"].isin([int(h) for h in hours]).to_numpy()
+    if days:
+        mask &= cube["weekday"].isin(day_indices(days)).to_numpy()
+    return mask
+
+
+def kpi_summary(
+    cube: pd.DataFrame,
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: list[int] | tuple[int, ...] = (),
+    days: list[str] | tuple[str, ...] = (),
+) -> dict[str, Any]:
+    """KPI de una tarjeta sumando el cubo fecha × hora × día × zona.
+
+    El periodo es ``[inicio, fin + 1 día)`` a resolución horaria, igual que en
+    ``event_filter``, y el anterior es la ventana de la misma duración que
+    termina en ``inicio``; ambos respetan los filtros de hora y día.
+
+    Args:
+        cube: Tabla de ``analytics.cube.kpi_cube``.
+        date_range: Primer y último día del periodo, ambos incluidos.
+        hours: Horas 0-23 a conservar (vacío = todas).
+        days: Días de la semana en inglés o español (vacío = todos).
+
+    Returns:
+        ``conteo``, ``delta`` (None sin periodo anterior), ``peak_hour`` y
+        ``peak_day`` (día en inglés; ambos None sin eventos).
+    """
+    start, end = _period(date_range)
+    stamps = cube["date"].to_numpy(dtype="datetime64[ns]") + cube["hour"].to_numpy(
+        dtype=np.int64
+    ).astype("timedelta64[h]")
+    hour = cube["hour"].to_numpy(dtype=np.int64)
+    weekday = cube["weekday"].to_numpy(dtype=np.int64)
+    counts = cube["count"].to_numpy(dtype=np.int64)
+    mask = _cube_mask(cube, hours, days)
+
+    def _window(lo: pd.Timestamp, hi: pd.Timestamp) -> np.ndarray:
+        return mask & (stamps >= lo.to_datetime64()) & (stamps < hi.to_datetime64())
+
+    current = _window(start, end)
+    count = int(counts[current].sum())
+    prev_count = int(counts[_window(start - (end - start), start)].sum())
+    peak_hour = peak_day = None
+    if count:
+        by_hour = np.bincount(hour[current], weights=counts[current], minlength=24)
+        by_day = np.bincount(weekday[current], weights=counts[current], minlength=7)
+        peak_hour = int(by_hour.argmax())
+        peak_day = _DAYS_EN[int(by_day.argmax())]
+    return {
+        "conteo": count,
+        "delta": (count - prev_count) / prev_count if prev_count else None,
+        "peak_hour": peak_hour,
+        "peak_day": peak_day,
+    }
+
+
+def filter_alerts(
+    alerts: pd.DataFrame,
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: list[int] | tuple[int, ...] = (),
+    days: list[str] | tuple[str, ...] = (),
+) -> pd.DataFrame:
+    """Alertas precalculadas que pasan los filtros globales del panel.
+
+    Usa el mismo periodo ``[inicio, fin + 1 día)`` que los KPI; ``hours`` solo
+    filtra tablas con columna ``hour`` (niveles horarios).
+    """
+    if alerts.empty or "date" not in alerts.columns:
+        return alerts
+    start, end = _period(date_range)
+    dates = pd.to_datetime(alerts["date"], errors="coerce")
+    stamps = dates
+    if "hour" in alerts.columns:
+        stamps = dates + pd.to_timedelta(alerts["hour"].astype("int64"), unit="h")
+        if hours:
+            stamps = stamps.where(alerts["hour"].isin([int(h) for h in hours]))
+    mask = (stamps >= start) & (stamps < end)
+    if days:
+        mask &= dates.dt.dayofweek.isin(day_indices(days))
+    return alerts[mask]
+
+
+def zone_growth(
+    cube: pd.DataFrame,
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: list[int] | tuple[int, ...] = (),
+    days: list[str] | tuple[str, ...] = (),
+    window: int = 7,
+) -> pd.DataFrame:
+    """Crecimiento por zona de los últimos ``window`` días frente a los previos.
+
+    Las ventanas terminan en el último día con eventos dentro del periodo y
+    los filtros; hacen falta al menos ``2 × window`` días con eventos.
+
+    Returns:
+        ``zone_id``, ``last7``, ``prev7`` y ``delta_pct`` (``(last7 - prev7) /
+        (prev7 + 1)``) ordenado de mayor a menor crecimiento; vacío si no hay
+        días suficientes.
+    """
+    start, end = _period(date_range)
+    stamps = cube["date"] + pd.to_timedelta(cube["hour"].astype("int64"), unit="h")
+    mask = _cube_mask(cube, hours, days) & (stamps >= start) & (stamps < end)
+    current = cube[mask & cube["zone_id"].notna().to_numpy()]
+    if current["date"].nunique() < 2 * window:
+        return pd.DataFrame(columns=["zone_id", "last7", "prev7", "delta_pct"])
+    last_date = current["date"].max()
+    age = (last_date - current["date"]).dt.days
+    windows = pd.DataFrame(
+        {
+            "zone_id": current["zone_id"],
+            "last7": current["count"].where(age < window, 0),
+            "prev7": current["count"].where((age >= window) & (age < 2 * window), 0),
+        }
+    )
+    growth = windows.groupby("zone_id")[["last7", "prev7"]].sum().reset_index()
+    growth = growth[(growth["last7"] > 0) | (growth["prev7"] > 0)]
+    growth["delta_pct"] = (growth["last7"] - growth["prev7"]) / (growth["prev7"] + 1)
+    return growth.sort_values("delta_pct", ascending=False, ignore_index=True)
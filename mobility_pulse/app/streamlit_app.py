@@ -9,15 +9,48 @@ import html
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import h3
 import requests
 import streamlit as st
 
-from mobility_pulse.config import ANALYTICS_DIR, PROCESSED_DIR
+from mobility_pulse.config import (
+    ANALYTICS_DIR,
+    DEFAULT_H3_RESOLUTION,
+    H3_PYRAMID_RESOLUTIONS,
+    PROCESSED_DIR,
+    ConfigError,
+    load_ppi_config,
+)
+from mobility_pulse.transform.geo import (
+    H3_NULL,
+    cell_centroids,
+    cells_to_str,
+    cells_to_zone_array,
+    zone_cells,
+)
 from mobility_pulse.app.ui_utils import (
     apply_plotly_theme,
     export_dataframe_to_csv,
 )
+from mobility_pulse.analytics.zones import (
+    SOURCE_COLUMNS,
+    ZONE_METADATA_SOURCES,
+    ZoneGeometry,
+    zone_metadata,
+)
+from mobility_pulse.analytics.cube import build_cube, kpi_cube
+from mobility_pulse.app.cache import TABLE_CACHE
+from mobility_pulse.app.queries import (
+    INCIDENT_COLUMNS,
+    STATION_COLUMNS,
+    STOP_COLUMNS,
+    TRIP_COLUMNS,
+    dataset_summary,
+    filter_alerts,
+    kpi_summary,
+    load_events,
+    load_table,
+    zone_growth,
+)
 
 st.set_page_config(
     page_title="CDMX Mobility Pulse",
@@ -365,15 +398,10 @@ def _empty_state(
 
 def _data_freshness_badge() -> str:
     """Calculate and return a freshness status badge for the data."""
-    incidents_path = PROCESSED_DIR / "c5_incidents.parquet"
-    incidents = _load_parquet(incidents_path)
-    if (
-        incidents is not None
-        and not incidents.empty
-        and "timestamp" in incidents.columns
-    ):
+    summary = _dataset_summary(PROCESSED_DIR / "c5_incidents.parquet")
+    if summary is not None and summary["end"] is not None:
         try:
-            latest = pd.to_datetime(incidents["timestamp"]).max()
+            latest = summary["end"]
             age_hours = (pd.Timestamp.now() - latest).total_seconds() / 3600
 
             if age_hours >= 24 * 30:
@@ -436,11 +464,11 @@ def _metric_with_tooltip(
     )
 
 
-@st.cache_data(show_spinner=False)
 def _load_parquet(path: Path) -> pd.DataFrame | None:
+    """Parquet completo desde la caché compartida (se recarga si cambia)."""
     if not path.exists():
         return None
-    return pd.read_parquet(path)
+    return TABLE_CACHE.get([path], lambda: pd.read_parquet(path))
 
 
 def _display_df(df: pd.DataFrame) -> pd.DataFrame:
@@ -522,17 +550,35 @@ def _get_zone_key(df: pd.DataFrame) -> str | None:
 
 
 def _ensure_zone_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Asegura que el DataFrame tenga ambas columnas zone_id e id_zona sin duplicar."""
+    """Normaliza la clave de zona a una sola columna zone_id con celdas H3 enteras."""
     if df is None or df.empty:
         return df
-    df = df.copy()
     # Eliminar duplicados primero
-    df = df.loc[:, ~df.columns.duplicated()]
-    # Solo crear la columna faltante si no existe
-    if "zone_id" in df.columns and "id_zona" not in df.columns:
-        df["id_zona"] = df["zone_id"]
-    elif "id_zona" in df.columns and "zone_id" not in df.columns:
-        df["zone_id"] = df["id_zona"]
+    if df.columns.duplicated().any():
+        df = df.loc[:, ~df.columns.duplicated()]
+    if "id_zona" in df.columns and "zone_id" not in df.columns:
+        df = df.rename(columns={"id_zona": "zone_id"})
+    # Tablas heredadas con zone_id como texto hexadecimal
+    if "zone_id" in df.columns and not pd.api.types.is_integer_dtype(df["zone_id"]):
+        df = df.copy()
+        df["zone_id"] = cells_to_zone_array(zone_cells(df["zone_id"]))
+    return df
+
+
+def _render_zone_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte las celdas H3 enteras a texto hexadecimal solo para mostrar."""
+    if df is None or df.empty:
+        return df
+    zone_cols = [
+        col
+        for col in ("zone_id", "id_zona")
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col])
+    ]
+    if not zone_cols:
+        return df
+    df = df.copy()
+    for col in zone_cols:
+        df[col] = cells_to_str(df[col])
     return df
 
 
@@ -543,10 +589,8 @@ def _merge_with_zone_meta(
     if df.empty or zone_meta.empty:
         return df
 
-    # Hacer copias profundas y eliminar columnas duplicadas
-    df = df.copy()
+    # Eliminar columnas duplicadas (la seleccion ya devuelve copias)
     df = df.loc[:, ~df.columns.duplicated()]
-    zone_meta = zone_meta.copy()
     zone_meta = zone_meta.loc[:, ~zone_meta.columns.duplicated()]
 
     # Detectar claves
@@ -556,6 +600,14 @@ def _merge_with_zone_meta(
     if not df_zone_key or not meta_zone_key:
         return df
 
+    # Ambas claves como celdas H3 enteras para que el merge sea entero
+    if not pd.api.types.is_integer_dtype(df[df_zone_key]):
+        df[df_zone_key] = cells_to_zone_array(zone_cells(df[df_zone_key]))
+    if not pd.api.types.is_integer_dtype(zone_meta[meta_zone_key]):
+        zone_meta[meta_zone_key] = cells_to_zone_array(
+            zone_cells(zone_meta[meta_zone_key])
+        )
+
     # Si las claves son diferentes, renombrar temporalmente para que coincidan
     if df_zone_key != meta_zone_key:
         zone_meta = zone_meta.rename(columns={meta_zone_key: df_zone_key})
@@ -575,111 +627,89 @@ def _merge_with_zone_meta(
     return result
 
 
-# Temporalmente sin cache para debugging
-# @st.cache_data(show_spinner=False)
-def _load_zone_metadata_v4() -> pd.DataFrame:
-    """Carga metadata de zonas con alcaldía y colonia desde múltiples fuentes. Versión 4."""
-
-    # Intentar cargar desde múltiples fuentes para obtener todos los zone_ids posibles
-    all_data = []
-
-    # Cargar incidents
-    incidents = _load_parquet(PROCESSED_DIR / "c5_incidents.parquet")
-    if incidents is not None and not incidents.empty:
-        all_data.append(incidents)
-
-    # Cargar stops
-    stops = _load_parquet(PROCESSED_DIR / "gtfs_stops.parquet")
-    if stops is not None and not stops.empty:
-        all_data.append(stops)
-
-    # Si no hay datos, retornar vacío
-    if not all_data:
-        return pd.DataFrame()
-
-    # Combinar todos los datasets
-    combined = pd.concat(all_data, ignore_index=True)
-
-    zone_col = _get_zone_key(combined)
-    if zone_col is None:
-        return pd.DataFrame()
-
-    meta_cols = []
-    if "alcaldia_catalogo" in combined.columns:
-        meta_cols.append("alcaldia_catalogo")
-    if "colonia_catalogo" in combined.columns:
-        meta_cols.append("colonia_catalogo")
-
-    # Si no hay columnas de metadata pero tenemos alcaldia/colonia directamente
-    if not meta_cols:
-        if "alcaldia" in combined.columns:
-            meta_cols.append("alcaldia")
-        if "colonia" in combined.columns:
-            meta_cols.append("colonia")
+# Columnas de zone_metadata.parquet que usa el panel (sin los padres H3).
+_ZONE_META_COLUMNS = ("zone_id", "alcaldia", "colonia", "lat", "lon")
 
-    if not meta_cols:
-        return pd.DataFrame()
-
-    # Crear una función que retorna el modo más común
-    def mode_or_na(x):
-        mode_vals = x.mode()
-        return mode_vals.iloc[0] if len(mode_vals) > 0 else pd.NA
-
-    agg_dict = {col: mode_or_na for col in meta_cols}
 
-    # Si hay latitud y longitud, calcular el centro promedio de cada zona
-    has_coords = "latitud" in combined.columns and "longitud" in combined.columns
-    if not has_coords:
-        has_coords = "lat" in combined.columns and "lon" in combined.columns
+def _load_zone_metadata_v4() -> pd.DataFrame:
+    """Metadata de zonas (alcaldía, colonia, centroide) calculada en ``build``."""
+    path = ANALYTICS_DIR / "zone_metadata.parquet"
+    if path.exists():
+        return _load_table(path, _ZONE_META_COLUMNS)
+    # Datos de un build anterior: mismas reglas, calculadas una vez por proceso.
+    sources = [PROCESSED_DIR / f"{name}.parquet" for name in ZONE_METADATA_SOURCES]
+
+    def _build() -> pd.DataFrame:
+        meta = zone_metadata([load_table(src, SOURCE_COLUMNS) for src in sources])
+        return meta[list(_ZONE_META_COLUMNS)] if not meta.empty else meta
+
+    return TABLE_CACHE.get(sources, _build, "zone_metadata")
+
+
+# Datasets procesados del panel: clave -> (archivo, columnas usadas).
+PROCESSED_DATASETS = {
+    "incidentes": ("c5_incidents.parquet", INCIDENT_COLUMNS),
+    "viajes": ("ecobici_trips.parquet", TRIP_COLUMNS),
+    "paradas": ("gtfs_stops.parquet", STOP_COLUMNS),
+    "estaciones": ("ecobici_rt.parquet", STATION_COLUMNS),
+}
+# Campos clave cuya completitud muestra la pestaña de calidad.
+_QUALITY_COLUMNS = (
+    "timestamp",
+    "id_zona",
+    "zone_id",
+    "lat",
+    "lon",
+    "alcaldia_catalogo",
+    "colonia_catalogo",
+)
 
-    if has_coords:
-        if "latitud" in combined.columns:
-            agg_dict["latitud"] = "mean"
-        if "longitud" in combined.columns:
-            agg_dict["longitud"] = "mean"
-        if "lat" in combined.columns and "latitud" not in combined.columns:
-            agg_dict["lat"] = "mean"
-        if "lon" in combined.columns and "longitud" not in combined.columns:
-            agg_dict["lon"] = "mean"
 
-    zone_meta = combined.groupby(zone_col, dropna=False).agg(agg_dict).reset_index()
+def _load_table(path: Path, columns: tuple[str, ...]) -> pd.DataFrame:
+    return TABLE_CACHE.get(
+        [path], lambda: _ensure_zone_columns(load_table(path, columns)), columns
+    )
 
-    # Renombrar columnas para estandarizar
-    rename_dict = {zone_col: "zone_id"}
 
-    # Renombrar alcaldia_catalogo y colonia_catalogo si existen
-    if "alcaldia_catalogo" in zone_meta.columns:
-        rename_dict["alcaldia_catalogo"] = "alcaldia"
-    if "colonia_catalogo" in zone_meta.columns:
-        rename_dict["colonia_catalogo"] = "colonia"
+def _query_events(
+    key: str,
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: tuple[int, ...],
+    days: tuple[str, ...],
+) -> pd.DataFrame:
+    """Eventos filtrados; fechas, horas y días se evalúan en el escaneo."""
+    filename, columns = PROCESSED_DATASETS[key]
+    path = PROCESSED_DIR / filename
+    return TABLE_CACHE.get(
+        [path],
+        lambda: _ensure_zone_columns(
+            load_events(path, date_range, hours, days, columns)
+        ),
+        "events",
+        date_range,
+        hours,
+        days,
+    )
 
-    # Renombrar coordenadas si existen
-    if "latitud" in zone_meta.columns:
-        rename_dict["latitud"] = "lat"
-    if "longitud" in zone_meta.columns:
-        rename_dict["longitud"] = "lon"
 
-    zone_meta = zone_meta.rename(columns=rename_dict)
-    return zone_meta.loc[:, ~zone_meta.columns.duplicated()]
+def _dataset_summary(path: Path) -> dict | None:
+    """Filas, rango de fechas y nulos de un parquet, desde sus metadatos."""
+    return TABLE_CACHE.get(
+        [path], lambda: dataset_summary(path, _QUALITY_COLUMNS), "summary"
+    )
 
 
 def _load_processed() -> dict[str, pd.DataFrame]:
-    def _ensure(df: pd.DataFrame | None) -> pd.DataFrame:
-        return df if df is not None else pd.DataFrame()
+    """Tablas de referencia (paradas, estaciones) con las columnas del panel.
 
-    data = {
-        "incidentes": _ensure(_load_parquet(PROCESSED_DIR / "c5_incidents.parquet")),
-        "paradas": _ensure(_load_parquet(PROCESSED_DIR / "gtfs_stops.parquet")),
-        "estaciones": _ensure(_load_parquet(PROCESSED_DIR / "ecobici_rt.parquet")),
-        "viajes": _ensure(_load_parquet(PROCESSED_DIR / "ecobici_trips.parquet")),
+    Incidentes y viajes se consultan ya filtrados con ``_query_events``.
+    """
+    return {
+        key: _load_table(PROCESSED_DIR / filename, tuple(columns))
+        for key, (filename, columns) in PROCESSED_DATASETS.items()
+        if key in ("paradas", "estaciones")
     }
 
-    # Asegurar que todas las tablas tengan ambas columnas zone_id e id_zona
-    for key in data:
-        data[key] = _ensure_zone_columns(data[key])
-
-    return data
-
 
 def _load_analytics() -> dict[str, pd.DataFrame]:
     def _ensure(df: pd.DataFrame | None) -> pd.DataFrame:
@@ -705,7 +735,20 @@ def _load_analytics() -> dict[str, pd.DataFrame]:
         ),
         "c5_daily": _ensure(_load_parquet(ANALYTICS_DIR / "c5_daily.parquet")),
         "c5_anomalies": _ensure(_load_parquet(ANALYTICS_DIR / "c5_anomalies.parquet")),
+        "c5_alerts_daily": _ensure(
+            _load_parquet(ANALYTICS_DIR / "c5_alerts_daily.parquet")
+        ),
+        "c5_alerts_hourly": _ensure(
+            _load_parquet(ANALYTICS_DIR / "c5_alerts_hourly.parquet")
+        ),
+        "c5_alerts_zone_daily": _ensure(
+            _load_parquet(ANALYTICS_DIR / "c5_alerts_zone_daily.parquet")
+        ),
+        "c5_alerts_zone_hourly": _ensure(
+            _load_parquet(ANALYTICS_DIR / "c5_alerts_zone_hourly.parquet")
+        ),
         "c5_pressure": _ensure(_load_parquet(ANALYTICS_DIR / "c5_pressure.parquet")),
+        "c5_kpi_cube": _ensure(_load_parquet(ANALYTICS_DIR / "c5_kpi_cube.parquet")),
         "trips_hourly": _ensure(
             _load_parquet(ANALYTICS_DIR / "ecobici_trips_hourly.parquet")
         ),
@@ -715,6 +758,9 @@ def _load_analytics() -> dict[str, pd.DataFrame]:
         "trips_monthly": _ensure(
             _load_parquet(ANALYTICS_DIR / "ecobici_trips_monthly.parquet")
         ),
+        "trips_kpi_cube": _ensure(
+            _load_parquet(ANALYTICS_DIR / "ecobici_trips_kpi_cube.parquet")
+        ),
         "ecobici_trips_hourly_total": _ensure(
             _load_parquet(ANALYTICS_DIR / "ecobici_trips_hourly_total.parquet")
         ),
@@ -759,35 +805,6 @@ def _load_analytics() -> dict[str, pd.DataFrame]:
     return analytics
 
 
-def _apply_filters(
-    df: pd.DataFrame,
-    date_range: tuple[pd.Timestamp, pd.Timestamp],
-    hours: list[int],
-    days: list[str],
-) -> pd.DataFrame:
-    if df.empty or "timestamp" not in df.columns:
-        return df
-    df = df.copy()
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    mask = (df["timestamp"] >= date_range[0]) & (df["timestamp"] <= date_range[1])
-    if hours:
-        mask &= df["timestamp"].dt.hour.isin(hours)
-    if days:
-        # Mapear días en español a inglés para filtrar
-        day_map = {
-            "Lunes": "Monday",
-            "Martes": "Tuesday",
-            "Miércoles": "Wednesday",
-            "Jueves": "Thursday",
-            "Viernes": "Friday",
-            "Sábado": "Saturday",
-            "Domingo": "Sunday",
-        }
-        english_days = [day_map.get(day, day) for day in days]
-        mask &= df["timestamp"].dt.day_name().isin(english_days)
-    return df[mask]
-
-
 def _compute_zoom(
     min_lon: float, max_lon: float, min_lat: float, max_lat: float
 ) -> float:
@@ -806,39 +823,29 @@ def _compute_zoom(
     return 9
 
 
-def _h3_center(cell: str) -> tuple[float, float] | None:
-    if not cell:
-        return None
-    try:
-        if hasattr(h3, "cell_to_latlng"):
-            lat, lon = h3.cell_to_latlng(cell)
-        else:
-            lat, lon = h3.h3_to_geo(cell)
-        return float(lat), float(lon)
-    except Exception:
+def _zone_geometry() -> ZoneGeometry | None:
+    """Centros y contornos H3 precalculados en ``build`` (None si faltan)."""
+    path = ANALYTICS_DIR / "zone_geometry.parquet"
+    if not path.exists():
         return None
+    return TABLE_CACHE.get([path], lambda: ZoneGeometry.read(path), "geometry")
 
 
-def _h3_resolution(cell: str) -> int | None:
-    if not cell:
-        return None
-    try:
-        if hasattr(h3, "get_resolution"):
-            return int(h3.get_resolution(cell))
-        return int(h3.h3_get_resolution(cell))
-    except Exception:
-        return None
-
+def _zone_centers(zones: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Centro ``(lat, lon)`` de cada zona, sin llamar a h3 por celda.
 
-def _h3_parent(cell: str, resolution: int) -> str | None:
-    if not cell:
-        return None
-    try:
-        if hasattr(h3, "cell_to_parent"):
-            return h3.cell_to_parent(cell, resolution)
-        return h3.h3_to_parent(cell, resolution)
-    except Exception:
-        return None
+    Las celdas que no están en ``zone_geometry.parquet`` (datos de un build
+    anterior) se calculan aparte; las zonas nulas quedan en NaN.
+    """
+    cells = zone_cells(zones)
+    geometry = _zone_geometry()
+    if geometry is None:
+        return cell_centroids(cells)
+    lat, lon = geometry.centers(cells)
+    missing = np.isnan(lat) & (cells != H3_NULL)
+    if missing.any():
+        lat[missing], lon[missing] = cell_centroids(cells[missing])
+    return lat, lon
 
 
 def _zone_heatmap(df: pd.DataFrame, value_col: str = "conteo") -> pd.DataFrame:
@@ -848,18 +855,33 @@ def _zone_heatmap(df: pd.DataFrame, value_col: str = "conteo") -> pd.DataFrame:
     if not zone_key:
         return pd.DataFrame()
     counts = df.groupby(zone_key, dropna=False).size().reset_index(name=value_col)
-    # Eliminar duplicados antes de apply
     counts = counts.loc[:, ~counts.columns.duplicated()]
-    centers = counts[zone_key].apply(_h3_center)
-    counts["lat"] = centers.apply(lambda x: x[0] if x else pd.NA)
-    counts["lon"] = centers.apply(lambda x: x[1] if x else pd.NA)
+    counts["lat"], counts["lon"] = _zone_centers(counts[zone_key])
     return counts.dropna(subset=["lat", "lon"])
 
 
+def _events_cube(cube: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Cubo KPI de ``build``; sin él (build anterior), uno de los eventos filtrados."""
+    if cube.empty and not df.empty and "timestamp" in df.columns:
+        return kpi_cube(build_cube(df))
+    return cube
+
+
 def _kpi_stats(
-    df: pd.DataFrame, label: str, date_range: tuple[pd.Timestamp, pd.Timestamp]
+    cube: pd.DataFrame,
+    df: pd.DataFrame,
+    label: str,
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: tuple[int, ...] = (),
+    days: tuple[str, ...] = (),
 ) -> dict[str, object]:
-    if df.empty or "timestamp" not in df.columns:
+    """KPI de una tarjeta a partir del cubo de ``build``.
+
+    Sin cubo (build anterior) se arma uno con los eventos ya filtrados; en
+    ese caso no hay periodo anterior y ``delta`` queda vacío.
+    """
+    cube = _events_cube(cube, df)
+    if cube.empty:
         return {
             "label": label,
             "conteo": 0,
@@ -867,36 +889,7 @@ def _kpi_stats(
             "peak_hour": None,
             "peak_day": None,
         }
-
-    df = df.copy()
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    current = df[
-        (df["timestamp"] >= date_range[0]) & (df["timestamp"] <= date_range[1])
-    ]
-
-    count = int(len(current))
-    peak_hour = None
-    peak_day = None
-    if not current.empty:
-        peak_hour = int(current["timestamp"].dt.hour.value_counts().idxmax())
-        peak_day = str(current["timestamp"].dt.day_name().value_counts().idxmax())
-
-    duration = date_range[1] - date_range[0]
-    prev_start = date_range[0] - duration
-    prev_end = date_range[0]
-    prev = df[(df["timestamp"] >= prev_start) & (df["timestamp"] < prev_end)]
-    prev_count = int(len(prev))
-    delta = None
-    if prev_count > 0:
-        delta = (count - prev_count) / prev_count
-
-    return {
-        "label": label,
-        "conteo": count,
-        "delta": delta,
-        "peak_hour": peak_hour,
-        "peak_day": peak_day,
-    }
+    return {"label": label, **kpi_summary(cube, date_range, hours, days)}
 
 
 def _kpi_card(label: str, value: str, delta: float | None = None) -> None:
@@ -948,6 +941,8 @@ def _render_insights(
     stops: pd.DataFrame,
     date_range: tuple[pd.Timestamp, pd.Timestamp],
     analytics: dict[str, pd.DataFrame],
+    hours: tuple[int, ...] = (),
+    days: tuple[str, ...] = (),
 ) -> None:
     st.subheader("Resumen Ejecutivo")
     with st.expander("Finalidad de esta vista", expanded=False):
@@ -957,8 +952,22 @@ def _render_insights(
             "Úsalo para validar que el rango seleccionado tiene datos suficientes."
         )
 
-    inc_kpi = _kpi_stats(incidents, "Incidentes", date_range)
-    trip_kpi = _kpi_stats(trips, "Viajes ECOBICI", date_range)
+    inc_kpi = _kpi_stats(
+        analytics.get("c5_kpi_cube", pd.DataFrame()),
+        incidents,
+        "Incidentes",
+        date_range,
+        hours,
+        days,
+    )
+    trip_kpi = _kpi_stats(
+        analytics.get("trips_kpi_cube", pd.DataFrame()),
+        trips,
+        "Viajes ECOBICI",
+        date_range,
+        hours,
+        days,
+    )
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -977,8 +986,11 @@ def _render_insights(
     def _load_geocode_cache() -> pd.DataFrame:
         cache_path = PROCESSED_DIR / "zone_geocoding.parquet"
         if cache_path.exists():
-            return pd.read_parquet(cache_path)
-        return pd.DataFrame(columns=["id_zona", "address"])
+            cache = pd.read_parquet(cache_path)
+        else:
+            cache = pd.DataFrame(columns=["id_zona", "address"])
+        cache["id_zona"] = cells_to_zone_array(zone_cells(cache["id_zona"]))
+        return cache
 
     def _save_geocode_cache(df: pd.DataFrame) -> None:
         cache_path = PROCESSED_DIR / "zone_geocoding.parquet"
@@ -1089,9 +1101,10 @@ def _render_insights(
             "Intente expandir el rango de fechas o quitar filtros",
         )
 
-    if not incidents.empty and "id_zona" in incidents.columns:
+    inc_zone_key = _get_zone_key(incidents)
+    if not incidents.empty and inc_zone_key:
         zone_counts = (
-            incidents.groupby("id_zona", dropna=False)
+            incidents.groupby(inc_zone_key, dropna=False)
             .size()
             .sort_values(ascending=False)
             .head(3)
@@ -1216,8 +1229,11 @@ def _render_insights(
     def _load_geocode_cache() -> pd.DataFrame:
         cache_path = PROCESSED_DIR / "zone_geocoding.parquet"
         if cache_path.exists():
-            return pd.read_parquet(cache_path)
-        return pd.DataFrame(columns=["id_zona", "address"])
+            cache = pd.read_parquet(cache_path)
+        else:
+            cache = pd.DataFrame(columns=["id_zona", "address"])
+        cache["id_zona"] = cells_to_zone_array(zone_cells(cache["id_zona"]))
+        return cache
 
     def _save_geocode_cache(df: pd.DataFrame) -> None:
         cache_path = PROCESSED_DIR / "zone_geocoding.parquet"
@@ -1252,20 +1268,17 @@ def _render_insights(
         zone_key = _get_zone_key(df)
         if not zone_key:
             return df
-        # Eliminar duplicados antes de apply
         df = df.loc[:, ~df.columns.duplicated()]
 
         # Solo intentar obtener coordenadas de H3 si parece ser celda H3 (empieza con números)
         # De lo contrario, las coordenadas vendrán del merge con zone_meta
         sample_zone = df[zone_key].iloc[0] if not df.empty else None
-        is_h3 = (
+        is_h3 = pd.api.types.is_integer_dtype(df[zone_key]) or (
             sample_zone and isinstance(sample_zone, str) and sample_zone[0].isdigit()
         )
 
         if is_h3:
-            centers = df[zone_key].apply(_h3_center)
-            df["lat"] = centers.apply(lambda x: x[0] if x else pd.NA)
-            df["lon"] = centers.apply(lambda x: x[1] if x else pd.NA)
+            df["lat"], df["lon"] = _zone_centers(df[zone_key])
 
         if zone_meta is not None and not zone_meta.empty:
             df = _merge_with_zone_meta(df, zone_meta, how="left")
@@ -1274,18 +1287,23 @@ def _render_insights(
             df = df.merge(cache, left_on=zone_key, right_on="id_zona", how="left")
             missing = df[df["address"].isna()].head(10)
             new_rows = []
-            for _, row in missing.iterrows():
-                lat = row.get("lat")
-                lon = row.get("lon")
+            # itertuples conserva el dtype entero de la celda (iterrows lo pasa a float)
+            for zone, lat, lon in missing[[zone_key, "lat", "lon"]].itertuples(
+                index=False
+            ):
                 if pd.isna(lat) or pd.isna(lon):
                     continue
                 address = _reverse_geocode(float(lat), float(lon))
                 if address:
-                    new_rows.append({"id_zona": row.get(zone_key), "address": address})
+                    new_rows.append({"id_zona": zone, "address": address})
                 time.sleep(1.0)
             if new_rows:
+                new_cache = pd.DataFrame(new_rows)
+                new_cache["id_zona"] = cells_to_zone_array(
+                    zone_cells(new_cache["id_zona"])
+                )
                 cache = pd.concat(
-                    [cache, pd.DataFrame(new_rows)], ignore_index=True
+                    [cache, new_cache], ignore_index=True
                 ).drop_duplicates("id_zona")
                 _save_geocode_cache(cache)
                 df = df.drop(columns=["address"]).merge(
@@ -1322,7 +1340,7 @@ def _render_insights(
         table = table.rename(
             columns={"alcaldia_catalogo": "alcaldia", "colonia_catalogo": "colonia"}
         )
-        table = table.drop(columns=["id_zona"], errors="ignore")
+        table = _render_zone_ids(table.drop(columns=["id_zona"], errors="ignore"))
         notes = []
         used = set()
         for _, row in table.head(5).iterrows():
@@ -1388,6 +1406,7 @@ def _render_insights(
             principales5 = principales5.rename(
                 columns={"alcaldia_catalogo": "alcaldia", "colonia_catalogo": "colonia"}
             )
+        principales5 = _render_zone_ids(principales5)
         notes = []
         used = set()
         for _, row in principales5.iterrows():
@@ -1428,6 +1447,7 @@ def _render_insights(
             low_acceso = low_acceso.rename(
                 columns={"alcaldia_catalogo": "alcaldia", "colonia_catalogo": "colonia"}
             )
+        low_acceso = _render_zone_ids(low_acceso)
         notes = []
         used = set()
         for _, row in low_acceso.iterrows():
@@ -1570,6 +1590,7 @@ def _render_insights(
                             zone_meta, left_on=zone_key, right_on=right_key, how="left"
                         )
 
+                delta = _render_zone_ids(delta)
                 notes = []
                 used = set()
                 for _, row in delta.head(6).iterrows():
@@ -1641,8 +1662,10 @@ def _render_exec_brief(
     stops: pd.DataFrame,
     date_range: tuple[pd.Timestamp, pd.Timestamp],
     analytics: dict[str, pd.DataFrame],
+    hours: tuple[int, ...] = (),
+    days: tuple[str, ...] = (),
 ) -> None:
-    _render_insights(incidents, trips, stops, date_range, analytics)
+    _render_insights(incidents, trips, stops, date_range, analytics, hours, days)
 
 
 def _render_exec_header(
@@ -1714,12 +1737,20 @@ def _render_exec_header(
         _render_notes("Alertas", alerts)
 
 
-def _render_decision_intel(incidents: pd.DataFrame) -> None:
+def _render_decision_intel(
+    incidents: pd.DataFrame,
+    analytics: dict[str, pd.DataFrame],
+    date_range: tuple[pd.Timestamp, pd.Timestamp],
+    hours: tuple[int, ...] = (),
+    days: tuple[str, ...] = (),
+) -> None:
     st.subheader("Alertas y Prioridades")
     with st.expander("Finalidad de esta vista", expanded=False):
         st.markdown(
             "Identificar zonas y periodos que requieren atencion inmediata: "
-            "picos estadisticos, crecimiento semana a semana y persistencia de hotspots."
+            "picos frente a la linea base estacional (dia de semana x hora, "
+            "calculada en build), crecimiento semana a semana y persistencia "
+            "de hotspots."
         )
 
     if incidents.empty or "timestamp" not in incidents.columns:
@@ -1736,62 +1767,89 @@ def _render_decision_intel(incidents: pd.DataFrame) -> None:
     zone_key = _get_zone_key(df)
     zone_meta = _load_zone_metadata_v4()
 
-    daily_total = (
-        df.groupby(df["timestamp"].dt.date).size().rename("count").reset_index()
+    # Alertas de la linea base estacional calculadas en build; con filtro de
+    # hora se usan los niveles horarios.
+    level = "hourly" if hours else "daily"
+    daily_alerts = filter_alerts(
+        analytics.get(f"c5_alerts_{level}", pd.DataFrame()), date_range, hours, days
     )
-    daily_total["zscore"] = (daily_total["count"] - daily_total["count"].mean()) / (
-        daily_total["count"].std(ddof=0) + 1e-6
-    )
-    top_daily = daily_total.sort_values("zscore", ascending=False).head(5)
     notes = []
-    for _, row in top_daily.iterrows():
-        severity = "note-high" if row["zscore"] >= 2 else "note-med"
+    for _, row in (
+        daily_alerts.sort_values("zscore", ascending=False).head(5).iterrows()
+    ):
+        severity = "note-high" if row["zscore"] >= 5 else "note-med"
+        when = pd.Timestamp(row["date"]).date()
+        if "hour" in row.index:
+            when = f"{when} {int(row['hour']):02d}:00"
         notes.append(
             {
-                "title": f"Fecha {row['timestamp']}",
-                "body": f"Incidentes: {int(row['count']):,} | z={row['zscore']:.2f}",
+                "title": f"Fecha {when}",
+                "body": (
+                    f"Incidentes: {int(row['count']):,} | "
+                    f"esperado {row['expected']:.0f} | z={row['zscore']:.2f}"
+                ),
                 "severity": severity,
             }
         )
-    _render_notes("Picos diarios (alertas)", notes)
-
-    if not zone_key:
-        st.info("No hay zona para calcular crecimiento o persistencia.")
-        return
+    if notes:
+        _render_notes("Picos diarios (alertas)", notes)
+    else:
+        st.info("Sin picos diarios frente a la linea base estacional.")
 
-    daily = (
-        df.groupby([df["timestamp"].dt.date, zone_key])
-        .size()
-        .reset_index(name="count")
-        .rename(columns={"timestamp": "date"})
+    zone_alerts = filter_alerts(
+        analytics.get(f"c5_alerts_zone_{level}", pd.DataFrame()),
+        date_range,
+        hours,
+        days,
     )
-    daily["date"] = pd.to_datetime(daily["date"], errors="coerce")
-    total_days = daily["date"].nunique()
-
-    if total_days >= 14:
-        last_date = daily["date"].max()
-        last_7_start = last_date - pd.Timedelta(days=6)
-        prev_7_start = last_date - pd.Timedelta(days=13)
-        prev_7_end = last_date - pd.Timedelta(days=7)
-
-        last7 = daily[(daily["date"] >= last_7_start) & (daily["date"] <= last_date)]
-        prev7 = daily[(daily["date"] >= prev_7_start) & (daily["date"] <= prev_7_end)]
-
-        last7_sum = last7.groupby(zone_key)["count"].sum().rename("last7")
-        prev7_sum = prev7.groupby(zone_key)["count"].sum().rename("prev7")
-        growth = pd.concat([last7_sum, prev7_sum], axis=1).fillna(0)
-        growth["delta_pct"] = (growth["last7"] - growth["prev7"]) / (
-            growth["prev7"] + 1
-        )
-        growth = growth.reset_index().sort_values("delta_pct", ascending=False).head(6)
-
+    if not zone_alerts.empty:
+        zone_alerts = zone_alerts.sort_values("zscore", ascending=False).head(6)
+        if not zone_meta.empty:
+            zone_alerts = _merge_with_zone_meta(zone_alerts, zone_meta)
+        zone_alerts = _render_zone_ids(zone_alerts)
+        notes = []
+        for _, row in zone_alerts.iterrows():
+            label = (
+                row.get("alcaldia")
+                or row.get("colonia")
+                or row.get("zone_id")
+                or "Zona"
+            )
+            severity = "note-high" if row["zscore"] >= 5 else "note-med"
+            when = pd.Timestamp(row["date"]).date()
+            if "hour" in row.index:
+                when = f"{when} {int(row['hour']):02d}:00"
+            notes.append(
+                {
+                    "title": str(label),
+                    "body": (
+                        f"{when} | "
+                        f"Incidentes: {int(row['count']):,} | "
+                        f"esperado {row['expected']:.1f} | z={row['zscore']:.2f}"
+                    ),
+                    "severity": severity,
+                }
+            )
+        _render_notes("Alertas por zona (linea base estacional)", notes)
+
+    # Crecimiento 7 vs 7 dias sumando el cubo KPI de build con los mismos filtros.
+    growth = zone_growth(
+        _events_cube(analytics.get("c5_kpi_cube", pd.DataFrame()), df),
+        date_range,
+        hours,
+        days,
+    ).head(6)
+    if not growth.empty:
         if not zone_meta.empty:
             growth = _merge_with_zone_meta(growth, zone_meta)
-
+        growth = _render_zone_ids(growth)
         notes = []
         for _, row in growth.iterrows():
             label = (
-                row.get("alcaldia") or row.get("colonia") or row.get(zone_key) or "Zona"
+                row.get("alcaldia")
+                or row.get("colonia")
+                or row.get("zone_id")
+                or "Zona"
             )
             pct = row.get("delta_pct", 0)
             severity = (
@@ -1808,6 +1866,19 @@ def _render_decision_intel(incidents: pd.DataFrame) -> None:
     else:
         st.info("Se requieren al menos 14 dias para crecimiento semana a semana.")
 
+    if not zone_key:
+        st.info("No hay zona para calcular persistencia.")
+        return
+
+    daily = (
+        df.groupby([df["timestamp"].dt.date, zone_key])
+        .size()
+        .reset_index(name="count")
+        .rename(columns={"timestamp": "date"})
+    )
+    daily["date"] = pd.to_datetime(daily["date"], errors="coerce")
+    total_days = daily["date"].nunique()
+
     if total_days >= 5:
         top = daily.sort_values(["date", "count"], ascending=[True, False]).copy()
         top["rank"] = top.groupby("date")["count"].rank(method="first", ascending=False)
@@ -1817,6 +1888,7 @@ def _render_decision_intel(incidents: pd.DataFrame) -> None:
         persistence = persistence.sort_values("persistence", ascending=False).head(6)
         if not zone_meta.empty:
             persistence = _merge_with_zone_meta(persistence, zone_meta)
+        persistence = _render_zone_ids(persistence)
 
         notes = []
         for _, row in persistence.iterrows():
@@ -2012,6 +2084,28 @@ def _render_trends(incidents: pd.DataFrame, trips: pd.DataFrame) -> None:
         st.plotly_chart(fig, width="stretch", key="trend_dow")
 
 
+def _load_ppi_scores(
+    resolution: int, window: str, weight_set: str
+) -> pd.DataFrame | None:
+    """Lee solo la particion (resolucion, ventana, pesos) de ppi_scores."""
+    path = ANALYTICS_DIR / "ppi_scores.parquet"
+    if not path.exists():
+        return None
+
+    def _read() -> pd.DataFrame:
+        scores = pd.read_parquet(
+            path,
+            filters=[
+                ("resolution", "=", resolution),
+                ("window", "=", window),
+                ("weight_set", "=", weight_set),
+            ],
+        )
+        return scores.drop(columns=["resolution", "window", "weight_set"])
+
+    return TABLE_CACHE.get([path], _read, resolution, window, weight_set)
+
+
 def _render_ppi(analytics: dict[str, pd.DataFrame]) -> None:
     st.subheader("Indice de Prioridad")
     with st.expander("Finalidad de esta vista", expanded=False):
@@ -2019,6 +2113,27 @@ def _render_ppi(analytics: dict[str, pd.DataFrame]) -> None:
             "Priorizar zonas de intervencion combinando incidentes y exposicion."
         )
     ppi = analytics.get("ppi", pd.DataFrame())
+    try:
+        ppi_config = load_ppi_config()
+    except ConfigError:
+        ppi_config = None
+    if ppi_config is not None:
+        col_res, col_window, col_weights = st.columns(3)
+        resolution = col_res.selectbox(
+            "Resolución H3",
+            [DEFAULT_H3_RESOLUTION, *H3_PYRAMID_RESOLUTIONS],
+            help="Las resoluciones menores agrupan zonas vecinas (precalculadas en build).",
+            key="ppi_resolution",
+        )
+        window = col_window.selectbox(
+            "Ventana", list(ppi_config.windows), key="ppi_window"
+        )
+        weight_set = col_weights.selectbox(
+            "Pesos", list(ppi_config.weight_sets), key="ppi_weight_set"
+        )
+        scores = _load_ppi_scores(resolution, window, weight_set)
+        if scores is not None:
+            ppi = _ensure_zone_columns(scores)
     if not ppi.empty and "zone_id" in ppi.columns:
         ppi = ppi.rename(columns={"zone_id": "id_zona"})
     if ppi.empty:
@@ -2455,9 +2570,7 @@ def _render_forecast_xgb(incidents: pd.DataFrame) -> None:
         )
 
 
-def _render_data_quality(
-    data: dict[str, pd.DataFrame], analytics: dict[str, pd.DataFrame]
-) -> None:
+def _render_data_quality(analytics: dict[str, pd.DataFrame]) -> None:
     st.subheader("Calidad y Procesamiento")
     with st.expander("Finalidad de esta vista", expanded=False):
         st.markdown(
@@ -2465,20 +2578,22 @@ def _render_data_quality(
             "y el estado de los analiticos clave."
         )
 
+    # Cobertura y completitud salen de los metadatos parquet (sin leer datos).
     dataset_map = {
-        "Incidentes C5": data.get("incidentes", pd.DataFrame()),
-        "Viajes ECOBICI": data.get("viajes", pd.DataFrame()),
-        "Paradas (GTFS)": data.get("paradas", pd.DataFrame()),
-        "Estaciones ECOBICI": data.get("estaciones", pd.DataFrame()),
+        "Incidentes C5": _dataset_summary(PROCESSED_DIR / "c5_incidents.parquet"),
+        "Viajes ECOBICI": _dataset_summary(PROCESSED_DIR / "ecobici_trips.parquet"),
+        "Paradas (GTFS)": _dataset_summary(PROCESSED_DIR / "gtfs_stops.parquet"),
+        "Estaciones ECOBICI": _dataset_summary(PROCESSED_DIR / "ecobici_rt.parquet"),
     }
 
     coverage_rows = []
-    for name, df in dataset_map.items():
-        if df.empty or "timestamp" not in df.columns:
+    for name, summary in dataset_map.items():
+        rows = summary["rows"] if summary is not None else 0
+        if summary is None or summary["start"] is None:
             coverage_rows.append(
                 {
                     "Dataset": name,
-                    "Registros": len(df),
+                    "Registros": rows,
                     "Desde": "n/d",
                     "Hasta": "n/d",
                     "Dias cubiertos": "n/d",
@@ -2486,27 +2601,14 @@ def _render_data_quality(
                 }
             )
             continue
-        ts = pd.to_datetime(df["timestamp"], errors="coerce").dropna()
-        if ts.empty:
-            coverage_rows.append(
-                {
-                    "Dataset": name,
-                    "Registros": len(df),
-                    "Desde": "n/d",
-                    "Hasta": "n/d",
-                    "Dias cubiertos": "n/d",
-                    "Frescura (dias)": "n/d",
-                }
-            )
-            continue
-        start = ts.min().date()
-        end = ts.max().date()
+        start = summary["start"].date()
+        end = summary["end"].date()
         days = (end - start).days + 1
         freshness = (pd.Timestamp.now().date() - end).days
         coverage_rows.append(
             {
                 "Dataset": name,
-                "Registros": len(df),
+                "Registros": rows,
                 "Desde": start,
                 "Hasta": end,
                 "Dias cubiertos": days,
@@ -2518,21 +2620,12 @@ def _render_data_quality(
     st.dataframe(_display_df(pd.DataFrame(coverage_rows)), width="stretch")
 
     missing_rows = []
-    key_columns = [
-        "timestamp",
-        "id_zona",
-        "zone_id",
-        "lat",
-        "lon",
-        "alcaldia_catalogo",
-        "colonia_catalogo",
-    ]
-    for name, df in dataset_map.items():
-        if df.empty:
+    for name, summary in dataset_map.items():
+        if summary is None or not summary["rows"]:
             continue
-        for col in key_columns:
-            if col in df.columns:
-                missing_pct = float(df[col].isna().mean() * 100)
+        for col in _QUALITY_COLUMNS:
+            if col in summary["nulls"]:
+                missing_pct = float(summary["nulls"][col] / summary["rows"] * 100)
                 missing_rows.append(
                     {
                         "Dataset": name,
@@ -2623,11 +2716,10 @@ def main() -> None:
         data = _load_processed()
         analytics = _load_analytics()
 
-    incidents = data["incidentes"]
-    if not incidents.empty and "timestamp" in incidents.columns:
-        incidents["timestamp"] = pd.to_datetime(incidents["timestamp"], errors="coerce")
-        min_date = incidents["timestamp"].min()
-        max_date = incidents["timestamp"].max()
+    incident_summary = _dataset_summary(PROCESSED_DIR / "c5_incidents.parquet")
+    if incident_summary is not None and incident_summary["start"] is not None:
+        min_date = incident_summary["start"]
+        max_date = incident_summary["end"]
     else:
         min_date = pd.Timestamp("2020-01-01")
         max_date = pd.Timestamp("2020-12-31")
@@ -2736,13 +2828,11 @@ def main() -> None:
                         errors.append(f"Ingesta: {exc}")
                 if run_build:
                     try:
-                        from mobility_pulse.transform.standardize import standardize_all
-                        from mobility_pulse.analytics.aggregates import build_analytics
-                        from mobility_pulse.analytics.ppi import build_ppi
+                        from mobility_pulse.pipeline import build_tasks, run_tasks
 
-                        standardize_all()
-                        build_analytics()
-                        build_ppi()
+                        # Mismo grafo que ``mobility_pulse build``: omite los
+                        # pasos al día y registra sus huellas.
+                        run_tasks(build_tasks())
                     except Exception as exc:
                         errors.append(f"Analíticos: {exc}")
             if errors:
@@ -2750,13 +2840,14 @@ def main() -> None:
             if warnings and not errors:
                 st.warning("\n".join(warnings))
             if not errors:
+                # La caché compartida recarga solo las tablas reescritas.
                 st.success("Actualización completada. Recargando panel...")
-                st.cache_data.clear()
-                st.cache_resource.clear()
                 st.rerun()
     date_tuple = (pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))
-    incidents_filtered = _apply_filters(data["incidentes"], date_tuple, hours, days)
-    trips_filtered = _apply_filters(data["viajes"], date_tuple, hours, days)
+    incidents_filtered = _query_events(
+        "incidentes", date_tuple, tuple(hours), tuple(days)
+    )
+    trips_filtered = _query_events("viajes", date_tuple, tuple(hours), tuple(days))
 
     _render_exec_header(incidents_filtered, trips_filtered, analytics)
 
@@ -2775,7 +2866,13 @@ def main() -> None:
             '<div class="section-title">Resumen Ejecutivo</div>', unsafe_allow_html=True
         )
         _render_exec_brief(
-            incidents_filtered, trips_filtered, data["paradas"], date_tuple, analytics
+            incidents_filtered,
+            trips_filtered,
+            data["paradas"],
+            date_tuple,
+            analytics,
+            tuple(hours),
+            tuple(days),
         )
 
     with tabs[1]:
@@ -2783,7 +2880,9 @@ def main() -> None:
             '<div class="section-title">Alertas y Prioridades</div>',
             unsafe_allow_html=True,
         )
-        _render_decision_intel(incidents_filtered)
+        _render_decision_intel(
+            incidents_filtered, analytics, date_tuple, tuple(hours), tuple(days)
+        )
         with st.expander("Indice de Prioridad (detalle)", expanded=False):
             _render_ppi(analytics)
 
@@ -2805,7 +2904,7 @@ def main() -> None:
             '<div class="section-title">Calidad y Procesamiento</div>',
             unsafe_allow_html=True,
         )
-        _render_data_quality(data, analytics)
+        _render_data_quality(analytics)
 
 
 if __name__ == "__main__":
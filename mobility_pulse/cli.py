@@ -9,15 +9,16 @@ import sys
 from pathlib import Path
 
 from mobility_pulse import config
-from mobility_pulse.analytics.aggregates import build_analytics
-from mobility_pulse.analytics.ppi import build_ppi
 from mobility_pulse.ingest.c5 import ingest_c5
 from mobility_pulse.ingest.ecobici_rt import ingest_ecobici_rt
-from mobility_pulse.ingest.ecobici_trips import ingest_ecobici_trips
+from mobility_pulse.ingest.ecobici_trips import (
+    ingest_ecobici_trips,
+    ingest_ecobici_trips_months,
+)
 from mobility_pulse.ingest.gps_cdmx import ingest_gps_cdmx
 from mobility_pulse.ingest.gtfs import ingest_gtfs
 from mobility_pulse.logging_config import setup_logging
-from mobility_pulse.transform.standardize import standardize_all
+from mobility_pulse.pipeline import build_tasks, run_tasks
 from mobility_pulse.validate.quality_report import generate_report
 
 LOGGER = logging.getLogger(__name__)
@@ -33,12 +34,69 @@ def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         required=True,
         choices=["gtfs", "c5", "ecobici_rt", "ecobici_trips", "gps_cdmx"],
     )
-    ingest_parser.add_argument("--snapshots", type=int, default=1)
+    ingest_parser.add_argument(
+        "--snapshots",
+        type=int,
+        default=1,
+        help="ecobici_rt only: ticks to poll (0 only imports legacy snapshots)",
+    )
     ingest_parser.add_argument("--interval_sec", type=int, default=300)
+    ingest_parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="ecobici_rt only: poll until interrupted (ignores --snapshots)",
+    )
     ingest_parser.add_argument("--limit_rows", type=int, default=None)
+    ingest_parser.add_argument(
+        "--months",
+        nargs="+",
+        default=None,
+        help="ecobici_trips only: months as YYYY-MM or YYYY-MM:YYYY-MM ranges",
+    )
+    ingest_parser.add_argument(
+        "--prune_months",
+        action="store_true",
+        help="ecobici_trips only: drop ingested months outside --months",
+    )
+    ingest_parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Concurrent months (ecobici_trips) or GTFS worker processes",
+    )
 
     subparsers.add_parser("validate", help="Run data validation")
-    subparsers.add_parser("build", help="Run transforms and analytics")
+    build_parser = subparsers.add_parser("build", help="Run transforms and analytics")
+    build_parser.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=None,
+        help="Stream the C5 CSV in chunks of this many rows (bounded memory)",
+    )
+    build_parser.add_argument(
+        "--full",
+        action="store_true",
+        help=(
+            "Rerun every task and recount all analytics (ignore fingerprints). "
+            "Needed for anomaly alerts to see late rows older than 7 days"
+        ),
+    )
+    build_parser.add_argument(
+        "--isochrones",
+        action="store_true",
+        help="Also route GTFS + walking travel times between zones (slow)",
+    )
+    build_parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Also write the data quality report from the same loaded datasets",
+    )
+    build_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for independent build tasks (default: all CPUs)",
+    )
     subparsers.add_parser("app", help="Run Streamlit app")
     subparsers.add_parser("report", help="Generate PDF report")
     subparsers.add_parser("clean", help="Remove generated files")
@@ -59,11 +117,21 @@ def main(argv: list[str] | None = None) -> None:
 
     if args.command == "ingest":
         if args.source == "gtfs":
-            ingest_gtfs()
+            ingest_gtfs(workers=args.workers)
         elif args.source == "c5":
             ingest_c5()
         elif args.source == "ecobici_rt":
-            ingest_ecobici_rt(snapshots=args.snapshots, interval_sec=args.interval_sec)
+            ingest_ecobici_rt(
+                snapshots=None if args.daemon else args.snapshots,
+                interval_sec=args.interval_sec,
+            )
+        elif args.source == "ecobici_trips" and args.months:
+            ingest_ecobici_trips_months(
+                args.months,
+                limit_rows=args.limit_rows,
+                workers=args.workers,
+                prune=args.prune_months,
+            )
         elif args.source == "ecobici_trips":
             ingest_ecobici_trips(limit_rows=args.limit_rows)
         elif args.source == "gps_cdmx":
@@ -77,9 +145,13 @@ def main(argv: list[str] | None = None) -> None:
         return
 
     if args.command == "build":
-        standardize_all()
-        build_analytics()
-        build_ppi()
+        tasks = build_tasks(
+            chunk_rows=args.chunk_rows,
+            full=args.full,
+            isochrones=args.isochrones,
+            validate=args.validate,
+        )
+        run_tasks(tasks, workers=args.workers, force=args.full)
         return
 
     if args.command == "app":
@@ -11,6 +11,7 @@ import yaml
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 CONFIG_PATH = ROOT_DIR / "config" / "datasets.yml"
+PPI_CONFIG_PATH = ROOT_DIR / "config" / "ppi.yml"
 DATA_DIR = ROOT_DIR / "data"
 RAW_DIR = DATA_DIR / "raw"
 PROCESSED_DIR = DATA_DIR / "processed"
@@ -25,7 +26,11 @@ CDMX_BBOX = {
 }
 
 DEFAULT_H3_RESOLUTION = 9
+# Parent resolutions published next to every zone table (finest first).
+H3_PYRAMID_RESOLUTIONS = (8, 7, 6)
 DEFAULT_TIMEZONE = "America/Mexico_City"
+# Memory budget of the dashboard's process-wide table cache (LRU beyond it).
+APP_CACHE_BYTES = int(os.getenv("MOBILITY_PULSE_APP_CACHE_MB", "1024")) * 1024**2
 
 # Silence pandera deprecation warning noise in CLI/app output.
 os.environ.setdefault("DISABLE_PANDERA_IMPORT_WARNING", "True")
@@ -37,6 +42,8 @@ class DatasetConfig:
     url: str
     description: str | list[str] | None = None
     keywords: list[str] | None = None
+    monthly_url: str | None = None
+    columns: list[str] | None = None
 
 
 class ConfigError(RuntimeError):
@@ -58,15 +65,48 @@ def load_datasets(path: Path | None = None) -> dict[str, DatasetConfig]:
         keywords = payload.get("keywords")
         if keywords is not None and not isinstance(keywords, list):
             keywords = [str(keywords)]
+        columns = payload.get("columns")
+        if columns is not None and not isinstance(columns, list):
+            columns = [str(columns)]
         datasets[name] = DatasetConfig(
             name=name,
             url=url,
             description=payload.get("description"),
             keywords=keywords,
+            columns=columns,
+            monthly_url=os.getenv(
+                f"MOBILITY_PULSE_{name.upper()}_MONTHLY_URL", payload.get("monthly_url")
+            ),
         )
     return datasets
 
 
+@dataclass(frozen=True)
+class PPIConfig:
+    windows: dict[str, int | None]
+    weight_sets: dict[str, dict[str, float]]
+
+
+def load_ppi_config(path: Path | None = None) -> PPIConfig:
+    """Load PPI time windows and weight sets from YAML."""
+    config_path = path or PPI_CONFIG_PATH
+    if not config_path.exists():
+        raise ConfigError(f"Missing config file: {config_path}")
+
+    raw = yaml.safe_load(config_path.read_text(encoding="utf-8")) or {}
+    windows = {
+        str(name): None if days is None else int(days)
+        for name, days in (raw.get("windows") or {"all": None}).items()
+    }
+    weight_sets = {
+        str(name): {str(k): float(v) for k, v in (weights or {}).items()}
+        for name, weights in (raw.get("weight_sets") or {}).items()
+    }
+    if not weight_sets:
+        raise ConfigError(f"No PPI weight_sets defined in {config_path}")
+    return PPIConfig(windows=windows, weight_sets=weight_sets)
+
+
 def get_dataset_url(name: str, datasets: dict[str, DatasetConfig] | None = None) -> str:
     """Get dataset URL by name, with env override applied."""
     datasets = datasets or load_datasets()
@@ -0,0 +1,93 @@
+"""Processed datasets shared between the steps of one build.
+
+``mobility_pulse build`` runs standardize, analytics, PPI and validation in
+turn, and each step used to decode the same processed parquet files on its
+own. A ``BuildContext`` loads each dataset once (memory-mapped), only for
+the columns asked for so far, and hands every later step the cached frame.
+Steps that rewrite a dataset invalidate it so readers see the new version.
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from mobility_pulse.config import PROCESSED_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BuildContext:
+    """Lazy, column-projected cache of processed datasets.
+
+    Datasets are addressed by stem (``"c5_incidents"`` for
+    ``c5_incidents.parquet``). Frames returned by ``frame`` share memory with
+    the cache; with pandas copy-on-write, callers may still modify them
+    freely.
+
+    Attributes:
+        processed_dir: Directory holding the processed datasets.
+        cubes: Event cubes of this build by dataset name (see
+            ``analytics.cube.update_cube``), shared by analytics and PPI.
+    """
+
+    def __init__(self, processed_dir: Path | None = None) -> None:
+        self.processed_dir = processed_dir or PROCESSED_DIR
+        self.cubes: dict[str, pd.DataFrame] = {}
+        self._frames: dict[str, pd.DataFrame] = {}
+        self._schemas: dict[str, list[str]] = {}
+
+    def path(self, name: str) -> Path:
+        return self.processed_dir / f"{name}.parquet"
+
+    def exists(self, name: str) -> bool:
+        return self.path(name).exists()
+
+    def columns(self, name: str) -> list[str]:
+        """Column names of a dataset (empty when it does not exist)."""
+        if name not in self._schemas:
+            path = self.path(name)
+            self._schemas[name] = (
+                ds.dataset(path, format="parquet", partitioning="hive").schema.names
+                if path.exists()
+                else []
+            )
+        return self._schemas[name]
+
+    def frame(self, name: str, columns: list[str] | None = None) -> pd.DataFrame | None:
+        """Return ``columns`` of a dataset (all when None), reading each once.
+
+        Columns missing from the dataset are skipped. Returns None (with a
+        warning) when the dataset does not exist.
+        """
+        available = self.columns(name)
+        if not available:
+            LOGGER.warning("Missing processed file: %s", self.path(name))
+            return None
+        wanted = (
+            available if columns is None else [c for c in columns if c in available]
+        )
+        cached = self._frames.get(name)
+        missing = [c for c in wanted if cached is None or c not in cached.columns]
+        if missing:
+            loaded = self._read(name, missing)
+            cached = loaded if cached is None else pd.concat([cached, loaded], axis=1)
+            self._frames[name] = cached
+            LOGGER.debug("%s: loaded %s columns", name, len(missing))
+        return cached[wanted]
+
+    def _read(self, name: str, columns: list[str]) -> pd.DataFrame:
+        return pd.read_parquet(self.path(name), columns=columns, memory_map=True)
+
+    def invalidate(self, name: str | None = None) -> None:
+        """Forget a rewritten dataset (all datasets and cubes when None)."""
+        if name is None:
+            self._frames.clear()
+            self._schemas.clear()
+            self.cubes.clear()
+            return
+        self._frames.pop(name, None)
+        self._schemas.pop(name, None)
@@ -6,9 +6,9 @@ import logging
 from pathlib import Path
 
 import pandas as pd
-import requests
 
 from mobility_pulse.config import RAW_DIR, get_dataset_url
+from mobility_pulse.ingest.download import download
 
 LOGGER = logging.getLogger(__name__)
 
@@ -21,12 +21,9 @@ def ingest_c5() -> Path:
 
     csv_path = raw_dir / "c5_incidents.csv"
     LOGGER.info("Downloading C5 incidents from %s", url)
-    with requests.get(url, stream=True, timeout=60) as response:
-        response.raise_for_status()
-        with csv_path.open("wb") as handle:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    handle.write(chunk)
+    result = download(url, csv_path)
+    if not result.changed:
+        return csv_path
 
     try:
         _ = pd.read_csv(csv_path, nrows=5)
@@ -0,0 +1,255 @@
+"""Shared HTTP download manager for ingest modules.
+
+Downloads are incremental and crash-safe:
+
+- Conditional GETs (``If-None-Match`` / ``If-Modified-Since``) skip files the
+  server reports as unchanged (HTTP 304).
+- Interrupted downloads are kept as ``<name>.part`` and resumed with an HTTP
+  ``Range`` request guarded by ``If-Range``.
+- Completed files are moved into place with an atomic rename.
+- ``RAW_DIR/download_manifest.json`` records url, size, sha256, validators and
+  fetch time for every file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import requests
+
+from mobility_pulse.config import RAW_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+_MANIFEST_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class DownloadResult:
+    path: Path
+    changed: bool
+    size: int
+    sha256: str | None
+
+
+def manifest_path() -> Path:
+    return RAW_DIR / "download_manifest.json"
+
+
+def _manifest_key(path: Path) -> str:
+    try:
+        return path.resolve().relative_to(RAW_DIR.resolve()).as_posix()
+    except ValueError:
+        return str(path.resolve())
+
+
+def load_manifest() -> dict[str, dict[str, Any]]:
+    """Return the download manifest (empty if missing or unreadable)."""
+    path = manifest_path()
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        LOGGER.warning("Ignoring unreadable manifest %s: %s", path, exc)
+        return {}
+
+
+def manifest_entry(path: Path) -> dict[str, Any] | None:
+    """Return the manifest entry for a downloaded file, if any."""
+    return load_manifest().get(_manifest_key(path))
+
+
+def _update_manifest(path: Path, entry: dict[str, Any]) -> None:
+    with _MANIFEST_LOCK:
+        manifest = load_manifest()
+        manifest[_manifest_key(path)] = entry
+        target = manifest_path()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, target)
+
+
+def _hash_file_into(digest: Any, path: Path) -> None:
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(block)
+
+
+def _conditional_headers(
+    entry: dict[str, Any] | None, url: str, dest: Path, **match: Any
+) -> dict[str, str]:
+    headers: dict[str, str] = {}
+    if (
+        not entry
+        or entry.get("url") != url
+        or not dest.exists()
+        or dest.stat().st_size != entry.get("size")
+        or any(entry.get(key) != value for key, value in match.items())
+    ):
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _finalize(
+    part: Path,
+    dest: Path,
+    url: str,
+    sha256: str,
+    validators: dict[str, str | None],
+    **extra: Any,
+) -> DownloadResult:
+    os.replace(part, dest)
+    size = dest.stat().st_size
+    _update_manifest(
+        dest,
+        {
+            "url": url,
+            "size": size,
+            "sha256": sha256,
+            "fetched_at": datetime.now().astimezone().isoformat(),
+            **validators,
+            **extra,
+        },
+    )
+    LOGGER.info("Downloaded %s (%s bytes)", dest, f"{size:,}")
+    return DownloadResult(dest, True, size, sha256)
+
+
+def _part_paths(dest: Path) -> tuple[Path, Path]:
+    part = dest.with_name(dest.name + ".part")
+    return part, part.with_name(part.name + ".json")
+
+
+def _validators(response: requests.Response) -> dict[str, str | None]:
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def download(
+    url: str,
+    dest: Path,
+    params: dict[str, Any] | None = None,
+    timeout: int = 60,
+    force: bool = False,
+) -> DownloadResult:
+    """Download ``url`` to ``dest`` incrementally.
+
+    Args:
+        url: Resource URL.
+        dest: Final file path.
+        params: Optional query parameters.
+        timeout: Request timeout in seconds.
+        force: Ignore the manifest and any partial file; always fetch in full.
+
+    Returns:
+        DownloadResult; ``changed`` is False when the server answered 304.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part, part_meta = _part_paths(dest)
+    entry = manifest_entry(dest)
+    if force:
+        part.unlink(missing_ok=True)
+        part_meta.unlink(missing_ok=True)
+
+    headers = {} if force else _conditional_headers(entry, url, dest, max_rows=None)
+
+    offset = 0
+    if part.exists() and part_meta.exists():
+        meta = json.loads(part_meta.read_text(encoding="utf-8"))
+        validator = meta.get("etag") or meta.get("last_modified")
+        if meta.get("url") == url and validator:
+            offset = part.stat().st_size
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+
+    with requests.get(
+        url, params=params, headers=headers, stream=True, timeout=timeout
+    ) as response:
+        if response.status_code == 304:
+            LOGGER.info("Not modified, skipping download: %s", url)
+            return DownloadResult(dest, False, entry["size"], entry.get("sha256"))
+        if response.status_code == 416:
+            # Stale partial larger than the resource; start over.
+            part.unlink(missing_ok=True)
+            part_meta.unlink(missing_ok=True)
+            return download(url, dest, params=params, timeout=timeout, force=True)
+        response.raise_for_status()
+
+        validators = _validators(response)
+        resumed = response.status_code == 206 and offset > 0
+        if resumed:
+            LOGGER.info("Resuming %s at byte %s", url, f"{offset:,}")
+        else:
+            offset = 0
+        part_meta.write_text(json.dumps({"url": url, **validators}), encoding="utf-8")
+
+        digest = hashlib.sha256()
+        if resumed:
+            _hash_file_into(digest, part)
+        with part.open("ab" if resumed else "wb") as handle:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    handle.write(chunk)
+                    digest.update(chunk)
+
+    result = _finalize(part, dest, url, digest.hexdigest(), validators)
+    part_meta.unlink(missing_ok=True)
+    return result
+
+
+def download_rows(
+    url: str, dest: Path, max_rows: int, timeout: int = 60
+) -> DownloadResult:
+    """Download the header plus the first ``max_rows`` lines of a CSV resource.
+
+    The HTTP stream is closed as soon as enough rows have been written, so the
+    cost is proportional to ``max_rows`` rather than the file size. Assumes
+    records contain no embedded newlines.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part, _ = _part_paths(dest)
+    headers = _conditional_headers(manifest_entry(dest), url, dest, max_rows=max_rows)
+
+    remaining = max_rows + 1  # header line
+    digest = hashlib.sha256()
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            LOGGER.info("Not modified, skipping download: %s", url)
+            entry = manifest_entry(dest) or {}
+            return DownloadResult(dest, False, entry["size"], entry.get("sha256"))
+        response.raise_for_status()
+        validators = _validators(response)
+        with part.open("wb") as handle:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                newlines = chunk.count(b"\n")
+                if newlines >= remaining:
+                    cut = -1
+                    for _ in range(remaining):
+                        cut = chunk.index(b"\n", cut + 1)
+                    chunk = chunk[: cut + 1]
+                    remaining = 0
+                else:
+                    remaining -= newlines
+                handle.write(chunk)
+                digest.update(chunk)
+                if remaining == 0:
+                    break
+    LOGGER.info("Stopped stream after %s rows: %s", f"{max_rows:,}", url)
+    return _finalize(part, dest, url, digest.hexdigest(), validators, max_rows=max_rows)
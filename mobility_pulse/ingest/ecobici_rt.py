@@ -1,21 +1,38 @@
-"""ECOBICI real-time (GBFS) ingest logic."""
+"""ECOBICI real-time (GBFS) ingest logic.
+
+Each poll ("tick") fetches only ``station_status``; the GBFS root and
+``station_information`` are cached on disk and refetched when their GBFS
+``last_updated + ttl`` has passed (and at most every ``info_refresh_sec``).
+Every tick is flushed straight into the delta-encoded station history
+(see ``station_history``) under ``raw/ecobici/rt/history``, so a
+long-running poller keeps constant memory and a crash loses at most one tick.
+"""
 
 from __future__ import annotations
 
 import json
 import logging
+import os
+import signal
+import threading
 import time
-from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 import pandas as pd
 import requests
 
-from mobility_pulse.config import RAW_DIR, get_dataset_url
+from mobility_pulse.config import DEFAULT_TIMEZONE, RAW_DIR, get_dataset_url
+from mobility_pulse.ingest.station_history import StationHistory
+from mobility_pulse.storage import remove_path
 
 LOGGER = logging.getLogger(__name__)
 
+INFO_REFRESH_SEC = 3600
+
+# Errors a daemon tick logs and survives (network, bad payloads, disk).
+_TICK_ERRORS = (requests.RequestException, ValueError, KeyError, RuntimeError, OSError)
+
 
 def _fetch_json(url: str) -> dict[str, Any]:
     with requests.get(url, timeout=30) as response:
@@ -38,58 +55,164 @@ def _resolve_gbfs_links(payload: dict[str, Any]) -> dict[str, str]:
     return {}
 
 
-def ingest_ecobici_rt(snapshots: int = 1, interval_sec: int = 300) -> Path:
-    """Fetch GBFS station info/status and save snapshots."""
-    url = get_dataset_url("ecobici_rt")
-    raw_dir = RAW_DIR / "ecobici" / "rt"
-    json_dir = raw_dir / "json"
-    parsed_dir = raw_dir / "parsed"
-    json_dir.mkdir(parents=True, exist_ok=True)
-    parsed_dir.mkdir(parents=True, exist_ok=True)
-
-    all_snapshots: list[pd.DataFrame] = []
-
-    for idx in range(snapshots):
-        LOGGER.info("Fetching ECOBICI GBFS root from %s", url)
-        root = _fetch_json(url)
-        timestamp = datetime.now().astimezone().isoformat()
-        root_path = json_dir / f"gbfs_root_{idx + 1}.json"
-        root_path.write_text(json.dumps(root, indent=2), encoding="utf-8")
-
-        feeds = _resolve_gbfs_links(root)
-        station_info_url = feeds.get("station_information")
-        station_status_url = feeds.get("station_status")
-        if not station_info_url or not station_status_url:
+def _stations(payload: dict[str, Any]) -> pd.DataFrame:
+    df = pd.DataFrame(payload.get("data", {}).get("stations", []))
+    if "station_id" in df.columns:
+        df["station_id"] = df["station_id"].astype(str)
+    else:
+        df["station_id"] = pd.Series(dtype="str")
+    return df
+
+
+def legacy_snapshots_path(raw_dir: Path | None = None) -> Path:
+    """Snapshot store written before the station history existed."""
+    return (
+        (raw_dir or RAW_DIR / "ecobici" / "rt") / "parsed" / "station_snapshots.parquet"
+    )
+
+
+def open_station_history(raw_dir: Path | None = None) -> StationHistory:
+    """Open the station history, importing any legacy snapshot store first.
+
+    Only the ingest path calls this; build steps open ``StationHistory``
+    read-only so they never rewrite their own raw inputs.
+    """
+    raw_dir = raw_dir or RAW_DIR / "ecobici" / "rt"
+    history = StationHistory(raw_dir / "history")
+    legacy = legacy_snapshots_path(raw_dir)
+    if legacy.exists():
+        rows = history.import_snapshots(pd.read_parquet(legacy))
+        remove_path(legacy)
+        LOGGER.info("Imported legacy snapshots into %s (%s rows)", history.root, rows)
+    return history
+
+
+class GbfsPoller:
+    """Stateful GBFS poller backed by an on-disk feed cache and station history."""
+
+    def __init__(
+        self,
+        root_url: str,
+        raw_dir: Path,
+        info_refresh_sec: int = INFO_REFRESH_SEC,
+    ) -> None:
+        self.root_url = root_url
+        self.info_refresh_sec = info_refresh_sec
+        self.cache_dir = raw_dir / "cache"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.history = open_station_history(raw_dir)
+        self._info: pd.DataFrame | None = None
+        self._info_version: Any = None
+
+    def _cached_feed(self, name: str, url: str, force: bool = False) -> dict[str, Any]:
+        """Return a feed payload from the disk cache unless it has expired."""
+        path = self.cache_dir / f"{name}.json"
+        now = time.time()
+        if not force and path.exists():
+            try:
+                cached = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                cached = None
+            if cached and cached.get("url") == url:
+                payload = cached["payload"]
+                expires = max(
+                    float(payload.get("last_updated") or 0)
+                    + float(payload.get("ttl") or 0),
+                    float(cached.get("fetched_at") or 0) + self.info_refresh_sec,
+                )
+                if now < expires:
+                    return payload
+
+        LOGGER.info("Fetching GBFS %s from %s", name, url)
+        payload = _fetch_json(url)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(
+            json.dumps({"url": url, "fetched_at": now, "payload": payload}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, path)
+        return payload
+
+    def _feeds(self, force: bool = False) -> dict[str, str]:
+        feeds = _resolve_gbfs_links(self._cached_feed("gbfs", self.root_url, force))
+        if not feeds.get("station_information") or not feeds.get("station_status"):
             raise RuntimeError(
                 "GBFS feed missing station_information or station_status"
             )
+        return feeds
 
-        station_info = _fetch_json(station_info_url)
-        station_status = _fetch_json(station_status_url)
-
-        (json_dir / f"station_information_{idx + 1}.json").write_text(
-            json.dumps(station_info, indent=2),
-            encoding="utf-8",
+    def station_information(self, force: bool = False) -> pd.DataFrame:
+        """Return cached station metadata, refetching it once it expires."""
+        feeds = self._feeds(force)
+        payload = self._cached_feed(
+            "station_information", feeds["station_information"], force
         )
-        (json_dir / f"station_status_{idx + 1}.json").write_text(
-            json.dumps(station_status, indent=2),
-            encoding="utf-8",
-        )
-
-        info_df = pd.DataFrame(station_info.get("data", {}).get("stations", []))
-        status_df = pd.DataFrame(station_status.get("data", {}).get("stations", []))
-
-        snapshot_df = info_df.merge(status_df, on="station_id", how="left")
-        snapshot_df["timestamp"] = timestamp
-        snapshot_df["source"] = "ecobici_rt"
-        all_snapshots.append(snapshot_df)
-
-        if idx < snapshots - 1:
-            time.sleep(interval_sec)
-
-    out_path = parsed_dir / "station_snapshots.parquet"
-    if all_snapshots:
-        pd.concat(all_snapshots, ignore_index=True).to_parquet(out_path, index=False)
-        LOGGER.info("Saved %s", out_path)
-
-    return out_path
+        version = payload.get("last_updated")
+        if self._info is None or force or version != self._info_version:
+            self._info = _stations(payload)
+            self._info_version = version
+        return self._info
+
+    def tick(self) -> int:
+        """Fetch station_status once and record it; returns status rows stored."""
+        status_payload = _fetch_json(self._feeds()["station_status"])
+        status = _stations(status_payload)
+        info = self.station_information()
+        if not set(status["station_id"]).issubset(set(info["station_id"])):
+            LOGGER.info("Unknown stations in status feed; refreshing metadata")
+            info = self.station_information(force=True)
+
+        observed_at = pd.Timestamp.now(tz=DEFAULT_TIMEZONE)
+        version = int(status_payload.get("last_updated") or observed_at.timestamp())
+        rows = self.history.append(info, status, observed_at, version)
+        LOGGER.info("Stored %s changed station statuses (of %s)", rows, len(status))
+        return rows
+
+
+def ingest_ecobici_rt(snapshots: int | None = 1, interval_sec: int = 300) -> Path:
+    """Poll GBFS station status and append each tick to the station history.
+
+    Any legacy ``parsed/station_snapshots.parquet`` store is imported into
+    the history first.
+
+    Args:
+        snapshots: Number of ticks; None runs as a daemon until interrupted
+            (Ctrl+C or SIGTERM), logging and surviving failed ticks. 0 only
+            imports the legacy store (no network access).
+        interval_sec: Seconds between tick starts.
+
+    Returns:
+        Station history root (see ``station_history.StationHistory``).
+    """
+    url = get_dataset_url("ecobici_rt")
+    poller = GbfsPoller(url, RAW_DIR / "ecobici" / "rt")
+    if snapshots == 0:
+        return poller.history.root
+
+    stop = threading.Event()
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    count = 0
+    next_tick = time.monotonic()
+    try:
+        while not stop.is_set():
+            try:
+                poller.tick()
+            except _TICK_ERRORS as exc:
+                if snapshots is not None:
+                    raise
+                LOGGER.warning("GBFS tick failed, retrying next interval: %s", exc)
+            count += 1
+            if snapshots is not None and count >= snapshots:
+                break
+            next_tick += interval_sec
+            stop.wait(max(0.0, next_tick - time.monotonic()))
+    except KeyboardInterrupt:
+        LOGGER.info("Stopping GBFS poller after %s ticks", count)
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    return poller.history.root
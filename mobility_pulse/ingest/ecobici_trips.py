@@ -3,34 +3,143 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
 import requests
 
-from mobility_pulse.config import RAW_DIR, get_dataset_url
+from mobility_pulse.config import RAW_DIR, ConfigError, get_dataset_url, load_datasets
+from mobility_pulse.ingest.download import download, download_rows
+from mobility_pulse.storage import DatasetWriter, remove_path
 
 LOGGER = logging.getLogger(__name__)
 
+MONTHLY_DATASET = "ecobici_trips.parquet"
+
 
 def ingest_ecobici_trips(limit_rows: int | None = None) -> Path:
-    """Download ECOBICI trips CSV (optionally limit rows)."""
+    """Download ECOBICI trips CSV (optionally limit rows).
+
+    With ``limit_rows`` the HTTP stream is closed once that many data rows have
+    been written instead of downloading the whole month.
+    """
     url = get_dataset_url("ecobici_trips")
     raw_dir = RAW_DIR / "ecobici" / "trips"
     raw_dir.mkdir(parents=True, exist_ok=True)
 
     csv_path = raw_dir / "ecobici_trips.csv"
     LOGGER.info("Downloading ECOBICI trips from %s", url)
-    with requests.get(url, stream=True, timeout=60) as response:
-        response.raise_for_status()
-        with csv_path.open("wb") as handle:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    handle.write(chunk)
-
     if limit_rows:
-        df = pd.read_csv(csv_path, nrows=limit_rows)
-        df.to_csv(csv_path, index=False)
-        LOGGER.info("Trimmed ECOBICI trips to %s rows", limit_rows)
+        download_rows(url, csv_path, max_rows=limit_rows)
+    else:
+        download(url, csv_path)
 
     return csv_path
+
+
+def parse_months(specs: list[str]) -> list[str]:
+    """Expand ``YYYY-MM`` and ``YYYY-MM:YYYY-MM`` specs into sorted months."""
+    months: set[str] = set()
+    for spec in specs:
+        start, _, end = spec.partition(":")
+        first = pd.Period(start, freq="M")
+        last = pd.Period(end or start, freq="M")
+        if last < first:
+            raise ValueError(f"Empty month range: {spec}")
+        months.update(str(p) for p in pd.period_range(first, last, freq="M"))
+    return sorted(months)
+
+
+def month_url(template: str, month: str) -> str:
+    """Render the configured monthly URL template for ``YYYY-MM``."""
+    period = pd.Period(month, freq="M")
+    return template.format(
+        month=date(period.year, period.month, 1),
+        upload=date((period + 1).year, (period + 1).month, 1),
+    )
+
+
+def _ingest_month(
+    url: str,
+    root: Path,
+    month: str,
+    limit_rows: int | None,
+    chunk_rows: int,
+    timeout: int,
+) -> int:
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        reader = pd.read_csv(
+            response.raw,
+            dtype=str,
+            chunksize=chunk_rows,
+            nrows=limit_rows,
+            encoding_errors="replace",
+        )
+        with DatasetWriter(root / f"month={month}") as writer:
+            for chunk in reader:
+                writer.write(chunk)
+    LOGGER.info("Ingested %s rows for %s", f"{writer.rows:,}", month)
+    return writer.rows
+
+
+def ingest_ecobici_trips_months(
+    months: list[str],
+    limit_rows: int | None = None,
+    workers: int = 4,
+    chunk_rows: int = 500_000,
+    timeout: int = 60,
+    prune: bool = False,
+) -> Path:
+    """Stream several monthly trip CSVs into a month-partitioned parquet dataset.
+
+    Each month is parsed straight from the HTTP stream in chunks (no CSV is
+    kept on disk) and written to ``month=YYYY-MM`` under
+    ``RAW_DIR/ecobici/trips/ecobici_trips.parquet``. Months are fetched
+    concurrently and replaced atomically, so re-running a month is safe.
+    Months ingested earlier stay in the dataset (and in every build) unless
+    ``prune`` is set.
+
+    Args:
+        months: Month specs, ``YYYY-MM`` or ``YYYY-MM:YYYY-MM`` ranges.
+        limit_rows: Optional row cap per month.
+        workers: Concurrent downloads.
+        chunk_rows: Rows per parquet part.
+        timeout: Request timeout in seconds.
+        prune: Remove ``month=`` partitions outside ``months`` once every
+            requested month is written.
+
+    Returns:
+        Dataset root path.
+    """
+    template = load_datasets()["ecobici_trips"].monthly_url
+    if not template:
+        raise ConfigError("Dataset 'ecobici_trips' has no monthly_url configured")
+
+    root = RAW_DIR / "ecobici" / "trips" / MONTHLY_DATASET
+    root.mkdir(parents=True, exist_ok=True)
+    month_list = parse_months(months)
+
+    def _run(month: str) -> int:
+        url = month_url(template, month)
+        LOGGER.info("Streaming ECOBICI trips %s from %s", month, url)
+        return _ingest_month(url, root, month, limit_rows, chunk_rows, timeout)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rows = sum(pool.map(_run, month_list))
+    if prune:
+        keep = {f"month={month}" for month in month_list}
+        for part in root.glob("month=*"):
+            if part.name not in keep:
+                LOGGER.info("Pruning ECOBICI trips %s", part.name)
+                remove_path(part)
+    LOGGER.info(
+        "ECOBICI trips: %s rows across %s months -> %s",
+        f"{rows:,}",
+        len(month_list),
+        root,
+    )
+    return root
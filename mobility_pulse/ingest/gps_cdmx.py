@@ -10,6 +10,7 @@ from typing import Any
 import requests
 
 from mobility_pulse.config import RAW_DIR, get_dataset_url, load_datasets
+from mobility_pulse.ingest.download import download
 
 LOGGER = logging.getLogger(__name__)
 
@@ -86,12 +87,7 @@ def ingest_gps_cdmx() -> Path:
     out_path = raw_dir / filename
 
     LOGGER.info("Downloading GPS candidate: %s", url)
-    with requests.get(url, stream=True, timeout=60) as response:
-        response.raise_for_status()
-        with out_path.open("wb") as handle:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    handle.write(chunk)
+    download(url, out_path)
 
     meta_path = raw_dir / "gps_cdmx_metadata.json"
     meta_path.write_text(json.dumps(pick, indent=2), encoding="utf-8")
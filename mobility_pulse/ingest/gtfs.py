@@ -1,46 +1,225 @@
-"""GTFS ingest logic."""
+"""GTFS ingest logic.
+
+Each member of the GTFS zip is streamed straight from the archive into a
+typed parquet table under ``RAW_DIR/gtfs/tables/<table>.parquet`` (no
+extraction to disk). Ids are categorical, counts are small nullable ints,
+GTFS dates become datetimes and ``HH:MM:SS`` times (which may exceed 24h)
+become ``*_sec`` seconds after the service day start. The large members
+(``stop_times``, ``shapes``) are read in chunks in worker processes.
+"""
 
 from __future__ import annotations
 
 import logging
 import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
-import requests
 
 from mobility_pulse.config import RAW_DIR, get_dataset_url
+from mobility_pulse.ingest.download import download
+from mobility_pulse.storage import DatasetWriter, remove_path
 
 LOGGER = logging.getLogger(__name__)
 
+CHUNK_ROWS = 1_000_000
+
+_DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Explicit read dtypes per table; columns not listed are read as strings.
+GTFS_DTYPES: dict[str, dict[str, str]] = {
+    "stops": {
+        "stop_id": "str",
+        "stop_code": "str",
+        "stop_name": "str",
+        "stop_lat": "float64",
+        "stop_lon": "float64",
+        "zone_id": "str",
+        "location_type": "Int8",
+        "parent_station": "str",
+        "wheelchair_boarding": "Int8",
+    },
+    "routes": {
+        "route_id": "str",
+        "agency_id": "category",
+        "route_short_name": "str",
+        "route_long_name": "str",
+        "route_type": "Int16",
+    },
+    "trips": {
+        "route_id": "category",
+        "service_id": "category",
+        "trip_id": "str",
+        "direction_id": "Int8",
+        "shape_id": "category",
+        "wheelchair_accessible": "Int8",
+        "bikes_allowed": "Int8",
+    },
+    "stop_times": {
+        "trip_id": "category",
+        "arrival_time": "str",
+        "departure_time": "str",
+        "stop_id": "category",
+        "stop_sequence": "Int32",
+        "pickup_type": "Int8",
+        "drop_off_type": "Int8",
+        "shape_dist_traveled": "float32",
+        "timepoint": "Int8",
+    },
+    "calendar": {
+        "service_id": "str",
+        **dict.fromkeys(_DAYS, "Int8"),
+        "start_date": "str",
+        "end_date": "str",
+    },
+    "calendar_dates": {
+        "service_id": "category",
+        "date": "str",
+        "exception_type": "Int8",
+    },
+    "shapes": {
+        "shape_id": "category",
+        "shape_pt_lat": "float32",
+        "shape_pt_lon": "float32",
+        "shape_pt_sequence": "Int32",
+        "shape_dist_traveled": "float32",
+    },
+    "frequencies": {
+        "trip_id": "category",
+        "start_time": "str",
+        "end_time": "str",
+        "headway_secs": "Int32",
+        "exact_times": "Int8",
+    },
+}
+
+# Members read in chunks and scheduled first on the worker pool.
+LARGE_TABLES = ("stop_times", "shapes")
+
+_TIME_COLUMNS = {
+    "arrival_time": "arrival_sec",
+    "departure_time": "departure_sec",
+    "start_time": "start_sec",
+    "end_time": "end_sec",
+}
+_DATE_COLUMNS = ("start_date", "end_date", "date")
+
+
+def gtfs_tables_dir() -> Path:
+    return RAW_DIR / "gtfs" / "tables"
+
+
+def gtfs_time_to_seconds(values: pd.Series) -> pd.Series:
+    """Convert GTFS ``H:MM:SS`` strings (hours may exceed 23) to Int32 seconds."""
+    parts = values.str.split(":", n=2, expand=True)
+    if parts.shape[1] < 3:
+        return pd.Series(pd.NA, index=values.index, dtype="Int32")
+    h, m, s = (pd.to_numeric(parts[i], errors="coerce") for i in range(3))
+    return (h * 3600 + m * 60 + s).round().astype("Int32")
+
+
+def _convert(df: pd.DataFrame) -> pd.DataFrame:
+    for col, target in _TIME_COLUMNS.items():
+        if col in df.columns:
+            df[target] = gtfs_time_to_seconds(df.pop(col))
+    for col in _DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="%Y%m%d", errors="coerce")
+    return df
+
 
-def ingest_gtfs() -> Path:
-    """Download and extract the GTFS feed."""
+def _find_member(zf: zipfile.ZipFile, table: str) -> str | None:
+    """Locate ``<table>.txt`` even when the feed is nested in a folder."""
+    for name in zf.namelist():
+        if Path(name).name == f"{table}.txt":
+            return name
+    return None
+
+
+def _ingest_member(
+    zip_path: Path, table: str, out_dir: Path, chunk_rows: int
+) -> tuple[str, int]:
+    """Stream one zip member into ``out_dir/<table>.parquet``."""
+    out_path = out_dir / f"{table}.parquet"
+    with zipfile.ZipFile(zip_path) as zf:
+        member = _find_member(zf, table)
+        if member is None:
+            remove_path(out_path)
+            return table, 0
+        dtype = defaultdict(lambda: "str", GTFS_DTYPES[table])
+        with zf.open(member) as handle:
+            reader = pd.read_csv(
+                handle,
+                dtype=dtype,
+                chunksize=chunk_rows,
+                encoding="utf-8-sig",
+                skipinitialspace=True,
+            )
+            with DatasetWriter(out_path) as writer:
+                for chunk in reader:
+                    writer.write(_convert(chunk))
+    if writer.rows == 0:
+        remove_path(out_path)
+    return table, writer.rows
+
+
+def build_gtfs_tables(
+    zip_path: Path,
+    out_dir: Path | None = None,
+    workers: int | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> dict[str, int]:
+    """Convert every known GTFS member of ``zip_path`` into a parquet table.
+
+    Args:
+        zip_path: GTFS zip archive.
+        out_dir: Output directory (default ``RAW_DIR/gtfs/tables``).
+        workers: Worker processes (default: one per table, capped by CPUs).
+        chunk_rows: Rows per chunk when streaming a member.
+
+    Returns:
+        Mapping of table name to row count (0 when the member is absent).
+    """
+    out_dir = out_dir or gtfs_tables_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tables = [*LARGE_TABLES, *(t for t in GTFS_DTYPES if t not in LARGE_TABLES)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_ingest_member, zip_path, table, out_dir, chunk_rows)
+            for table in tables
+        ]
+        counts = dict(future.result() for future in futures)
+    for table, rows in counts.items():
+        if rows:
+            LOGGER.info("GTFS %s: %s rows", table, f"{rows:,}")
+    if not counts.get("stops"):
+        LOGGER.warning("stops.txt not found in GTFS archive")
+    return counts
+
+
+def load_gtfs_table(name: str, columns: list[str] | None = None) -> pd.DataFrame | None:
+    """Load a typed GTFS table written by ``ingest_gtfs`` (None if missing)."""
+    path = gtfs_tables_dir() / f"{name}.parquet"
+    if not path.exists():
+        return None
+    return pd.read_parquet(path, columns=columns)
+
+
+def ingest_gtfs(workers: int | None = None) -> Path:
+    """Download the GTFS feed and convert its members to parquet tables."""
     url = get_dataset_url("gtfs")
     raw_dir = RAW_DIR / "gtfs"
-    extract_dir = raw_dir / "extracted"
     raw_dir.mkdir(parents=True, exist_ok=True)
-    extract_dir.mkdir(parents=True, exist_ok=True)
 
     zip_path = raw_dir / "gtfs.zip"
     LOGGER.info("Downloading GTFS from %s", url)
-    with requests.get(url, stream=True, timeout=60) as response:
-        response.raise_for_status()
-        with zip_path.open("wb") as handle:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    handle.write(chunk)
-
-    LOGGER.info("Extracting GTFS to %s", extract_dir)
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(extract_dir)
-
-    # Quick read to ensure files are present (optional)
-    stops_path = extract_dir / "stops.txt"
-    if stops_path.exists():
-        _ = pd.read_csv(stops_path, nrows=5)
-        LOGGER.info("Sampled stops.txt successfully")
-    else:
-        LOGGER.warning("stops.txt not found in GTFS archive")
+    result = download(url, zip_path)
+    tables_dir = gtfs_tables_dir()
+    if not result.changed and (tables_dir / "stops.parquet").exists():
+        return zip_path
 
+    LOGGER.info("Converting GTFS members to parquet in %s", tables_dir)
+    build_gtfs_tables(zip_path, tables_dir, workers=workers)
     return zip_path
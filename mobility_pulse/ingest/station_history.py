@@ -0,0 +1,355 @@
+"""Delta-encoded ECOBICI station history.
+
+Polling GBFS every minute repeats the same metadata and mostly unchanged
+counts for every station. The history keeps each fact once:
+
+- ``stations.parquet/``: station metadata (name, lat, lon, capacity), one row
+  per station each time it appears or changes, stamped ``valid_from``.
+- ``status.parquet/date=YYYY-MM-DD/``: a status row only when a station's
+  bike/dock counts or operating flags change, keyed by
+  ``(station_id, last_reported)``.
+- ``state.parquet``: the latest status per station, a checkpoint so change
+  detection survives restarts.
+
+Each poll writes one small part file; ``compact`` merges the parts of
+finished days into one file per day, which is where most of the size win
+comes from (parquet per-file overhead dwarfs a few dozen changed rows).
+
+``status_at`` and ``status_series`` rebuild full snapshots on demand.
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from mobility_pulse.config import DEFAULT_TIMEZONE
+from mobility_pulse.storage import write_table_atomic
+
+LOGGER = logging.getLogger(__name__)
+
+META_COLUMNS = ("name", "lat", "lon", "capacity")
+STATUS_COLUMNS = (
+    "num_bikes_available",
+    "num_docks_available",
+    "num_bikes_disabled",
+    "num_docks_disabled",
+    "is_installed",
+    "is_renting",
+    "is_returning",
+)
+# A status row is stored only when one of these differs from the last one.
+CHANGE_COLUMNS = (
+    "num_bikes_available",
+    "num_docks_available",
+    "is_installed",
+    "is_renting",
+    "is_returning",
+)
+
+_TIMESTAMP = pa.timestamp("us", tz=DEFAULT_TIMEZONE)
+
+META_SCHEMA = pa.schema(
+    [
+        ("station_id", pa.string()),
+        ("name", pa.string()),
+        ("lat", pa.float64()),
+        ("lon", pa.float64()),
+        ("capacity", pa.int64()),
+        ("valid_from", _TIMESTAMP),
+    ]
+)
+
+STATUS_SCHEMA = pa.schema(
+    [
+        ("station_id", pa.string()),
+        ("last_reported", pa.int64()),
+        ("timestamp", _TIMESTAMP),
+        *[(name, pa.int64()) for name in STATUS_COLUMNS],
+    ]
+)
+
+
+def to_table(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Project a GBFS-derived frame onto ``schema``, coercing loose types."""
+    arrays = []
+    for field in schema:
+        if field.name not in df.columns:
+            arrays.append(pa.nulls(len(df), field.type))
+            continue
+        values = df[field.name]
+        if pa.types.is_integer(field.type):
+            values = pd.to_numeric(values, errors="coerce").round().astype("Int64")
+        elif pa.types.is_floating(field.type):
+            values = pd.to_numeric(values, errors="coerce")
+        elif pa.types.is_timestamp(field.type):
+            values = pd.to_datetime(values, errors="coerce", utc=True)
+        else:
+            values = values.astype("string")
+        arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def _normalize(df: pd.DataFrame, schema: pa.Schema) -> pd.DataFrame:
+    return _to_pandas(to_table(df, schema))
+
+
+def _utc(ts: pd.Timestamp | str) -> pd.Timestamp:
+    """Interpret naive timestamps as local (CDMX) time and convert to UTC."""
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(DEFAULT_TIMEZONE)
+    return ts.tz_convert("UTC")
+
+
+def _status_frame(
+    status: pd.DataFrame, observed: pd.Timestamp | pd.Series
+) -> pd.DataFrame:
+    """Stamp status rows with their report time (fetch time if unreported)."""
+    status = status.copy()
+    if "last_reported" not in status.columns:
+        status["last_reported"] = pd.NA
+    reported = pd.to_datetime(
+        pd.to_numeric(status["last_reported"], errors="coerce"),
+        unit="s",
+        utc=True,
+    )
+    status["timestamp"] = reported.fillna(observed)
+    return _normalize(status, STATUS_SCHEMA)
+
+
+def _changes(
+    current: pd.DataFrame, previous: pd.DataFrame, columns: tuple[str, ...]
+) -> pd.Series:
+    """Mark time-ordered rows whose ``columns`` differ from the station's prior row.
+
+    A station's first row in ``current`` is compared with its row in
+    ``previous`` (the stored state); stations not seen before always count
+    as changed.
+    """
+    cols = list(columns)
+    prior = current.groupby("station_id", sort=False)[cols].shift()
+    first = ~current["station_id"].duplicated()
+    known = ~first
+    if not previous.empty:
+        stored = previous.drop_duplicates("station_id", keep="last")
+        stored = stored.set_index("station_id")[cols].reindex(current["station_id"])
+        stored.index = current.index
+        prior.loc[first] = stored.loc[first]
+        known |= current["station_id"].isin(previous["station_id"])
+
+    changed = pd.Series(False, index=current.index)
+    for col in cols:
+        a, b = current[col], prior[col]
+        a_na, b_na = a.isna(), b.isna()
+        differs = a.ne(b).fillna(False).astype(bool) & ~(a_na | b_na)
+        changed |= differs | (a_na ^ b_na)
+    return ~known | changed
+
+
+def _read(path: Path, schema: pa.Schema, filter_expr=None) -> pd.DataFrame:
+    if not path.exists():
+        return _to_pandas(schema.empty_table())
+    dataset = ds.dataset(path, schema=schema, format="parquet", partitioning="hive")
+    return _to_pandas(dataset.to_table(filter=filter_expr))
+
+
+class StationHistory:
+    """Append-only, delta-encoded station metadata and status history."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.stations_path = root / "stations.parquet"
+        self.status_path = root / "status.parquet"
+        self.state_path = root / "state.parquet"
+        self._meta: pd.DataFrame | None = None
+        self._state: pd.DataFrame | None = None
+        self._day: str | None = None
+
+    def _latest_meta(self) -> pd.DataFrame:
+        if self._meta is None:
+            meta = _read(self.stations_path, META_SCHEMA)
+            self._meta = (
+                meta.sort_values("valid_from", kind="stable")
+                .drop_duplicates("station_id", keep="last")
+                .reset_index(drop=True)
+            )
+        return self._meta
+
+    def _latest_state(self) -> pd.DataFrame:
+        if self._state is None:
+            self._state = _read(self.state_path, STATUS_SCHEMA)
+        return self._state
+
+    def _write_meta(self, meta: pd.DataFrame, version: int) -> int:
+        if meta.empty:
+            return 0
+        table = pa.Table.from_pandas(meta, schema=META_SCHEMA, preserve_index=False)
+        write_table_atomic(table, self.stations_path / f"info-{version}.parquet")
+        latest = pd.concat([self._latest_meta(), meta], ignore_index=True)
+        self._meta = latest.drop_duplicates("station_id", keep="last").reset_index(
+            drop=True
+        )
+        return len(meta)
+
+    def _write_status(self, status: pd.DataFrame, version: int, day: str) -> int:
+        if status.empty:
+            return 0
+        table = pa.Table.from_pandas(status, schema=STATUS_SCHEMA, preserve_index=False)
+        write_table_atomic(
+            table, self.status_path / f"date={day}" / f"status-{version}.parquet"
+        )
+        state = pd.concat([self._latest_state(), status], ignore_index=True)
+        self._state = state.drop_duplicates("station_id", keep="last").reset_index(
+            drop=True
+        )
+        write_table_atomic(
+            pa.Table.from_pandas(
+                self._state, schema=STATUS_SCHEMA, preserve_index=False
+            ),
+            self.state_path,
+        )
+        return len(status)
+
+    def compact(self, keep_day: str | None = None) -> int:
+        """Merge each day's status part files into one; returns days compacted.
+
+        Args:
+            keep_day: ``YYYY-MM-DD`` partition still being written (skipped).
+        """
+        compacted = 0
+        if not self.status_path.exists():
+            return compacted
+        for day_dir in sorted(self.status_path.glob("date=*")):
+            parts = sorted(day_dir.glob("status-*.parquet"))
+            if day_dir.name == f"date={keep_day}" or len(parts) < 2:
+                continue
+            table = ds.dataset(
+                [str(part) for part in parts], schema=STATUS_SCHEMA, format="parquet"
+            ).to_table()
+            # The merged file atomically replaces the last part; a crash before
+            # the others are removed only leaves duplicate rows, which readers
+            # drop.
+            write_table_atomic(table, parts[-1])
+            for part in parts[:-1]:
+                part.unlink()
+            compacted += 1
+        if compacted:
+            LOGGER.info("Compacted %s day(s) of station status", compacted)
+        return compacted
+
+    def append(
+        self,
+        info: pd.DataFrame,
+        status: pd.DataFrame,
+        observed_at: pd.Timestamp,
+        version: int,
+    ) -> int:
+        """Record one poll; returns the number of status rows stored.
+
+        Args:
+            info: ``station_information`` stations.
+            status: ``station_status`` stations.
+            observed_at: Fetch time (tz-aware).
+            version: Feed ``last_updated``, used to name the part files.
+        """
+        meta = info.copy()
+        meta["valid_from"] = observed_at
+        meta = _normalize(meta, META_SCHEMA)
+        self._write_meta(
+            meta[_changes(meta, self._latest_meta(), META_COLUMNS)], version
+        )
+
+        current = _status_frame(status, _utc(observed_at))
+        changed = current[_changes(current, self._latest_state(), CHANGE_COLUMNS)]
+        day = f"{observed_at:%Y-%m-%d}"
+        if day != self._day:
+            self.compact(keep_day=day)
+            self._day = day
+        return self._write_status(changed, version, day)
+
+    def import_snapshots(self, snapshots: pd.DataFrame) -> int:
+        """Delta-encode full merged snapshots (the pre-history store format)."""
+        if snapshots.empty:
+            return 0
+        snapshots = snapshots.copy()
+        fallback = pd.Timestamp.now(tz=DEFAULT_TIMEZONE)
+        observed = pd.to_datetime(snapshots.get("timestamp"), errors="coerce", utc=True)
+        observed = observed.fillna(_utc(fallback))
+        snapshots["timestamp"] = observed
+        snapshots["valid_from"] = observed
+        days = observed.dt.tz_convert(DEFAULT_TIMEZONE).dt.strftime("%Y-%m-%d")
+        snapshots["_day"] = days
+        snapshots = snapshots.sort_values("timestamp", kind="stable")
+
+        meta = _normalize(snapshots, META_SCHEMA)
+        meta = meta[_changes(meta, self._latest_meta(), META_COLUMNS)]
+        self._write_meta(meta, int(fallback.timestamp()))
+
+        status = _status_frame(snapshots, snapshots["timestamp"])
+        status["_day"] = snapshots["_day"].to_numpy()
+        status = status[_changes(status, self._latest_state(), CHANGE_COLUMNS)]
+        rows = 0
+        for day, part in status.groupby("_day", sort=True):
+            rows += self._write_status(
+                part.drop(columns="_day"), int(fallback.timestamp()), str(day)
+            )
+        return rows
+
+    def metadata(self, as_of: pd.Timestamp | None = None) -> pd.DataFrame:
+        """Station metadata in effect at ``as_of`` (latest if None)."""
+        if as_of is None:
+            return self._latest_meta().copy()
+        meta = _read(
+            self.stations_path,
+            META_SCHEMA,
+            ds.field("valid_from") <= _utc(as_of),
+        )
+        return (
+            meta.sort_values("valid_from", kind="stable")
+            .drop_duplicates("station_id", keep="last")
+            .reset_index(drop=True)
+        )
+
+    def status_series(
+        self,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        station_ids: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """Status change events in ``[start, end]`` joined with latest metadata.
+
+        Each row holds from its ``timestamp`` until the station's next row.
+        """
+        expr = None
+        if start is not None:
+            expr = ds.field("timestamp") >= _utc(start)
+        if end is not None:
+            upper = ds.field("timestamp") <= _utc(end)
+            expr = upper if expr is None else expr & upper
+        if station_ids is not None:
+            ids = ds.field("station_id").isin([str(s) for s in station_ids])
+            expr = ids if expr is None else expr & ids
+        status = _read(self.status_path, STATUS_SCHEMA, expr).drop_duplicates()
+        status = status.sort_values(["station_id", "timestamp"], kind="stable")
+        meta = self.metadata().drop(columns="valid_from")
+        return status.merge(meta, on="station_id", how="left").reset_index(drop=True)
+
+    def status_at(self, t: pd.Timestamp) -> pd.DataFrame:
+        """Full station snapshot as of ``t``: last status per station + metadata."""
+        status = _read(
+            self.status_path, STATUS_SCHEMA, ds.field("timestamp") <= _utc(t)
+        ).drop_duplicates()
+        status = status.sort_values("timestamp", kind="stable").drop_duplicates(
+            "station_id", keep="last"
+        )
+        meta = self.metadata(as_of=t).drop(columns="valid_from")
+        return meta.merge(status, on="station_id", how="left").reset_index(drop=True)
@@ -0,0 +1,333 @@
+"""Dependency-graph executor for ``mobility_pulse build``.
+
+The build is a set of ``Task``s that declare the files or directories they
+read (``inputs``) and write (``outputs``). A task depends on every task whose
+outputs overlap its inputs, so independent steps (the standardize steps,
+isochrones) run side by side on a process pool while, for example, trips
+standardization waits for ``ecobici_rt.parquet``. Tasks marked ``heavy``
+(whole-dataset scans) run one at a time, so peak memory stays that of the
+largest step rather than the sum of every step running at once.
+
+Each task that runs records a fingerprint of its inputs (paths,
+sizes and modification times of every file, plus its arguments) and of its
+outputs in ``ANALYTICS_DIR/build_state.json``. A later build skips a task
+whose inputs and outputs still match; a task that reruns touches its outputs,
+which makes its dependents stale in turn.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from mobility_pulse.analytics.aggregates import analytics_outputs, build_analytics
+from mobility_pulse.analytics.isochrones import TRANSFERS_FILE, build_isochrones
+from mobility_pulse.analytics.ppi import build_ppi
+from mobility_pulse.config import (
+    ANALYTICS_DIR,
+    PPI_CONFIG_PATH,
+    PROCESSED_DIR,
+    RAW_DIR,
+    REPORTS_DIR,
+)
+from mobility_pulse.context import BuildContext
+from mobility_pulse.ingest.gtfs import gtfs_tables_dir
+from mobility_pulse.storage import paths_fingerprint
+from mobility_pulse.transform.standardize import (
+    standardize_c5,
+    standardize_ecobici_rt,
+    standardize_ecobici_trips,
+    standardize_gps,
+    standardize_gtfs,
+)
+from mobility_pulse.validate.quality_report import generate_report
+
+LOGGER = logging.getLogger(__name__)
+
+# Bump when fingerprints change meaning; every task then reruns once.
+STATE_VERSION = 1
+
+
+class BuildError(RuntimeError):
+    """A build task failed or the task graph is invalid."""
+
+
+@dataclass(frozen=True)
+class Task:
+    """One build step.
+
+    Attributes:
+        name: Unique task name.
+        func: Picklable (module-level) callable run in a worker process.
+        inputs: Files or directories the task reads.
+        outputs: Files or directories the task writes.
+        kwargs: Keyword arguments for ``func``; part of the fingerprint.
+        untracked: ``kwargs`` keys left out of the fingerprint (modes such
+            as ``full`` that change how, not what, a task builds).
+        heavy: Memory-heavy; never runs beside another heavy task.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    inputs: tuple[Path, ...] = ()
+    outputs: tuple[Path, ...] = ()
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    untracked: tuple[str, ...] = ()
+    heavy: bool = False
+
+
+def _overlaps(a: Path, b: Path) -> bool:
+    return a == b or a in b.parents or b in a.parents
+
+
+def task_dependencies(tasks: list[Task]) -> dict[str, list[str]]:
+    """Map each task to the tasks producing its inputs, in topological order.
+
+    Raises:
+        BuildError: On duplicate names, two tasks writing the same path, or
+            a dependency cycle.
+    """
+    names = [task.name for task in tasks]
+    if len(set(names)) != len(names):
+        raise BuildError(f"Duplicate task names: {names}")
+    for i, a in enumerate(tasks):
+        for b in tasks[i + 1 :]:
+            if any(_overlaps(x, y) for x in a.outputs for y in b.outputs):
+                raise BuildError(f"Tasks {a.name} and {b.name} write the same path")
+
+    deps = {
+        task.name: [
+            other.name
+            for other in tasks
+            if other is not task
+            and any(_overlaps(i, o) for i in task.inputs for o in other.outputs)
+        ]
+        for task in tasks
+    }
+    ordered: dict[str, list[str]] = {}
+    while len(ordered) < len(deps):
+        ready = [
+            n for n, d in deps.items() if n not in ordered and set(d) <= set(ordered)
+        ]
+        if not ready:
+            cycle = sorted(set(deps) - set(ordered))
+            raise BuildError(f"Dependency cycle between tasks: {cycle}")
+        ordered.update((n, deps[n]) for n in ready)
+    return ordered
+
+
+def _input_fingerprint(task: Task) -> str:
+    kwargs = {k: v for k, v in task.kwargs.items() if k not in task.untracked}
+    return paths_fingerprint(task.inputs, {"task": task.name, "kwargs": kwargs})
+
+
+def _load_state(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        LOGGER.warning("Ignoring unreadable build state %s: %s", path, exc)
+        return {}
+    return state.get("tasks", {}) if state.get("version") == STATE_VERSION else {}
+
+
+def _save_state(path: Path, tasks: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    payload = {"version": STATE_VERSION, "tasks": tasks}
+    tmp.write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def run_tasks(
+    tasks: list[Task],
+    workers: int | None = None,
+    force: bool = False,
+    state_path: Path | None = None,
+) -> dict[str, str]:
+    """Run ``tasks`` on a process pool as their dependencies finish.
+
+    At most one ``heavy`` task runs at a time; light tasks fill the other
+    workers.
+
+    Args:
+        tasks: Tasks to run (see ``task_dependencies`` for the edges).
+        workers: Worker processes (default: one per CPU).
+        force: Run every task, ignoring stored fingerprints.
+        state_path: Fingerprint store (default ``ANALYTICS_DIR/build_state.json``).
+
+    Returns:
+        Status per task: ``"ran"``, ``"skipped"`` (up to date), ``"failed"``
+        or ``"blocked"`` (a dependency failed).
+
+    Raises:
+        BuildError: After the remaining independent tasks finish, when any
+            task failed.
+    """
+    state_path = state_path or ANALYTICS_DIR / "build_state.json"
+    pending = task_dependencies(tasks)
+    by_name = {task.name: task for task in tasks}
+    state = _load_state(state_path)
+    status: dict[str, str] = {}
+    running: dict[Future, tuple[Task, str]] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            heavy_running = any(task.heavy for task, _ in running.values())
+            for name in [n for n, d in pending.items() if set(d) <= set(status)]:
+                task = by_name[name]
+                if any(status[d] in ("failed", "blocked") for d in pending[name]):
+                    del pending[name]
+                    status[name] = "blocked"
+                    LOGGER.warning("%s: skipped, a dependency failed", name)
+                    continue
+                fingerprint = _input_fingerprint(task)
+                recorded = state.get(name, {})
+                if (
+                    not force
+                    and recorded.get("inputs") == fingerprint
+                    and recorded.get("outputs") == paths_fingerprint(task.outputs)
+                ):
+                    del pending[name]
+                    status[name] = "skipped"
+                    LOGGER.info("%s: up to date", name)
+                    continue
+                if task.heavy and heavy_running:
+                    continue
+                del pending[name]
+                heavy_running = heavy_running or task.heavy
+                LOGGER.info("%s: started", name)
+                running[pool.submit(task.func, **task.kwargs)] = (task, fingerprint)
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, fingerprint = running.pop(future)
+                try:
+                    future.result()
+                except Exception as exc:
+                    status[task.name] = "failed"
+                    state.pop(task.name, None)
+                    LOGGER.error("%s: failed", task.name, exc_info=exc)
+                else:
+                    status[task.name] = "ran"
+                    state[task.name] = {
+                        "inputs": fingerprint,
+                        "outputs": paths_fingerprint(task.outputs),
+                    }
+                    LOGGER.info("%s: done", task.name)
+                _save_state(state_path, state)
+
+    failed = [name for name, s in status.items() if s == "failed"]
+    if failed:
+        raise BuildError(f"Build tasks failed: {', '.join(failed)}")
+    return status
+
+
+def run_analytics(full: bool = False, validate: bool = False) -> None:
+    """Analytics, PPI and (optionally) the quality report on one context."""
+    context = BuildContext(PROCESSED_DIR)
+    build_analytics(full=full, context=context)
+    build_ppi(context=context)
+    if validate:
+        generate_report(context=context)
+
+
+def build_tasks(
+    chunk_rows: int | None = None,
+    full: bool = False,
+    isochrones: bool = False,
+    validate: bool = False,
+) -> list[Task]:
+    """The ``mobility_pulse build`` task graph (see ``cli`` for the flags).
+
+    Analytics, PPI and the quality report share one task so they share one
+    ``BuildContext``; it declares every table it may write, so deleting any
+    of them reruns it. The steps that load a whole dataset (C5, trips, GPS
+    and analytics) are ``heavy`` and run one at a time.
+    """
+    rt_raw = RAW_DIR / "ecobici" / "rt"
+    processed = {
+        name: PROCESSED_DIR / f"{name}.parquet"
+        for name in (
+            "gtfs_stops",
+            "c5_incidents",
+            "ecobici_rt",
+            "ecobici_trips",
+            "gps_cdmx",
+        )
+    }
+    tasks = [
+        Task(
+            "standardize_gtfs",
+            standardize_gtfs,
+            (gtfs_tables_dir(), RAW_DIR / "gtfs" / "extracted" / "stops.txt"),
+            (processed["gtfs_stops"],),
+        ),
+        Task(
+            "standardize_c5",
+            standardize_c5,
+            (RAW_DIR / "c5" / "c5_incidents.csv",),
+            (processed["c5_incidents"],),
+            {"chunk_rows": chunk_rows},
+            untracked=("chunk_rows",),
+            heavy=True,
+        ),
+        Task(
+            "standardize_ecobici_rt",
+            standardize_ecobici_rt,
+            (rt_raw,),
+            (processed["ecobici_rt"],),
+        ),
+        # Station coordinates for trips come from the standardized RT data.
+        Task(
+            "standardize_ecobici_trips",
+            standardize_ecobici_trips,
+            (RAW_DIR / "ecobici" / "trips", processed["ecobici_rt"]),
+            (processed["ecobici_trips"],),
+            heavy=True,
+        ),
+        Task(
+            "standardize_gps",
+            standardize_gps,
+            (RAW_DIR / "gps",),
+            (processed["gps_cdmx"],),
+            heavy=True,
+        ),
+        Task(
+            "analytics",
+            run_analytics,
+            (*processed.values(), PPI_CONFIG_PATH),
+            (
+                *analytics_outputs(),
+                ANALYTICS_DIR / "ppi_scores.parquet",
+                ANALYTICS_DIR / "ppi_zones.parquet",
+                *((REPORTS_DIR / "data_quality.md",) if validate else ()),
+            ),
+            {"full": full, "validate": validate},
+            untracked=("full",),
+            heavy=True,
+        ),
+    ]
+    if isochrones:
+        tasks.append(
+            Task(
+                "isochrones",
+                build_isochrones,
+                (gtfs_tables_dir(), ANALYTICS_DIR / "accessibility_zones.parquet"),
+                (
+                    ANALYTICS_DIR / "transit_travel_times.parquet",
+                    ANALYTICS_DIR / "transit_isochrones.parquet",
+                    ANALYTICS_DIR / TRANSFERS_FILE,
+                ),
+            )
+        )
+    return tasks
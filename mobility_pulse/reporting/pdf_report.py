@@ -9,12 +9,18 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 from mobility_pulse.config import ANALYTICS_DIR, REPORTS_DIR
+from mobility_pulse.transform.geo import cells_to_str
 
 
 def _load(path: Path) -> pd.DataFrame:
     if not path.exists():
         return pd.DataFrame()
-    return pd.read_parquet(path)
+    df = pd.read_parquet(path)
+    # Zones are stored as uint64 H3 cells; reports render them as hex strings.
+    for col in df.columns:
+        if col.startswith("zone_id") and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = cells_to_str(df[col])
+    return df
 
 
 def _safe_text(value: object) -> str:
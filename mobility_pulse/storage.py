@@ -0,0 +1,167 @@
+"""Parquet dataset helpers shared by ingest and transform steps."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+LOGGER = logging.getLogger(__name__)
+
+
+def remove_path(path: Path) -> None:
+    """Remove a file or directory if it exists."""
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    elif path.exists():
+        path.unlink(missing_ok=True)
+
+
+def _files(path: Path) -> list[Path]:
+    if path.is_file():
+        return [path]
+    if not path.is_dir():
+        return []
+    return sorted(
+        file
+        for file in path.rglob("*")
+        if file.is_file()
+        and not any(p.startswith(".") for p in file.relative_to(path).parts)
+    )
+
+
+def paths_fingerprint(paths: tuple[Path, ...], extra: object = None) -> str:
+    """Fingerprint of every file under ``paths`` (name, size, mtime) and ``extra``.
+
+    Hidden (``.``-prefixed) staging files are ignored, so an atomic write in
+    progress does not count as a change.
+    """
+    digest = hashlib.sha256(json.dumps(extra, sort_keys=True, default=str).encode())
+    for path in paths:
+        files = _files(path)
+        if not files:
+            digest.update(f"{path}:missing\n".encode())
+        for file in files:
+            stat = file.stat()
+            digest.update(f"{file}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _widen_dictionaries(schema: pa.Schema) -> pa.Schema:
+    """Schema that later chunks of the same columns also fit.
+
+    Dictionaries get int32 indices so later chunks may carry more categories,
+    and all-null object columns (Arrow ``null``) become strings so later
+    chunks may carry values.
+    """
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            widened = pa.dictionary(pa.int32(), field.type.value_type)
+            schema = schema.set(i, field.with_type(widened))
+        elif pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+
+def write_table_atomic(table: pa.Table, path: Path) -> Path:
+    """Write one parquet file via a hidden temp file and an atomic rename.
+
+    Readers never observe a partially written file, and a crash leaves at most
+    a ``.<name>.tmp`` file that dataset discovery ignores.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+class DatasetWriter:
+    """Append DataFrame chunks to a hive-partitioned parquet dataset.
+
+    The schema is fixed by the first chunk so every part file is readable as a
+    single dataset; categorical columns are stored as int32-indexed
+    dictionaries so each chunk may bring its own categories, and text columns
+    that are all null in the first chunk are stored as strings. With
+    ``atomic=True`` (full rebuilds) parts are staged in a hidden sibling
+    ``.<name>.tmp`` directory and swapped into place on ``close``; with
+    ``atomic=False`` parts are appended to the existing dataset directly.
+
+    Example:
+        >>> with DatasetWriter(PROCESSED_DIR / "c5_incidents.parquet", ["month"]) as w:
+        ...     for chunk in chunks:
+        ...         w.write(chunk)
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        partition_cols: list[str] | None = None,
+        atomic: bool = True,
+        prefix: str = "part",
+    ) -> None:
+        self.root = root
+        self.partition_cols = partition_cols or []
+        self.atomic = atomic
+        self.prefix = prefix
+        self.schema: pa.Schema | None = None
+        self.rows = 0
+        self._parts = 0
+        # Hidden staging name: pyarrow dataset discovery skips "."-prefixed
+        # entries, so staging inside a parent dataset stays invisible to readers.
+        self._target = root.with_name(f".{root.name}.tmp") if atomic else root
+        if atomic:
+            remove_path(self._target)
+        self._target.mkdir(parents=True, exist_ok=True)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Write one chunk as new part file(s)."""
+        if df.empty:
+            return
+        if self.schema is None:
+            self.schema = _widen_dictionaries(
+                pa.Schema.from_pandas(df, preserve_index=False)
+            )
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            root_path=str(self._target),
+            partition_cols=self.partition_cols or None,
+            basename_template=f"{self.prefix}-{self._parts:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        self._parts += 1
+        self.rows += len(df)
+
+    def close(self) -> Path:
+        """Finalize the dataset and return its root path."""
+        if self.atomic:
+            remove_path(self.root)
+            self._target.rename(self.root)
+        LOGGER.info("Wrote %s rows to %s", f"{self.rows:,}", self.root)
+        return self.root
+
+    def abort(self) -> None:
+        """Discard staged parts of an atomic write."""
+        if self.atomic:
+            remove_path(self._target)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,157 @@
+"""Compact dtype inference for processed tables.
+
+Processed parquet files feed every dashboard load, so they are written with
+the narrowest dtypes that hold their values:
+
+- low-cardinality strings become categoricals (repeated alcaldía/colonia
+  names, incident types, sources, station ids, ...);
+- coordinate columns become ``float32`` (~1 m precision at CDMX latitudes;
+  zones are assigned from full-precision values before downcasting);
+- integral numbers become the smallest nullable ``Int8``/``Int16``/``Int32``.
+
+Datetimes, booleans and H3 ``zone_id`` columns are left untouched. A per-source
+``columns`` list in ``config/datasets.yml`` optionally projects raw columns
+away before the write (columns derived by standardization are always kept).
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.config import load_datasets
+
+LOGGER = logging.getLogger(__name__)
+
+CATEGORY_MAX_RATIO = 0.5
+
+_COORD_PATTERN = re.compile(
+    r"(^|_)(lat|lon|lng|latitud|longitud|latitude|longitude)(_|$)"
+)
+_INT_TYPES = ("Int8", "Int16", "Int32", "Int64")
+
+# Columns produced by standardize_* (kept regardless of the projection list).
+DERIVED_COLUMNS = frozenset(
+    {
+        "timestamp",
+        "end_timestamp",
+        "lat",
+        "lon",
+        "end_lat",
+        "end_lon",
+        "source",
+        "zone_id",
+        "zone_id_end",
+        "month",
+        "stop_id",
+        "stop_name",
+        "station_id",
+        "start_station_id",
+        "end_station_id",
+        "bikes_available",
+        "docks_available",
+    }
+)
+
+
+def _is_text(series: pd.Series) -> bool:
+    if isinstance(series.dtype, pd.StringDtype):
+        return True
+    if series.dtype != object:
+        return False
+    sample = series.dropna().head(1000)
+    return not sample.empty and sample.map(type).eq(str).all()
+
+
+def _smallest_int(series: pd.Series) -> str | None:
+    values = series.dropna()
+    if values.empty:
+        return None
+    lo, hi = values.min(), values.max()
+    for dtype in _INT_TYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return None
+
+
+def infer_dtype_plan(
+    df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO
+) -> dict[str, str]:
+    """Choose a compact dtype per column; columns to keep as-is are omitted."""
+    plan: dict[str, str] = {}
+    for col in df.columns:
+        series = df[col]
+        dtype = series.dtype
+        if (
+            str(col).startswith("zone_id")
+            or isinstance(dtype, pd.CategoricalDtype)
+            or pd.api.types.is_bool_dtype(dtype)
+            or pd.api.types.is_datetime64_any_dtype(dtype)
+        ):
+            continue
+        if _COORD_PATTERN.search(str(col).lower()) and not _is_text(series):
+            if dtype != np.float32:
+                plan[col] = "float32"
+            continue
+        if pd.api.types.is_float_dtype(dtype):
+            values = series.dropna()
+            if not values.empty and values.mod(1).eq(0).all():
+                target = _smallest_int(values)
+                if target:
+                    plan[col] = target
+            continue
+        if pd.api.types.is_integer_dtype(dtype):
+            target = _smallest_int(series)
+            if target and np.dtype(target.lower()).itemsize < dtype.itemsize:
+                plan[col] = target
+            continue
+        if _is_text(series):
+            values = series.dropna()
+            if not values.empty and values.nunique() <= category_max_ratio * len(
+                values
+            ):
+                plan[col] = "category"
+    return plan
+
+
+def apply_dtype_plan(df: pd.DataFrame, plan: dict[str, str]) -> pd.DataFrame:
+    """Cast columns per ``plan`` (columns missing from ``df`` are skipped)."""
+    for col, dtype in plan.items():
+        if col not in df.columns:
+            continue
+        if dtype in _INT_TYPES:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+        elif dtype == "float32":
+            values = pd.to_numeric(df[col], errors="coerce")
+            df[col] = values.to_numpy(dtype=np.float32, na_value=np.nan)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def project_columns(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Keep only the configured raw columns of ``source`` plus derived ones."""
+    config = load_datasets().get(source)
+    if config is None or not config.columns:
+        return df
+    keep = set(config.columns) | DERIVED_COLUMNS
+    dropped = [c for c in df.columns if c not in keep]
+    if dropped:
+        LOGGER.info("%s: dropping %s unprojected columns", source, len(dropped))
+    return df.drop(columns=dropped)
+
+
+def compact_frame(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Project and downcast a standardized frame before it is written."""
+    df = project_columns(df, source)
+    before = df.memory_usage(deep=True).sum()
+    df = apply_dtype_plan(df, infer_dtype_plan(df))
+    after = df.memory_usage(deep=True).sum()
+    LOGGER.info(
+        "%s: compact dtypes %.1f MB -> %.1f MB", source, before / 1e6, after / 1e6
+    )
+    return df
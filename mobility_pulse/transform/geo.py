@@ -2,13 +2,50 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Literal
+
 import geopandas as gpd
-import pandas as pd
 import h3
+import numpy as np
+import pandas as pd
+from h3.api import basic_int as h3_int
 from shapely.geometry import Point
 
 from mobility_pulse.config import DEFAULT_H3_RESOLUTION
 
+# H3 null index; marks rows whose coordinates could not be zoned.
+H3_NULL = np.uint64(0)
+
+# Resolve the h3-py API once at import (v4 renamed geo_to_h3 -> latlng_to_cell).
+if hasattr(h3, "latlng_to_cell"):
+    _latlng_to_int = h3_int.latlng_to_cell
+    _int_to_str = h3.int_to_str
+    _str_to_int = h3.str_to_int
+    _grid_ring = h3_int.grid_ring
+    _grid_disk = h3_int.grid_disk
+    _get_resolution = h3_int.get_resolution
+    _cell_to_latlng = h3_int.cell_to_latlng
+    _cell_to_boundary = h3_int.cell_to_boundary
+else:  # pragma: no cover - h3-py < 4.0
+    _latlng_to_int = h3_int.geo_to_h3
+    _int_to_str = h3.h3_to_string
+    _str_to_int = h3.string_to_h3
+    _grid_ring = h3_int.hex_ring
+    _grid_disk = h3_int.k_ring
+    _get_resolution = h3_int.h3_get_resolution
+    _cell_to_latlng = h3_int.h3_to_geo
+    _cell_to_boundary = h3_int.h3_to_geo_boundary
+
+# H3 index layout: 4-bit resolution field at bits 52-55, then 15 3-bit digits.
+_RES_OFFSET = np.uint64(52)
+_RES_MASK = np.uint64(0xF) << _RES_OFFSET
+
+ZoneOutput = Literal["str", "category", "uint64"]
+
+EARTH_RADIUS_M = 6_371_008.8
+
 
 def to_geodataframe(
     df: pd.DataFrame, lat_col: str = "lat", lon_col: str = "lon"
@@ -36,16 +73,344 @@ def to_geodataframe(
     return gpd.GeoDataFrame(df.copy(), geometry=geometry, crs="EPSG:4326")
 
 
+def _as_float_array(values: pd.Series | np.ndarray) -> np.ndarray:
+    if isinstance(values, pd.Series):
+        return pd.to_numeric(values, errors="coerce").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+    return np.asarray(values, dtype=np.float64)
+
+
+def latlng_to_cells(
+    lat: pd.Series | np.ndarray,
+    lon: pd.Series | np.ndarray,
+    resolution: int | None = None,
+) -> np.ndarray:
+    """Convert coordinate arrays to H3 cells as a uint64 array.
+
+    NaN and out-of-range coordinates are masked in a single vectorized pass
+    and receive ``H3_NULL`` (0); only valid rows reach the h3 bindings, so no
+    per-row exception handling is needed.
+
+    Args:
+        lat: Latitudes in degrees.
+        lon: Longitudes in degrees.
+        resolution: H3 resolution level 0-15 (default: DEFAULT_H3_RESOLUTION).
+
+    Returns:
+        uint64 array of H3 cell indexes aligned with the inputs.
+    """
+    res = resolution or DEFAULT_H3_RESOLUTION
+    lat_arr = _as_float_array(lat)
+    lon_arr = _as_float_array(lon)
+    cells = np.zeros(len(lat_arr), dtype=np.uint64)
+    with np.errstate(invalid="ignore"):
+        valid = (np.abs(lat_arr) <= 90.0) & (np.abs(lon_arr) <= 180.0)
+    n_valid = int(valid.sum())
+    if n_valid:
+        cells[valid] = np.fromiter(
+            map(
+                _latlng_to_int,
+                lat_arr[valid].tolist(),
+                lon_arr[valid].tolist(),
+                repeat(res, n_valid),
+            ),
+            dtype=np.uint64,
+            count=n_valid,
+        )
+    return cells
+
+
+def latlng_to_cells_chunked(
+    lat: pd.Series | np.ndarray,
+    lon: pd.Series | np.ndarray,
+    resolution: int | None = None,
+    chunk_size: int = 1_000_000,
+    workers: int | None = None,
+) -> np.ndarray:
+    """Chunked (optionally multi-process) variant of ``latlng_to_cells``.
+
+    Args:
+        lat: Latitudes in degrees.
+        lon: Longitudes in degrees.
+        resolution: H3 resolution level 0-15.
+        chunk_size: Rows per chunk; bounds the size of temporary lists.
+        workers: Number of worker processes. ``None`` or 1 runs in-process.
+
+    Returns:
+        uint64 array of H3 cell indexes aligned with the inputs.
+    """
+    lat_arr = _as_float_array(lat)
+    lon_arr = _as_float_array(lon)
+    n = len(lat_arr)
+    if n <= chunk_size:
+        return latlng_to_cells(lat_arr, lon_arr, resolution)
+
+    bounds = range(0, n, chunk_size)
+    lat_chunks = [lat_arr[i : i + chunk_size] for i in bounds]
+    lon_chunks = [lon_arr[i : i + chunk_size] for i in bounds]
+    res_iter = repeat(resolution, len(lat_chunks))
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(latlng_to_cells, lat_chunks, lon_chunks, res_iter))
+    else:
+        parts = list(map(latlng_to_cells, lat_chunks, lon_chunks, res_iter))
+    return np.concatenate(parts)
+
+
+def cells_to_str(cells: np.ndarray | pd.Series) -> np.ndarray:
+    """Render uint64 H3 cells as hex strings (``None`` for ``H3_NULL``/NA).
+
+    Each distinct cell is converted once, so the cost scales with the number
+    of zones rather than the number of rows.
+    """
+    if isinstance(cells, pd.Series):
+        cells = cells.to_numpy(dtype=np.uint64, na_value=H3_NULL)
+    codes, uniques = pd.factorize(np.asarray(cells, dtype=np.uint64))
+    labels = np.array(
+        [_int_to_str(int(cell)) if cell else None for cell in uniques] + [None],
+        dtype=object,
+    )
+    return labels[codes]
+
+
+def _str_to_cell(value: object) -> int:
+    try:
+        return int(_str_to_int(str(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def zone_cells(values: pd.Series | np.ndarray) -> np.ndarray:
+    """Coerce a zone column to uint64 H3 cells.
+
+    Accepts integer cells (plain or nullable) as well as legacy hex-string
+    zone ids; missing or unparseable values become ``H3_NULL``.
+    """
+    series = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.to_numpy(dtype=np.uint64, na_value=H3_NULL)
+    codes, uniques = pd.factorize(series)
+    parsed = np.array([_str_to_cell(value) for value in uniques] + [0], dtype=np.uint64)
+    return parsed[codes]
+
+
+def cells_to_zone_array(cells: np.ndarray) -> pd.arrays.IntegerArray:
+    """Wrap uint64 cells as a nullable UInt64 array (``H3_NULL`` -> NA)."""
+    cells = np.asarray(cells, dtype=np.uint64)
+    return pd.arrays.IntegerArray(cells, mask=cells == H3_NULL)
+
+
+# Average H3 edge length (m) per resolution, for h3-py builds without
+# average_hexagon_edge_length.
+_EDGE_LENGTH_M = (
+    1107712.591,
+    418676.0055,
+    158244.6558,
+    59810.85794,
+    22606.3794,
+    8544.408276,
+    3229.482772,
+    1220.629759,
+    461.354684,
+    174.375668,
+    65.907807,
+    24.910561,
+    9.415526,
+    3.559893,
+    1.348575,
+    0.509713,
+)
+
+
+def edge_length_m(resolution: int) -> float:
+    """Average hexagon edge length in metres at ``resolution`` (0 if invalid)."""
+    if hasattr(h3, "average_hexagon_edge_length"):
+        return float(h3.average_hexagon_edge_length(resolution, unit="m"))
+    if hasattr(h3, "hexagon_edge_length"):
+        return float(h3.hexagon_edge_length(resolution, unit="m"))
+    if 0 <= resolution < len(_EDGE_LENGTH_M):
+        return float(_EDGE_LENGTH_M[resolution])
+    return 0.0
+
+
+def bbox_ring_limit(bbox: dict[str, float], resolution: int) -> int:
+    """Most H3 rings between two cells inside ``bbox`` at ``resolution``.
+
+    Cells ``k`` rings apart have centres at least ``1.5 × edge × k`` metres
+    apart, so the bbox diagonal bounds ``k``. Used to cap grid searches so
+    that stray zones far outside the study area cannot make them run away.
+    """
+    diagonal = float(
+        haversine_m(bbox["min_lat"], bbox["min_lon"], bbox["max_lat"], bbox["max_lon"])
+    )
+    edge = edge_length_m(resolution)
+    return int(np.ceil(diagonal / (1.5 * edge))) + 1 if edge else 0
+
+
+def haversine_m(
+    lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray
+) -> np.ndarray:
+    """Great-circle distance in metres between coordinate arrays."""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2)
+    )
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cell_centroids(cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Centroid ``(lat, lon)`` arrays of uint64 cells (NaN for ``H3_NULL``)."""
+    cells = np.asarray(cells, dtype=np.uint64)
+    codes, uniques = pd.factorize(cells)
+    points = np.array(
+        [_cell_to_latlng(int(c)) if c else (np.nan, np.nan) for c in uniques]
+        + [(np.nan, np.nan)],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    return points[codes, 0], points[codes, 1]
+
+
+def cell_boundaries(cells: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Boundary vertices of uint64 cells as flat arrays.
+
+    Returns:
+        ``(offsets, lat, lon)``: the vertices of ``cells[i]`` are
+        ``lat[offsets[i]:offsets[i + 1]]`` (same for ``lon``); ``offsets`` has
+        ``len(cells) + 1`` entries. ``H3_NULL`` cells have no vertices.
+    """
+    cells = np.asarray(cells, dtype=np.uint64)
+    rings = [_cell_to_boundary(int(c)) if c else () for c in cells]
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(
+        np.fromiter(map(len, rings), dtype=np.int64, count=len(rings)), out=offsets[1:]
+    )
+    vertices = np.array(
+        [point for ring in rings for point in ring], dtype=np.float64
+    ).reshape(-1, 2)
+    return offsets, vertices[:, 0], vertices[:, 1]
+
+
+def grid_disk_pairs(cells: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """All ``(cell, neighbour)`` pairs within ``k`` rings of each distinct cell.
+
+    Returns two aligned uint64 arrays; ``H3_NULL`` cells are skipped.
+    """
+    origins = [int(c) for c in pd.unique(np.asarray(cells, dtype=np.uint64)) if c]
+    disks = [_grid_disk(cell, k) for cell in origins]
+    sizes = np.fromiter(map(len, disks), dtype=np.int64, count=len(disks))
+    source = np.repeat(np.asarray(origins, dtype=np.uint64), sizes)
+    target = np.fromiter(
+        (n for disk in disks for n in disk), dtype=np.uint64, count=int(sizes.sum())
+    )
+    return source, target
+
+
+def cells_to_parent(cells: np.ndarray, resolution: int) -> np.ndarray:
+    """Parent cells at ``resolution`` (cells already coarser stay as they are).
+
+    Works on the H3 bit layout directly: the parent keeps the base cell and
+    the first ``resolution`` digits, sets the resolution field and marks the
+    finer digits unused (``0b111``). ``H3_NULL`` stays null.
+    """
+    cells = np.asarray(cells, dtype=np.uint64)
+    res = (cells >> _RES_OFFSET) & np.uint64(0xF)
+    unused = np.uint64((1 << (3 * (15 - resolution))) - 1)
+    parents = (cells & ~_RES_MASK) | (np.uint64(resolution) << _RES_OFFSET) | unused
+    return np.where((cells != H3_NULL) & (res > resolution), parents, cells)
+
+
+def cell_resolutions(cells: np.ndarray, default: int | None = None) -> np.ndarray:
+    """H3 resolution of each cell (``default`` for ``H3_NULL``) as int8."""
+    cells = np.asarray(cells, dtype=np.uint64)
+    fill = DEFAULT_H3_RESOLUTION if default is None else default
+    codes, uniques = pd.factorize(cells)
+    res = np.array(
+        [_get_resolution(int(cell)) if cell else fill for cell in uniques] + [fill],
+        dtype=np.int8,
+    )
+    return res[codes]
+
+
+def grid_ring_distances(
+    cells: np.ndarray,
+    sources: np.ndarray,
+    max_k: int | None = None,
+) -> np.ndarray:
+    """Grid distance from each cell to its nearest source cell.
+
+    Runs one breadth-first expansion over the H3 grid seeded from all
+    ``sources`` at once: ring ``k`` is the set of unvisited neighbours of
+    ring ``k - 1``, so every cell is labelled the first time any source
+    reaches it. The sweep stops as soon as every reachable target is
+    labelled (or after ``max_k`` rings), so its cost scales with the area
+    around the sources rather than with ``cells × k²``.
+
+    Args:
+        cells: uint64 target cells.
+        sources: uint64 source cells (e.g. zones with transit stops).
+        max_k: Optional ring limit; ``None`` expands until all targets are
+            reached.
+
+    Returns:
+        int32 array aligned with ``cells``; -1 where a cell was not reached
+        (``H3_NULL``, different resolution than the sources, no sources or
+        beyond ``max_k``).
+    """
+    cells = np.asarray(cells, dtype=np.uint64)
+    out = np.full(len(cells), -1, dtype=np.int32)
+    seeds = {int(c) for c in np.asarray(sources, dtype=np.uint64).tolist() if c}
+    if not seeds or not len(cells):
+        return out
+
+    resolutions = {_get_resolution(cell) for cell in seeds}
+    codes, uniques = pd.factorize(cells)
+    pending = {
+        int(cell)
+        for cell in uniques.tolist()
+        if cell and _get_resolution(int(cell)) in resolutions
+    }
+    found: dict[int, int] = {}
+    # BFS layers only touch neighbouring layers, so the previous ring is all
+    # that is needed to avoid revisits (memory stays O(ring size)).
+    previous: set[int] = set()
+    frontier = seeds
+    k = 0
+    while frontier and pending:
+        for cell in frontier & pending:
+            found[cell] = k
+        pending -= frontier
+        if not pending or (max_k is not None and k >= max_k):
+            break
+        k += 1
+        ring: set[int] = set()
+        for cell in frontier:
+            ring.update(_grid_ring(cell, 1))
+        previous, frontier = frontier, ring - frontier - previous
+
+    labels = np.array([found.get(int(c), -1) for c in uniques] + [-1], dtype=np.int32)
+    out[:] = labels[codes]
+    return out
+
+
 def add_zone_id(
     df: pd.DataFrame,
     lat_col: str = "lat",
     lon_col: str = "lon",
     resolution: int | None = None,
+    output: ZoneOutput = "uint64",
+    column: str = "zone_id",
+    chunk_size: int = 1_000_000,
+    workers: int | None = None,
 ) -> pd.DataFrame:
     """Assign H3 hexagonal zone identifiers to rows with valid coordinates.
 
     Uses the H3 spatial indexing system to convert lat/lon coordinates into
-    hexagonal cell IDs. Handles both old (h3-py < 4.0) and new H3 API versions.
+    hexagonal cell IDs. Coordinates are zoned in batches through
+    ``latlng_to_cells``; the h3-py API version is resolved once at import.
 
     Args:
         df: Input DataFrame with latitude and longitude columns.
@@ -53,37 +418,44 @@ def add_zone_id(
         lon_col: Name of the longitude column (default: "lon").
         resolution: H3 resolution level 0-15. Higher = smaller hexagons.
             Default uses config.DEFAULT_H3_RESOLUTION (typically 9 ≈ 180m edge).
+        output: Cell representation: "uint64" (nullable UInt64 integers, the
+            pipeline default), "str" (hex strings) or "category"
+            (categorical hex strings).
+        column: Name of the output column (default: "zone_id").
+        chunk_size: Rows zoned per batch.
+        workers: Worker processes for very large frames (``None`` = in-process).
 
     Returns:
-        DataFrame with added 'zone_id' column containing H3 cell strings.
-        Rows with invalid coordinates (NaN, out of range) get None for zone_id.
+        DataFrame with added zone column containing H3 cells.
+        Rows with invalid coordinates (NaN, out of range) get a missing value.
 
     Example:
         >>> df = pd.DataFrame({"lat": [19.432, None], "lon": [-99.133, -99.14]})
         >>> df = add_zone_id(df, resolution=9)
         >>> df["zone_id"].iloc[0]
-        '89283082833ffff'
-        >>> df["zone_id"].iloc[1]  # None due to missing lat
-        None
+        np.uint64(618287667198296063)
+        >>> df["zone_id"].iloc[1]  # NA due to missing lat
+        <NA>
+        >>> add_zone_id(df, output="str")["zone_id"].iloc[0]
+        '894995b845bffff'
 
     Note:
         Resolution 9 produces hexagons ~174m edge length (~0.1 km² area),
         suitable for urban mobility analysis at neighborhood scale.
     """
-    res = resolution or DEFAULT_H3_RESOLUTION
-
-    def _to_h3(lat: float, lon: float) -> str | None:
-        if pd.isna(lat) or pd.isna(lon):
-            return None
-        try:
-            if hasattr(h3, "geo_to_h3"):
-                return h3.geo_to_h3(lat, lon, res)
-            return h3.latlng_to_cell(lat, lon, res)
-        except Exception:
-            return None
+    cells = latlng_to_cells_chunked(
+        df[lat_col],
+        df[lon_col],
+        resolution=resolution,
+        chunk_size=chunk_size,
+        workers=workers,
+    )
 
     df = df.copy()
-    df["zone_id"] = [
-        _to_h3(lat, lon) for lat, lon in zip(df[lat_col], df[lon_col], strict=False)
-    ]
+    if output == "uint64":
+        df[column] = cells_to_zone_array(cells)
+    elif output == "category":
+        df[column] = pd.Categorical(cells_to_str(cells))
+    else:
+        df[column] = pd.Series(cells_to_str(cells), index=df.index, dtype=object)
     return df
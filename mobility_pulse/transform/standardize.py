@@ -3,15 +3,33 @@
 from __future__ import annotations
 
 import logging
+from functools import partial
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from mobility_pulse.config import PROCESSED_DIR, RAW_DIR
-from mobility_pulse.transform.geo import add_zone_id
+from mobility_pulse.config import PROCESSED_DIR, RAW_DIR, load_datasets
+from mobility_pulse.context import BuildContext
+from mobility_pulse.ingest.ecobici_rt import legacy_snapshots_path
+from mobility_pulse.ingest.gtfs import load_gtfs_table
+from mobility_pulse.ingest.station_history import StationHistory
+from mobility_pulse.storage import DatasetWriter, remove_path
+from mobility_pulse.transform.dtypes import (
+    apply_dtype_plan,
+    compact_frame,
+    infer_dtype_plan,
+    project_columns,
+)
+from mobility_pulse.transform.geo import add_zone_id, cells_to_zone_array
+from mobility_pulse.transform.stations import StationIndex, locate_stations
 
 LOGGER = logging.getLogger(__name__)
 
+# Event files are written sorted by time in row groups of this size, so
+# date-filtered scans (the dashboard) skip row groups by their statistics.
+EVENT_ROW_GROUP_ROWS = 131_072
+
 
 def _safe_read_csv(path: Path, **kwargs: object) -> pd.DataFrame | None:
     if not path.exists():
@@ -20,80 +38,222 @@ def _safe_read_csv(path: Path, **kwargs: object) -> pd.DataFrame | None:
     return pd.read_csv(path, **kwargs)
 
 
-def standardize_c5() -> Path | None:
-    raw_path = RAW_DIR / "c5" / "c5_incidents.csv"
-    df = _safe_read_csv(raw_path)
-    if df is None:
-        return None
+def _newest_mtime(path: Path) -> int:
+    """Latest mtime (ns) of ``path`` or of any file under it; -1 if missing."""
+    if path.is_file():
+        return path.stat().st_mtime_ns
+    files = path.rglob("*") if path.is_dir() else ()
+    return max((f.stat().st_mtime_ns for f in files if f.is_file()), default=-1)
+
+
+_DATE_FORMATS_DAYFIRST = ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%Y/%m/%d")
+_DATE_FORMATS_MONTHFIRST = ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%m-%d-%Y")
+_TIME_FORMATS = ("%H:%M:%S", "%H:%M", "%H:%M:%S.%f")
+
+
+def _write_events(df: pd.DataFrame, out_path: Path) -> None:
+    df = df.sort_values("timestamp", kind="stable", ignore_index=True)
+    df.to_parquet(out_path, index=False, row_group_size=EVENT_ROW_GROUP_ROWS)
 
+
+def _pick(cols: list[str], preferred: list[str]) -> str | None:
+    lower_map = {c.lower(): c for c in cols}
+    for key in preferred:
+        if key in lower_map:
+            return lower_map[key]
+    return cols[0] if cols else None
+
+
+def _detect_c5_columns(columns: pd.Index) -> dict[str, str | None]:
+    """Guess C5 date/time/lat/lon columns from the header."""
     # Common column guesses with priority ordering
     date_candidates = [
-        c for c in df.columns if "fecha" in c.lower() or "date" in c.lower()
-    ]
-    time_candidates = [
-        c for c in df.columns if "hora" in c.lower() or "time" in c.lower()
+        c for c in columns if "fecha" in c.lower() or "date" in c.lower()
     ]
-
-    def _pick(cols: list[str], preferred: list[str]) -> str | None:
-        lower_map = {c.lower(): c for c in cols}
-        for key in preferred:
-            if key in lower_map:
-                return lower_map[key]
-        return cols[0] if cols else None
-
+    time_candidates = [c for c in columns if "hora" in c.lower() or "time" in c.lower()]
     lat_candidates = [
         c
-        for c in df.columns
+        for c in columns
         if c.lower() in {"lat", "latitud", "latitude"} or c.lower().startswith("lat")
     ]
     lon_candidates = [
         c
-        for c in df.columns
+        for c in columns
         if c.lower() in {"lon", "lng", "longitud", "longitude"}
         or c.lower().startswith("lon")
     ]
+    return {
+        "date": date_candidates[0] if date_candidates else None,
+        "time": time_candidates[0] if time_candidates else None,
+        "lat": _pick(lat_candidates, ["latitud", "latitude", "lat"]),
+        "lon": _pick(lon_candidates, ["longitud", "longitude", "lon", "lng"]),
+    }
+
+
+def _c5_usecols(header: pd.Index, cols: dict[str, str | None]) -> list[str] | None:
+    """Raw C5 columns to parse: the configured projection plus detected ones."""
+    projection = load_datasets()["c5"].columns
+    if not projection:
+        return None
+    wanted = set(projection) | {c for c in cols.values() if c}
+    return [c for c in header if c in wanted]
 
-    ts_col = date_candidates[0] if date_candidates else None
-    time_col = time_candidates[0] if time_candidates else None
-    lat_col = _pick(lat_candidates, ["latitud", "latitude", "lat"])
-    lon_col = _pick(lon_candidates, ["longitud", "longitude", "lon", "lng"])
 
-    def _detect_dayfirst(series: pd.Series) -> bool:
-        sample = series.dropna().astype(str).str.strip().head(50)
-        if sample.empty:
-            return True
-        return not sample.str.match(r"^\d{4}-\d{2}-\d{2}$").any()
+def _detect_dayfirst(series: pd.Series) -> bool:
+    sample = series.dropna().astype(str).str.strip().head(50)
+    if sample.empty:
+        return True
+    return not sample.str.match(r"^\d{4}-\d{2}-\d{2}$").any()
 
-    dayfirst = _detect_dayfirst(df[ts_col]) if ts_col else True
 
-    if ts_col and time_col:
-        df["timestamp"] = pd.to_datetime(
-            df[ts_col].astype(str).str.strip()
+def _timestamp_text(df: pd.DataFrame, cols: dict[str, str | None]) -> pd.Series | None:
+    if cols["date"] and cols["time"]:
+        return (
+            df[cols["date"]].astype(str).str.strip()
             + " "
-            + df[time_col].astype(str).str.strip(),
-            errors="coerce",
-            dayfirst=dayfirst,
+            + df[cols["time"]].astype(str).str.strip()
         )
-    elif ts_col:
-        df["timestamp"] = pd.to_datetime(df[ts_col], errors="coerce", dayfirst=dayfirst)
-    else:
-        df["timestamp"] = pd.NaT
+    if cols["date"]:
+        return df[cols["date"]].astype(str).str.strip()
+    return None
 
-    df["lat"] = pd.to_numeric(df[lat_col], errors="coerce") if lat_col else pd.NA
-    df["lon"] = pd.to_numeric(df[lon_col], errors="coerce") if lon_col else pd.NA
+
+def _detect_datetime_format(
+    text: pd.Series, dayfirst: bool, with_time: bool
+) -> str | None:
+    """Return the first strftime format that parses the sample, if any."""
+    sample = text.dropna().head(500)
+    if sample.empty:
+        return None
+    date_formats = _DATE_FORMATS_DAYFIRST if dayfirst else _DATE_FORMATS_MONTHFIRST
+    candidates = (
+        [f"{d} {t}" for d in date_formats for t in _TIME_FORMATS]
+        if with_time
+        else list(date_formats)
+    )
+    for fmt in candidates:
+        parsed = pd.to_datetime(sample, format=fmt, errors="coerce")
+        if parsed.notna().mean() >= 0.95:
+            return fmt
+    return None
+
+
+def _parse_timestamp(text: pd.Series, fmt: str | None, dayfirst: bool) -> pd.Series:
+    if fmt:
+        return pd.to_datetime(text, format=fmt, errors="coerce")
+    return pd.to_datetime(text, errors="coerce", dayfirst=dayfirst)
+
+
+def _standardize_c5_frame(
+    df: pd.DataFrame,
+    cols: dict[str, str | None],
+    fmt: str | None,
+    dayfirst: bool,
+) -> pd.DataFrame:
+    text = _timestamp_text(df, cols)
+    df["timestamp"] = (
+        _parse_timestamp(text, fmt, dayfirst) if text is not None else pd.NaT
+    )
+    df["lat"] = (
+        pd.to_numeric(df[cols["lat"]], errors="coerce") if cols["lat"] else pd.NA
+    )
+    df["lon"] = (
+        pd.to_numeric(df[cols["lon"]], errors="coerce") if cols["lon"] else pd.NA
+    )
     df["source"] = "c5"
+    return add_zone_id(df)
+
 
-    df = add_zone_id(df)
+def standardize_c5(chunk_rows: int | None = None) -> Path | None:
+    """Standardize the raw C5 CSV into ``c5_incidents.parquet``.
 
+    Args:
+        chunk_rows: When set, stream the CSV in chunks of this many rows into
+            a month-partitioned parquet dataset (a directory at the same path)
+            so peak memory is bounded by the chunk size, not the file size.
+    """
+    raw_path = RAW_DIR / "c5" / "c5_incidents.csv"
     out_path = PROCESSED_DIR / "c5_incidents.parquet"
-    df.to_parquet(out_path, index=False)
+    if chunk_rows:
+        return _standardize_c5_streaming(raw_path, out_path, chunk_rows)
+
+    header = _safe_read_csv(raw_path, nrows=0)
+    if header is None:
+        return None
+
+    cols = _detect_c5_columns(header.columns)
+    df = pd.read_csv(raw_path, usecols=_c5_usecols(header.columns, cols))
+    dayfirst = _detect_dayfirst(df[cols["date"]]) if cols["date"] else True
+    text = _timestamp_text(df, cols)
+    fmt = (
+        _detect_datetime_format(text, dayfirst, with_time=bool(cols["time"]))
+        if text is not None
+        else None
+    )
+    df = compact_frame(_standardize_c5_frame(df, cols, fmt, dayfirst), "c5")
+
+    remove_path(out_path)
+    _write_events(df, out_path)
     LOGGER.info("Wrote %s", out_path)
     return out_path
 
 
+def _standardize_c5_streaming(
+    raw_path: Path, out_path: Path, chunk_rows: int
+) -> Path | None:
+    if not raw_path.exists():
+        LOGGER.warning("Missing file: %s", raw_path)
+        return None
+
+    # Column detection runs once on the header; format detection on the first chunk.
+    header = pd.read_csv(raw_path, nrows=0).columns
+    cols = _detect_c5_columns(header)
+    # Raw columns are read as strings so every chunk shares one schema.
+    reader = pd.read_csv(
+        raw_path,
+        dtype=str,
+        chunksize=chunk_rows,
+        usecols=_c5_usecols(header, cols),
+    )
+    fmt: str | None = None
+    dayfirst = True
+    first = True
+    plan: dict[str, str] = {}
+    with DatasetWriter(out_path, partition_cols=["month"]) as writer:
+        for chunk in reader:
+            if first:
+                first = False
+                dayfirst = (
+                    _detect_dayfirst(chunk[cols["date"]]) if cols["date"] else True
+                )
+                text = _timestamp_text(chunk, cols)
+                if text is not None:
+                    fmt = _detect_datetime_format(
+                        text, dayfirst, with_time=bool(cols["time"])
+                    )
+                LOGGER.info("C5 columns %s, timestamp format %s", cols, fmt)
+            chunk = _standardize_c5_frame(chunk, cols, fmt, dayfirst)
+            # Keep the raw coordinate columns numeric, as in the single-pass output.
+            for raw_col, std_col in ((cols["lat"], "lat"), (cols["lon"], "lon")):
+                if raw_col and raw_col != std_col:
+                    chunk[raw_col] = chunk[std_col]
+            # Unparseable timestamps land in an explicit partition (null keys
+            # cannot be unified when the dataset is read back).
+            chunk["month"] = chunk["timestamp"].dt.strftime("%Y-%m").fillna("unknown")
+            chunk = project_columns(chunk, "c5")
+            if not plan:
+                # Dtypes are chosen once so every chunk shares one schema.
+                plan = infer_dtype_plan(chunk)
+                plan.pop("month", None)
+            writer.write(apply_dtype_plan(chunk, plan))
+    return out_path
+
+
 def standardize_gtfs() -> Path | None:
-    stops_path = RAW_DIR / "gtfs" / "extracted" / "stops.txt"
-    df = _safe_read_csv(stops_path)
+    df = load_gtfs_table("stops")
+    if df is None:
+        # Feeds ingested before the parquet tables existed.
+        df = _safe_read_csv(RAW_DIR / "gtfs" / "extracted" / "stops.txt")
     if df is None:
         return None
 
@@ -107,7 +267,7 @@ def standardize_gtfs() -> Path | None:
     )
     df["timestamp"] = pd.NaT
     df["source"] = "gtfs"
-    df = add_zone_id(df, lat_col="lat", lon_col="lon")
+    df = compact_frame(add_zone_id(df, lat_col="lat", lon_col="lon"), "gtfs")
 
     out_path = PROCESSED_DIR / "gtfs_stops.parquet"
     df.to_parquet(out_path, index=False)
@@ -116,12 +276,20 @@ def standardize_gtfs() -> Path | None:
 
 
 def standardize_ecobici_rt() -> Path | None:
-    raw_path = RAW_DIR / "ecobici" / "rt" / "parsed" / "station_snapshots.parquet"
-    if not raw_path.exists():
-        LOGGER.warning("Missing file: %s", raw_path)
+    """Write station status change events (with station metadata)."""
+    raw_dir = RAW_DIR / "ecobici" / "rt"
+    if legacy_snapshots_path(raw_dir).exists():
+        LOGGER.warning(
+            "Legacy ECOBICI RT snapshots in %s are not in the station history; "
+            "run `mobility_pulse ingest --source ecobici_rt --snapshots 0` "
+            "to import them",
+            legacy_snapshots_path(raw_dir),
+        )
+    if not (raw_dir / "history").exists():
+        LOGGER.warning("Missing ECOBICI RT history: %s", raw_dir / "history")
         return None
 
-    df = pd.read_parquet(raw_path)
+    df = StationHistory(raw_dir / "history").status_series()
     if "timestamp" in df.columns:
         df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
         if hasattr(df["timestamp"].dt, "tz"):
@@ -141,8 +309,7 @@ def standardize_ecobici_rt() -> Path | None:
             df["num_docks_available"], errors="coerce"
         )
 
-    df = add_zone_id(df, lat_col="lat", lon_col="lon")
-
+    df = compact_frame(add_zone_id(df, lat_col="lat", lon_col="lon"), "ecobici_rt")
     out_path = PROCESSED_DIR / "ecobici_rt.parquet"
     df.to_parquet(out_path, index=False)
     LOGGER.info("Wrote %s", out_path)
@@ -150,8 +317,16 @@ def standardize_ecobici_rt() -> Path | None:
 
 
 def standardize_ecobici_trips() -> Path | None:
-    raw_path = RAW_DIR / "ecobici" / "trips" / "ecobici_trips.csv"
-    df = _safe_read_csv(raw_path)
+    raw_dir = RAW_DIR / "ecobici" / "trips"
+    monthly_path = raw_dir / "ecobici_trips.parquet"
+    csv_path = raw_dir / "ecobici_trips.csv"
+    # The most recently ingested source wins: the month-partitioned dataset
+    # from `ingest --months` or the single CSV from a plain `ingest`.
+    if monthly_path.is_dir() and _newest_mtime(monthly_path) >= _newest_mtime(csv_path):
+        df = pd.read_parquet(monthly_path)
+        df["month"] = df["month"].astype(str)
+    else:
+        df = _safe_read_csv(csv_path)
     if df is None:
         return None
 
@@ -252,63 +427,34 @@ def standardize_ecobici_trips() -> Path | None:
         None,
     )
 
-    df["lat"] = pd.to_numeric(df[start_lat], errors="coerce") if start_lat else pd.NA
-    df["lon"] = pd.to_numeric(df[start_lon], errors="coerce") if start_lon else pd.NA
-    df["end_lat"] = pd.to_numeric(df[end_lat], errors="coerce") if end_lat else pd.NA
-    df["end_lon"] = pd.to_numeric(df[end_lon], errors="coerce") if end_lon else pd.NA
-
-    if start_lat is None or start_lon is None:
-        stations_path = PROCESSED_DIR / "ecobici_rt.parquet"
-        if stations_path.exists() and "station_id" in df.columns:
-            stations = pd.read_parquet(stations_path)
-            if {"station_id", "lat", "lon"}.issubset(stations.columns):
-                stations = (
-                    stations[["station_id", "lat", "lon"]]
-                    .dropna(subset=["station_id"])
-                    .drop_duplicates("station_id")
-                )
-                stations["station_id"] = stations["station_id"].astype(str)
-                df["start_station_id"] = df["start_station_id"].astype(str)
-                df = df.merge(
-                    stations.rename(columns={"lat": "start_lat", "lon": "start_lon"}),
-                    left_on="start_station_id",
-                    right_on="station_id",
-                    how="left",
-                )
-                df = df.drop(columns=["station_id"], errors="ignore")
-                if "start_lat" in df.columns:
-                    df["lat"] = df["lat"].fillna(df["start_lat"])
-                if "start_lon" in df.columns:
-                    df["lon"] = df["lon"].fillna(df["start_lon"])
-
-    if end_lat is None or end_lon is None:
-        stations_path = PROCESSED_DIR / "ecobici_rt.parquet"
-        if stations_path.exists() and "end_station_id" in df.columns:
-            stations = pd.read_parquet(stations_path)
-            if {"station_id", "lat", "lon"}.issubset(stations.columns):
-                stations = (
-                    stations[["station_id", "lat", "lon"]]
-                    .dropna(subset=["station_id"])
-                    .drop_duplicates("station_id")
-                )
-                stations["station_id"] = stations["station_id"].astype(str)
-                df["end_station_id"] = df["end_station_id"].astype(str)
-                df = df.merge(
-                    stations.rename(columns={"lat": "end_lat", "lon": "end_lon"}),
-                    left_on="end_station_id",
-                    right_on="station_id",
-                    how="left",
-                )
-                df = df.drop(columns=["station_id"], errors="ignore")
-
-    df = add_zone_id(df, lat_col="lat", lon_col="lon")
-    if "end_lat" in df.columns and "end_lon" in df.columns:
-        df["zone_id_end"] = add_zone_id(df, lat_col="end_lat", lon_col="end_lon")[
-            "zone_id"
-        ]
+    # One station index serves both endpoints: codes -> coordinate/zone arrays.
+    index = None
+    if (start_station and not (start_lat and start_lon)) or (
+        end_station and not (end_lat and end_lon)
+    ):
+        index = StationIndex.load()
+    for prefix, station, lat_col, lon_col, zone_col in (
+        ("", start_station, start_lat, start_lon, "zone_id"),
+        ("end_", end_station, end_lat, end_lon, "zone_id_end"),
+    ):
+        if station is None and (lat_col is None or lon_col is None):
+            df[f"{prefix}lat"] = np.nan
+            df[f"{prefix}lon"] = np.nan
+            df[zone_col] = pd.array([pd.NA] * len(df), dtype="UInt64")
+            continue
+        lat, lon, zones = locate_stations(
+            index,
+            df[station] if station else None,
+            df[lat_col] if lat_col else None,
+            df[lon_col] if lon_col else None,
+        )
+        df[f"{prefix}lat"] = lat
+        df[f"{prefix}lon"] = lon
+        df[zone_col] = cells_to_zone_array(zones)
 
+    df = compact_frame(df, "ecobici_trips")
     out_path = PROCESSED_DIR / "ecobici_trips.parquet"
-    df.to_parquet(out_path, index=False)
+    _write_events(df, out_path)
     LOGGER.info("Wrote %s", out_path)
     return out_path
 
@@ -355,7 +501,7 @@ def standardize_gps() -> Path | None:
     df["lon"] = pd.to_numeric(df[lon_col], errors="coerce") if lon_col else pd.NA
     df["source"] = "gps_cdmx"
 
-    df = add_zone_id(df, lat_col="lat", lon_col="lon")
+    df = compact_frame(add_zone_id(df, lat_col="lat", lon_col="lon"), "gps_cdmx")
 
     out_path = PROCESSED_DIR / "gps_cdmx.parquet"
     df.to_parquet(out_path, index=False)
@@ -363,11 +509,24 @@ def standardize_gps() -> Path | None:
     return out_path
 
 
-def standardize_all() -> None:
-    """Run all standardization steps."""
+def standardize_all(
+    chunk_rows: int | None = None, context: BuildContext | None = None
+) -> None:
+    """Run all standardization steps.
+
+    Args:
+        chunk_rows: Stream the C5 CSV in chunks of this many rows (see
+            ``standardize_c5``). ``None`` loads it in one pass.
+        context: Shared build context; rewritten datasets are invalidated.
+    """
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-    standardize_gtfs()
-    standardize_c5()
-    standardize_ecobici_rt()
-    standardize_ecobici_trips()
-    standardize_gps()
+    for step in (
+        standardize_gtfs,
+        partial(standardize_c5, chunk_rows=chunk_rows),
+        standardize_ecobici_rt,
+        standardize_ecobici_trips,
+        standardize_gps,
+    ):
+        out_path = step()
+        if context is not None and out_path is not None:
+            context.invalidate(out_path.stem)
@@ -0,0 +1,135 @@
+"""ECOBICI station lookup index.
+
+Trip records only carry station codes; coordinates and zones come from the
+GBFS station metadata. ``StationIndex`` holds that metadata as aligned
+arrays (one row per station, zones computed once from full-precision
+coordinates), so attaching start/end locations to millions of trips is a
+code lookup plus array indexing instead of a frame merge.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.config import PROCESSED_DIR, RAW_DIR
+from mobility_pulse.ingest.station_history import StationHistory
+from mobility_pulse.transform.geo import H3_NULL, _as_float_array, latlng_to_cells
+
+LOGGER = logging.getLogger(__name__)
+
+
+def normalize_station_ids(values: pd.Index) -> pd.Index:
+    """Canonical string station codes (``27``, ``27.0`` and `` 27 `` match)."""
+    ids = pd.Index(values).astype(str).str.strip()
+    return ids.str.replace(r"^(-?\d+)\.0+$", r"\1", regex=True)
+
+
+@dataclass(frozen=True)
+class StationIndex:
+    """Station codes mapped to coordinate and H3 zone arrays.
+
+    Attributes:
+        station_ids: Unique normalized station codes; position = station code.
+        lat: float64 latitudes aligned with ``station_ids``.
+        lon: float64 longitudes aligned with ``station_ids``.
+        zones: uint64 H3 cells aligned with ``station_ids`` (``H3_NULL`` if
+            the station has no valid coordinates).
+    """
+
+    station_ids: pd.Index
+    lat: np.ndarray
+    lon: np.ndarray
+    zones: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> StationIndex:
+        """Build from a frame with ``station_id``, ``lat``, ``lon`` (last row wins)."""
+        ids = normalize_station_ids(df["station_id"].fillna("").to_numpy())
+        keep = ~ids.duplicated(keep="last") & (ids != "")
+        lat = _as_float_array(df["lat"])[keep]
+        lon = _as_float_array(df["lon"])[keep]
+        return cls(ids[keep], lat, lon, latlng_to_cells(lat, lon))
+
+    @classmethod
+    def load(cls, raw_dir: Path | None = None) -> StationIndex | None:
+        """Load from the station history, else processed ``ecobici_rt.parquet``."""
+        raw_dir = raw_dir or RAW_DIR / "ecobici" / "rt"
+        if (raw_dir / "history").exists():
+            meta = StationHistory(raw_dir / "history").metadata()
+            if not meta.empty:
+                return cls.from_frame(meta)
+
+        path = PROCESSED_DIR / "ecobici_rt.parquet"
+        if path.exists():
+            stations = pd.read_parquet(path, columns=["station_id", "lat", "lon"])
+            if not stations.empty:
+                return cls.from_frame(stations)
+        LOGGER.warning("No ECOBICI station metadata for trip coordinates")
+        return None
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    def codes(self, values: pd.Series) -> np.ndarray:
+        """Map station codes to index positions (-1 when unknown or missing).
+
+        Values are factorized first, so normalization and the index lookup
+        run once per distinct station rather than once per trip.
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            value_codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            value_codes, uniques = pd.factorize(values)
+        if len(uniques) == 0:
+            return np.full(len(values), -1, dtype=np.intp)
+        positions = self.station_ids.get_indexer(normalize_station_ids(uniques))
+        return np.where(value_codes >= 0, positions[value_codes], -1)
+
+    def lookup(self, values: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return ``(lat, lon, zones)`` arrays aligned with ``values``."""
+        codes = self.codes(values)
+        known = codes >= 0
+        lat = np.full(len(codes), np.nan)
+        lon = np.full(len(codes), np.nan)
+        zones = np.full(len(codes), H3_NULL, dtype=np.uint64)
+        lat[known] = self.lat[codes[known]]
+        lon[known] = self.lon[codes[known]]
+        zones[known] = self.zones[codes[known]]
+        return lat, lon, zones
+
+
+def locate_stations(
+    index: StationIndex | None,
+    station_ids: pd.Series | None,
+    lat: pd.Series | None = None,
+    lon: pd.Series | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Resolve ``(lat, lon, zones)`` arrays for one trip endpoint.
+
+    Raw ``lat``/``lon`` values win where present; remaining rows fall back to
+    the station lookup. Zones are only recomputed for rows that keep raw
+    coordinates, station rows reuse the zones precomputed in the index.
+    """
+    n = len(station_ids) if station_ids is not None else len(lat)
+    out_lat = np.full(n, np.nan)
+    out_lon = np.full(n, np.nan)
+    zones = np.full(n, H3_NULL, dtype=np.uint64)
+    if index is not None and station_ids is not None:
+        out_lat, out_lon, zones = index.lookup(station_ids)
+    if lat is None or lon is None:
+        return out_lat, out_lon, zones
+
+    raw_lat = _as_float_array(lat)
+    raw_lon = _as_float_array(lon)
+    raw = ~(np.isnan(raw_lat) | np.isnan(raw_lon))
+    if raw.any():
+        out_lat[raw] = raw_lat[raw]
+        out_lon[raw] = raw_lon[raw]
+        zones[raw] = latlng_to_cells(raw_lat[raw], raw_lon[raw])
+    return out_lat, out_lon, zones
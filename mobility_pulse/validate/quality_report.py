@@ -9,18 +9,12 @@ import numpy as np
 import pandas as pd
 
 from mobility_pulse.config import CDMX_BBOX, PROCESSED_DIR, REPORTS_DIR
+from mobility_pulse.context import BuildContext
 from mobility_pulse.validate.schemas import point_schema, station_status_schema
 
 LOGGER = logging.getLogger(__name__)
 
 
-def _load_optional(path: Path) -> pd.DataFrame | None:
-    if not path.exists():
-        LOGGER.warning("Missing processed file: %s", path)
-        return None
-    return pd.read_parquet(path)
-
-
 def _bbox_out_of_bounds(df: pd.DataFrame) -> float:
     mask = (
         (df["lon"] < CDMX_BBOX["min_lon"])
@@ -66,22 +60,28 @@ def _dataset_summary(name: str, df: pd.DataFrame) -> list[str]:
     return lines
 
 
-def generate_report() -> Path:
-    """Generate a markdown data-quality report."""
+def generate_report(context: BuildContext | None = None) -> Path:
+    """Generate a markdown data-quality report.
+
+    Args:
+        context: Shared build context; datasets already loaded by earlier
+            build steps are reused.
+    """
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
     report_path = REPORTS_DIR / "data_quality.md"
 
     datasets = {
-        "C5 Incidents": PROCESSED_DIR / "c5_incidents.parquet",
-        "GTFS Stops": PROCESSED_DIR / "gtfs_stops.parquet",
-        "ECOBICI RT": PROCESSED_DIR / "ecobici_rt.parquet",
-        "ECOBICI Trips": PROCESSED_DIR / "ecobici_trips.parquet",
+        "C5 Incidents": "c5_incidents",
+        "GTFS Stops": "gtfs_stops",
+        "ECOBICI RT": "ecobici_rt",
+        "ECOBICI Trips": "ecobici_trips",
     }
+    context = context or BuildContext(PROCESSED_DIR)
 
     lines = ["# Data Quality Report", ""]
 
-    for name, path in datasets.items():
-        df = _load_optional(path)
+    for name, dataset in datasets.items():
+        df = context.frame(dataset)
         if df is None:
             lines.append(f"### {name}\n- Missing dataset")
             lines.append("")
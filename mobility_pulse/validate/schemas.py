@@ -2,16 +2,22 @@
 
 from __future__ import annotations
 
+import pandas as pd
 import pandera.pandas as pa
 from pandera import Column, DataFrameSchema
 
+# Processed tables use compact dtypes (float32 coordinates, small nullable ints,
+# categorical strings), so columns are checked by kind rather than exact dtype.
+_is_float = pa.Check(lambda s: pd.api.types.is_float_dtype(s.dtype), name="float")
+_is_int = pa.Check(lambda s: pd.api.types.is_integer_dtype(s.dtype), name="integer")
+
 
 point_schema = DataFrameSchema(
     {
         "timestamp": Column(pa.DateTime, nullable=True),
-        "lat": Column(pa.Float, nullable=True, checks=pa.Check.in_range(-90, 90)),
-        "lon": Column(pa.Float, nullable=True, checks=pa.Check.in_range(-180, 180)),
-        "source": Column(pa.String, nullable=False),
+        "lat": Column(nullable=True, checks=[_is_float, pa.Check.in_range(-90, 90)]),
+        "lon": Column(nullable=True, checks=[_is_float, pa.Check.in_range(-180, 180)]),
+        "source": Column(nullable=False),
     },
     strict=False,
 )
@@ -19,10 +25,10 @@ point_schema = DataFrameSchema(
 
 station_status_schema = DataFrameSchema(
     {
-        "bikes_available": Column(pa.Int, nullable=True, checks=pa.Check.ge(0)),
-        "docks_available": Column(pa.Int, nullable=True, checks=pa.Check.ge(0)),
-        "num_bikes_available": Column(pa.Int, nullable=True, checks=pa.Check.ge(0)),
-        "num_docks_available": Column(pa.Int, nullable=True, checks=pa.Check.ge(0)),
+        "bikes_available": Column(nullable=True, checks=[_is_int, pa.Check.ge(0)]),
+        "docks_available": Column(nullable=True, checks=[_is_int, pa.Check.ge(0)]),
+        "num_bikes_available": Column(nullable=True, checks=[_is_int, pa.Check.ge(0)]),
+        "num_docks_available": Column(nullable=True, checks=[_is_int, pa.Check.ge(0)]),
     },
     strict=False,
 )
@@ -0,0 +1,75 @@
+"""Tests for the seasonal anomaly detector."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.analytics.anomalies import update_alerts
+from mobility_pulse.analytics.cube import build_cube
+
+
+def _events(days: int, spike_day: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    start = pd.Timestamp("2024-01-01")
+    rows = []
+    for day in range(days):
+        for zone in (11, 22):
+            n = int(rng.integers(4, 7))
+            if zone == 22 and day == spike_day:
+                n = 40
+            stamps = start + pd.Timedelta(days=day) + pd.Timedelta(hours=8)
+            rows.extend([(stamps, zone)] * n)
+    frame = pd.DataFrame(rows, columns=["timestamp", "zone_id"])
+    frame["zone_id"] = frame["zone_id"].astype("UInt64")
+    return frame
+
+
+def test_alerts_flag_spike_and_update_incrementally(tmp_path: Path) -> None:
+    events = _events(70, spike_day=60)
+    cube = build_cube(events)
+    spike = pd.Timestamp("2024-03-01")
+
+    full = update_alerts(cube, tmp_path, "c5")
+    zone_daily = full["zone_daily"]
+    assert list(zone_daily[["zone_id", "date"]].itertuples(index=False)) == [
+        (22, spike)
+    ]
+    assert zone_daily["expected"].iloc[0] < 10
+    assert (full["zone_hourly"]["hour"] == 8).all()
+    assert spike in set(full["daily"]["date"])
+
+    # Folding the history in two steps gives the same baselines and alerts.
+    head = build_cube(events[events["timestamp"] < "2024-02-20"])
+    incremental = tmp_path / "incremental"
+    update_alerts(head, incremental, "c5")
+    resumed = update_alerts(cube, incremental, "c5")
+    for level, table in full.items():
+        pd.testing.assert_frame_equal(resumed[level], table)
+        np.testing.assert_allclose(
+            np.load(incremental / f"c5_{level}_baseline.npz")["mean"],
+            np.load(tmp_path / f"c5_{level}_baseline.npz")["mean"],
+        )
+
+
+def test_alerts_pick_up_late_rows_and_keep_history(tmp_path: Path) -> None:
+    events = _events(70, spike_day=60)
+    spike = pd.Timestamp("2024-03-01")
+    # The spike's rows arrive one build late (but within the refold window).
+    late = (events["timestamp"].dt.normalize() == spike) & (events["zone_id"] == 22)
+    head = events[~late & (events["timestamp"] < "2024-03-04")]
+    early = update_alerts(build_cube(head), tmp_path, "c5")
+    assert spike not in set(early["zone_daily"]["date"])
+    resumed = update_alerts(build_cube(events), tmp_path, "c5")
+    full = update_alerts(build_cube(events), tmp_path / "full", "c5")
+    for level, table in full.items():
+        pd.testing.assert_frame_equal(resumed[level], table)
+    assert spike in set(resumed["zone_daily"]["date"])
+
+    # Alerts far older than the newest day stay published.
+    later = events.assign(timestamp=events["timestamp"] + pd.Timedelta(days=300))
+    kept = update_alerts(build_cube(pd.concat([events, later])), tmp_path, "c5")
+    assert spike in set(kept["zone_daily"]["date"])
+    assert set(kept) == {"daily", "hourly", "zone_daily", "zone_hourly"}
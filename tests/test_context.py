@@ -0,0 +1,39 @@
+"""Tests for the shared build context."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from mobility_pulse.context import BuildContext
+
+
+def test_context_reads_each_column_once(tmp_path: Path, monkeypatch) -> None:
+    pd.DataFrame({"a": [1, 2], "b": ["x", "y"], "c": [0.5, 1.5]}).to_parquet(
+        tmp_path / "events.parquet"
+    )
+    context = BuildContext(tmp_path)
+    reads: list[list[str]] = []
+    read = context._read
+
+    def _tracking(name: str, columns: list[str]) -> pd.DataFrame:
+        reads.append(list(columns))
+        return read(name, columns)
+
+    monkeypatch.setattr(context, "_read", _tracking)
+
+    assert list(context.frame("events", ["a", "missing"]).columns) == ["a"]
+    assert list(context.frame("events", ["a"]).columns) == ["a"]
+    full = context.frame("events")
+    assert list(full.columns) == ["a", "b", "c"]
+    assert reads == [["a"], ["b", "c"]]
+
+    # Callers may modify their frame without touching the cache.
+    full["a"] = 0
+    assert context.frame("events", ["a"])["a"].tolist() == [1, 2]
+
+    pd.DataFrame({"a": [7]}).to_parquet(tmp_path / "events.parquet")
+    context.invalidate("events")
+    assert context.frame("events")["a"].tolist() == [7]
+    assert context.frame("nothing") is None
@@ -0,0 +1,122 @@
+"""Tests for the incremental download manager."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import ClassVar
+
+import pytest
+
+import mobility_pulse.ingest.download as download_mod
+
+PAYLOAD = b"fecha,hora,latitud,longitud\n" + b"01/01/2024,08:00,19.4,-99.1\n" * 200
+ETAG = '"v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests_seen: ClassVar[list[dict[str, str]]] = []
+
+    def do_GET(self) -> None:
+        headers = {**dict(self.headers), "path": self.path}
+        self.requests_seen.append(headers)
+        if headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body, status = PAYLOAD, 200
+        range_header = headers.get("Range")
+        if range_header and headers.get("If-Range") == ETAG:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            body, status = PAYLOAD[start:], 206
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture()
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _Handler.requests_seen = []
+    yield f"http://127.0.0.1:{server.server_port}/c5.csv"
+    server.shutdown()
+
+
+def test_conditional_get_and_resume(tmp_path: Path, monkeypatch, server_url) -> None:
+    monkeypatch.setattr(download_mod, "RAW_DIR", tmp_path)
+    dest = tmp_path / "c5" / "c5_incidents.csv"
+
+    first = download_mod.download(server_url, dest)
+    assert first.changed and dest.read_bytes() == PAYLOAD
+    entry = download_mod.manifest_entry(dest)
+    assert entry["sha256"] == hashlib.sha256(PAYLOAD).hexdigest()
+    assert entry["etag"] == ETAG and entry["size"] == len(PAYLOAD)
+
+    second = download_mod.download(server_url, dest)
+    assert not second.changed
+    assert _Handler.requests_seen[-1]["If-None-Match"] == ETAG
+
+    # Simulate an interrupted download and resume it.
+    dest.unlink()
+    part = dest.with_name(dest.name + ".part")
+    part.write_bytes(PAYLOAD[:100])
+    part.with_name(part.name + ".json").write_text(
+        json.dumps({"url": server_url, "etag": ETAG}), encoding="utf-8"
+    )
+    resumed = download_mod.download(server_url, dest)
+
+    assert resumed.changed and dest.read_bytes() == PAYLOAD
+    assert resumed.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert _Handler.requests_seen[-1]["Range"] == "bytes=100-"
+    assert not part.exists()
+
+
+def test_download_rows_stops_early(tmp_path: Path, monkeypatch, server_url) -> None:
+    monkeypatch.setattr(download_mod, "RAW_DIR", tmp_path)
+    dest = tmp_path / "ecobici" / "trips.csv"
+
+    result = download_mod.download_rows(server_url, dest, max_rows=5)
+
+    lines = dest.read_bytes().splitlines(keepends=True)
+    assert len(lines) == 6 and b"".join(lines) == PAYLOAD[: len(b"".join(lines))]
+    assert download_mod.manifest_entry(dest)["max_rows"] == 5
+    assert result.sha256 == hashlib.sha256(dest.read_bytes()).hexdigest()
+
+
+def test_ingest_trip_months_dataset(tmp_path: Path, monkeypatch, server_url) -> None:
+    import pandas as pd
+
+    import mobility_pulse.ingest.ecobici_trips as trips_mod
+
+    monkeypatch.setattr(trips_mod, "RAW_DIR", tmp_path)
+    monkeypatch.setenv(
+        "MOBILITY_PULSE_ECOBICI_TRIPS_MONTHLY_URL",
+        server_url.rsplit("/", 1)[0] + "/{upload:%Y/%m}/{month:%Y-%m}.csv",
+    )
+
+    root = trips_mod.ingest_ecobici_trips_months(
+        ["2024-11:2025-01"], limit_rows=50, chunk_rows=20
+    )
+
+    paths = [h["path"] for h in _Handler.requests_seen]
+    assert sorted(paths) == [
+        "/2024/12/2024-11.csv",
+        "/2025/01/2024-12.csv",
+        "/2025/02/2025-01.csv",
+    ]
+    df = pd.read_parquet(root)
+    assert len(df) == 150
+    assert sorted(df["month"].astype(str).unique()) == ["2024-11", "2024-12", "2025-01"]
+
+    trips_mod.ingest_ecobici_trips_months(["2024-12"], limit_rows=50, prune=True)
+    assert sorted(p.name for p in root.iterdir()) == ["month=2024-12"]
@@ -0,0 +1,38 @@
+"""Tests for compact dtype inference."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.transform.dtypes import apply_dtype_plan, infer_dtype_plan
+
+
+def test_infer_and_apply_compact_dtypes() -> None:
+    n = 100
+    df = pd.DataFrame(
+        {
+            "alcaldia": ["Cuauhtemoc", "Coyoacan"] * (n // 2),
+            "folio": [f"F{i}" for i in range(n)],
+            "latitud": np.linspace(19.3, 19.5, n),
+            "lon": [None] * n,
+            "capacity": np.arange(n, dtype="float64"),
+            "count": np.arange(n, dtype="int64") * 1000,
+            "ratio": np.linspace(0, 1, n),
+            "zone_id": pd.array(np.arange(n), dtype="UInt64"),
+            "timestamp": pd.date_range("2024-01-01", periods=n, freq="h"),
+        }
+    )
+
+    plan = infer_dtype_plan(df)
+    out = apply_dtype_plan(df.copy(), plan)
+
+    assert isinstance(out["alcaldia"].dtype, pd.CategoricalDtype)
+    assert not isinstance(out["folio"].dtype, pd.CategoricalDtype)
+    assert out["latitud"].dtype == np.float32
+    assert out["lon"].dtype == np.float32 and out["lon"].isna().all()
+    assert str(out["capacity"].dtype) == "Int8"
+    assert str(out["count"].dtype) == "Int32"
+    assert out["ratio"].dtype == np.float64
+    assert "zone_id" not in plan and "timestamp" not in plan
+    assert out["alcaldia"].tolist() == df["alcaldia"].tolist()
@@ -0,0 +1,136 @@
+"""Tests for the GBFS poller and the delta-encoded station history."""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import mobility_pulse.ingest.ecobici_rt as rt
+from mobility_pulse.transform import standardize
+
+
+def _payload(stations: list[dict], last_updated: int, ttl: int = 60) -> dict:
+    return {"last_updated": last_updated, "ttl": ttl, "data": {"stations": stations}}
+
+
+class _FakeFeed:
+    def __init__(self) -> None:
+        now = int(time.time())
+        self.calls: list[str] = []
+        self.version = now
+        self.bikes = {"1": 3, "2": 0}
+        self.responses = {
+            "http://x/gbfs.json": {
+                "last_updated": now,
+                "ttl": 60,
+                "data": {
+                    "es": {
+                        "feeds": [
+                            {"name": "station_information", "url": "http://x/info"},
+                            {"name": "station_status", "url": "http://x/status"},
+                        ]
+                    }
+                },
+            },
+            "http://x/info": _payload(
+                [
+                    {"station_id": 1, "name": "A", "lat": 19.4, "lon": -99.1},
+                    {"station_id": 2, "name": "B", "lat": 19.5, "lon": -99.2},
+                ],
+                now,
+            ),
+        }
+
+    def __call__(self, url: str) -> dict:
+        self.calls.append(url)
+        if url == "http://x/status":
+            stations = [
+                {
+                    "station_id": sid,
+                    "num_bikes_available": bikes,
+                    "num_docks_available": 10 - bikes,
+                    "is_renting": True,
+                    "last_reported": self.version,
+                }
+                for sid, bikes in self.bikes.items()
+            ]
+            return _payload(stations, self.version)
+        return self.responses[url]
+
+
+def test_poller_stores_only_status_changes(tmp_path: Path, monkeypatch) -> None:
+    feed = _FakeFeed()
+    monkeypatch.setattr(rt, "_fetch_json", feed)
+
+    poller = rt.GbfsPoller("http://x/gbfs.json", tmp_path)
+    assert poller.tick() == 2
+    assert poller.tick() == 0  # nothing changed
+    first_version = feed.version
+    feed.version += 60
+    feed.bikes["1"] = 4
+    assert poller.tick() == 1
+    assert feed.calls.count("http://x/info") == 1
+    assert feed.calls.count("http://x/gbfs.json") == 1
+
+    # A restarted poller reuses the feed cache and the status checkpoint.
+    restarted = rt.GbfsPoller("http://x/gbfs.json", tmp_path)
+    assert restarted.tick() == 0
+    assert feed.calls.count("http://x/info") == 1
+
+    history = restarted.history
+    assert history.compact() == 1
+    assert len(list(history.status_path.rglob("*.parquet"))) == 1
+    series = history.status_series()
+    assert len(series) == 3
+    assert series["name"].notna().all()
+
+    before = history.status_at(pd.Timestamp(first_version + 30, unit="s", tz="UTC"))
+    after = history.status_at(pd.Timestamp(feed.version, unit="s", tz="UTC"))
+    assert before.set_index("station_id")["num_bikes_available"].to_dict() == {
+        "1": 3,
+        "2": 0,
+    }
+    assert after.set_index("station_id")["num_bikes_available"]["1"] == 4
+
+
+def test_legacy_snapshots_are_delta_encoded(tmp_path: Path, monkeypatch) -> None:
+    ticks = pd.date_range("2024-03-01 10:00", periods=3, freq="min", tz="UTC")
+    legacy = pd.DataFrame(
+        [
+            {
+                "station_id": sid,
+                "name": f"S{sid}",
+                "lat": 19.4,
+                "lon": -99.1,
+                "num_bikes_available": 5 if sid == 2 else i,
+                "num_docks_available": 5,
+                "timestamp": ts.isoformat(),
+            }
+            for i, ts in enumerate(ticks)
+            for sid in (1, 2)
+        ]
+    )
+    rt_dir = tmp_path / "raw" / "ecobici" / "rt"
+    parsed = rt_dir / "parsed"
+    parsed.mkdir(parents=True)
+    legacy.to_parquet(parsed / "station_snapshots.parquet", index=False)
+
+    # Builds only read raw data: the import is left to the ingest path.
+    monkeypatch.setattr(standardize, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(standardize, "PROCESSED_DIR", tmp_path / "processed")
+    assert standardize.standardize_ecobici_rt() is None
+    assert (parsed / "station_snapshots.parquet").exists()
+    assert not (rt_dir / "history").exists()
+
+    history = rt.open_station_history(rt_dir)
+
+    assert not (parsed / "station_snapshots.parquet").exists()
+    assert len(history.status_series()) == 4  # 3 runs for station 1, 1 for 2
+    assert len(history.metadata()) == 2
+    snapshot = history.status_at(ticks[1])
+    assert snapshot.set_index("station_id")["num_bikes_available"].to_dict() == {
+        "1": 1,
+        "2": 5,
+    }
@@ -0,0 +1,99 @@
+"""Tests for batched H3 zoning."""
+
+from __future__ import annotations
+
+import h3
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.transform.geo import (
+    add_zone_id,
+    bbox_ring_limit,
+    cells_to_str,
+    grid_ring_distances,
+    latlng_to_cells,
+    latlng_to_cells_chunked,
+    zone_cells,
+)
+
+
+def test_latlng_to_cells_masks_invalid_rows() -> None:
+    lat = np.array([19.432, np.nan, 95.0, 19.41])
+    lon = np.array([-99.133, -99.14, -99.1, -99.11])
+
+    cells = latlng_to_cells(lat, lon, resolution=9)
+
+    assert cells.dtype == np.uint64
+    assert cells[1] == 0 and cells[2] == 0
+    assert h3.int_to_str(int(cells[0])) == h3.latlng_to_cell(19.432, -99.133, 9)
+    assert list(cells_to_str(cells)) == [
+        h3.latlng_to_cell(19.432, -99.133, 9),
+        None,
+        None,
+        h3.latlng_to_cell(19.41, -99.11, 9),
+    ]
+
+
+def test_chunked_matches_single_pass() -> None:
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(19.1, 19.5, 1_000)
+    lon = rng.uniform(-99.3, -99.0, 1_000)
+
+    expected = latlng_to_cells(lat, lon)
+    chunked = latlng_to_cells_chunked(lat, lon, chunk_size=128)
+
+    np.testing.assert_array_equal(chunked, expected)
+
+
+def test_add_zone_id_outputs() -> None:
+    df = pd.DataFrame({"lat": [19.432, None], "lon": [-99.133, -99.14]})
+
+    as_str = add_zone_id(df, output="str")
+    as_int = add_zone_id(df)
+
+    assert as_str["zone_id"].iloc[0] == h3.latlng_to_cell(19.432, -99.133, 9)
+    assert as_str["zone_id"].iloc[1] is None
+    assert str(as_int["zone_id"].dtype) == "UInt64"
+    assert as_int["zone_id"].isna().tolist() == [False, True]
+    assert "zone_id" not in df.columns
+
+
+def test_zone_cells_accepts_legacy_strings() -> None:
+    cell = h3.latlng_to_cell(19.432, -99.133, 9)
+    legacy = pd.Series([cell, None, "zone_a"], dtype=object)
+
+    cells = zone_cells(legacy)
+
+    assert cells.tolist() == [h3.str_to_int(cell), 0, 0]
+
+
+def test_grid_ring_distances_matches_grid_distance() -> None:
+    origin = h3.latlng_to_cell(19.43, -99.13, 9)
+    far = h3.latlng_to_cell(19.36, -99.05, 9)
+    sources = np.array([h3.str_to_int(origin), h3.str_to_int(far)], dtype=np.uint64)
+    targets = [
+        h3.str_to_int(c) for c in h3.grid_disk(origin, 12) + h3.grid_disk(far, 3)
+    ]
+    cells = np.array([*targets, 0], dtype=np.uint64)
+
+    rings = grid_ring_distances(cells, sources)
+
+    expected = [
+        min(h3.grid_distance(h3.int_to_str(c), h3.int_to_str(int(s))) for s in sources)
+        for c in targets
+    ]
+    assert rings[:-1].tolist() == expected
+    assert max(expected) > 6 and rings[-1] == -1
+    capped = grid_ring_distances(cells, sources, max_k=2)
+    assert (capped[:-1] == np.where(np.array(expected) <= 2, expected, -1)).all()
+    assert (grid_ring_distances(cells, np.array([], dtype=np.uint64)) == -1).all()
+
+
+def test_bbox_ring_limit_covers_bbox() -> None:
+    bbox = {"min_lat": 19.3, "min_lon": -99.2, "max_lat": 19.5, "max_lon": -99.0}
+    corners = [
+        h3.latlng_to_cell(bbox["min_lat"], bbox["min_lon"], 9),
+        h3.latlng_to_cell(bbox["max_lat"], bbox["max_lon"], 9),
+    ]
+    limit = bbox_ring_limit(bbox, 9)
+    assert h3.grid_distance(*corners) <= limit < 2 * h3.grid_distance(*corners)
@@ -0,0 +1,61 @@
+"""Tests for streaming GTFS members into typed parquet tables."""
+
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+from mobility_pulse.ingest.gtfs import build_gtfs_tables
+
+
+def _write_feed(path: Path) -> None:
+    members = {
+        "feed/stops.txt": "stop_id,stop_name,stop_lat,stop_lon\n"
+        "S1,Uno,19.43,-99.13\nS2,Dos,19.44,-99.14\n",
+        "feed/trips.txt": "route_id,service_id,trip_id,direction_id\n"
+        "R1,WK,T1,0\nR1,WK,T2,1\n",
+        "feed/stop_times.txt": "trip_id,arrival_time,departure_time,stop_id,"
+        "stop_sequence\n"
+        "T1,08:00:00,08:00:30,S1,1\nT1,08:05:00,08:05:00,S2,2\n"
+        "T2,24:10:00,24:10:00,S2,1\nT2, 24:15:00,24:15:00,S1,2\n",
+        "feed/calendar.txt": "service_id,monday,tuesday,wednesday,thursday,"
+        "friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20240101,20241231\n",
+        "feed/shapes.txt": "shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n",
+    }
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, text in members.items():
+            zf.writestr(name, "\ufeff" + text)  # BOM, as many feeds ship
+
+
+def test_build_gtfs_tables(tmp_path: Path) -> None:
+    zip_path = tmp_path / "gtfs.zip"
+    _write_feed(zip_path)
+    out_dir = tmp_path / "tables"
+
+    counts = build_gtfs_tables(zip_path, out_dir, workers=2, chunk_rows=3)
+
+    assert counts["stop_times"] == 4 and counts["stops"] == 2
+    assert counts["shapes"] == 0 and counts["frequencies"] == 0
+    assert not (out_dir / "shapes.parquet").exists()
+
+    stop_times = pd.read_parquet(out_dir / "stop_times.parquet")
+    assert isinstance(stop_times["trip_id"].dtype, pd.CategoricalDtype)
+    assert str(stop_times["stop_sequence"].dtype) == "Int32"
+    assert sorted(stop_times["arrival_sec"].tolist()) == [
+        28800,
+        29100,
+        87000,
+        87300,
+    ]
+    assert "arrival_time" not in stop_times.columns
+
+    calendar = pd.read_parquet(out_dir / "calendar.parquet")
+    assert calendar.loc[0, "start_date"] == pd.Timestamp("2024-01-01")
+    assert calendar.loc[0, "saturday"] == 0
+
+    stops = pd.read_parquet(out_dir / "stops.parquet")
+    assert stops["stop_lat"].dtype == "float64"
+    assert stops["stop_id"].tolist() == ["S1", "S2"]
@@ -0,0 +1,108 @@
+"""Tests for the transit isochrone router."""
+
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+
+import h3
+import numpy as np
+import pandas as pd
+import pytest
+
+from mobility_pulse.analytics import isochrones
+from mobility_pulse.ingest import gtfs
+
+
+def _centroid(lat: float, lon: float) -> tuple[float, float]:
+    return h3.cell_to_latlng(h3.latlng_to_cell(lat, lon, 9))
+
+
+def _write_feed(path: Path) -> dict[str, tuple[float, float]]:
+    a = _centroid(19.40, -99.13)
+    b = _centroid(19.45, -99.13)
+    b2 = h3.cell_to_latlng(h3.grid_ring(h3.latlng_to_cell(*b, 9), 1)[0])
+    c = _centroid(19.50, -99.20)
+    stops = {"A": a, "B": b, "B2": b2, "C": c}
+    members = {
+        "stops.txt": "stop_id,stop_lat,stop_lon\n"
+        + "".join(f"{k},{lat},{lon}\n" for k, (lat, lon) in stops.items()),
+        "trips.txt": "route_id,service_id,trip_id\nL1,WK,T1\nL2,WK,T2\nL3,WE,W1\n",
+        "stop_times.txt": "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,06:00:00,06:00:00,A,1\nT1,06:10:00,06:10:00,B,2\n"
+        "T2,07:20:00,07:20:00,B2,1\nT2,07:35:00,07:35:00,C,2\n"
+        "W1,07:01:00,07:01:00,A,1\nW1,07:05:00,07:05:00,C,2\n",
+        "frequencies.txt": "trip_id,start_time,end_time,headway_secs\n"
+        "T1,07:00:00,09:00:00,600\n",
+        "calendar.txt": "service_id,monday,tuesday,wednesday,thursday,friday,"
+        "saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20240101,20241231\nWE,0,0,0,0,0,1,1,20240101,20241231\n",
+    }
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, text in members.items():
+            zf.writestr(name, text)
+    return stops
+
+
+def test_transit_travel_times_and_isochrones(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(gtfs, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(isochrones, "ANALYTICS_DIR", tmp_path / "analytics")
+    (tmp_path / "analytics").mkdir()
+    stops = _write_feed(tmp_path / "gtfs.zip")
+    gtfs.build_gtfs_tables(tmp_path / "gtfs.zip", workers=1)
+
+    network = isochrones.load_network()
+    assert network.service_date == pd.Timestamp("2024-01-03")
+    transfers = tmp_path / "analytics" / isochrones.TRANSFERS_FILE
+    assert transfers.exists()
+
+    def _no_walks(*args, **kwargs):
+        raise AssertionError("transfers should come from the persisted table")
+
+    # A second load reuses the persisted footpaths.
+    with monkeypatch.context() as patch:
+        patch.setattr(isochrones, "walk_pairs", _no_walks)
+        again = isochrones.load_network()
+    np.testing.assert_array_equal(again.foot_to, network.foot_to)
+    np.testing.assert_array_equal(again.foot_sec, network.foot_sec)
+    # T1 expands to 12 instances of one hop; the weekend trip is dropped.
+    assert len(network) == 12 + 1
+
+    outputs = isochrones.build_isochrones(windows={"am": ("07:00", "07:10")})
+    times = pd.read_parquet(outputs["transit_travel_times"])
+    cell = {
+        k: h3.str_to_int(h3.latlng_to_cell(lat, lon, 9))
+        for k, (lat, lon) in stops.items()
+    }
+    from_a = times[times["zone_id_o"] == cell["A"]].set_index("zone_id_d")
+    walk_b_b2 = (
+        isochrones.haversine_m(*stops["B"], *stops["B2"])
+        * isochrones.WALK_DETOUR
+        / isochrones.WALK_SPEED_M_MIN
+    )
+
+    assert from_a.loc[cell["A"], "travel_min"] == 0
+    assert from_a.loc[cell["B"], "travel_min"] == 10
+    assert from_a.loc[cell["B2"], "travel_min"] == pytest.approx(
+        10 + walk_b_b2, abs=1 / 60
+    )
+    assert from_a.loc[cell["C"], "travel_min"] == 35
+    assert (times["window"] == "am").all()
+
+    iso = pd.read_parquet(outputs["transit_isochrones"]).set_index("zone_id")
+    counts = iso.loc[cell["A"], ["zones_15", "zones_30", "zones_45"]]
+    assert counts.tolist() == [2, 3, 4]
+
+
+def test_independent_runs_never_chain_connections() -> None:
+    rng = np.random.default_rng(3)
+    dep = np.sort(rng.integers(0, 3600, 5000))
+    arr = dep + rng.choice([0, 30, 60, 120, 300], len(dep))
+    starts = isochrones.independent_runs(dep, arr)
+    assert starts[0] == 0 and (np.diff(starts) > 0).all()
+    for lo, hi in zip(starts, [*starts[1:], len(dep)]):
+        # No connection of a run departs at or after another one arrives.
+        feeds = dep[None, lo:hi] >= arr[lo:hi, None]
+        np.fill_diagonal(feeds, False)
+        assert not feeds.any()
+    assert len(starts) < len(dep) / 3
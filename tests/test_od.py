@@ -0,0 +1,76 @@
+"""Tests for observed origin-destination flows."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import h3
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.analytics import od as od_module
+from mobility_pulse.analytics.od import build_od, coarsen_od, od_counts, top_k_flows
+from mobility_pulse.context import BuildContext
+from mobility_pulse.transform.geo import cells_to_parent, latlng_to_cells
+
+
+def test_od_counts_coarsen_and_top_k() -> None:
+    cells = latlng_to_cells(
+        np.array([19.4326, 19.4200, 19.3500]), np.array([-99.1332, -99.1600, -99.1800])
+    )
+    a, b, c = (int(x) for x in cells)
+    assert len({a, b, c}) == 3
+    origins = pd.array([a, a, a, b, a, None, c], dtype="UInt64")
+    dests = pd.array([b, b, c, a, b, a, c], dtype="UInt64")
+    hours = pd.array([8, 8, 8, 9, None, 8, 18], dtype="Int8")
+
+    od = od_counts(origins, dests, hours)
+
+    assert od["trips"].sum() == 6
+    direct = (
+        pd.DataFrame({"o": origins, "d": dests, "h": hours.fillna(-1)})
+        .dropna(subset=["o", "d"])
+        .groupby(["o", "d", "h"], dropna=False)
+        .size()
+    )
+    got = od.assign(hour=od["hour"].fillna(-1))
+    got = got.set_index(["zone_id_o", "zone_id_d", "hour"])["trips"]
+    assert got.to_dict() == direct.to_dict()
+    assert od["hour"].isna().sum() == 1
+
+    coarse = coarsen_od(od, 5)
+    parents = cells_to_parent(np.array([a, b, c], dtype=np.uint64), 5)
+    assert coarse["trips"].sum() == 6
+    assert set(coarse["zone_id_o"]) <= {int(p) for p in parents}
+    assert all(
+        h3.get_resolution(h3.int_to_str(int(z))) == 5 for z in coarse["zone_id_o"]
+    )
+
+    top = top_k_flows(od, k=1)
+    assert top["zone_id_o"].is_unique
+    first = top.set_index("zone_id_o")
+    assert first.loc[a, "zone_id_d"] == b
+    assert first.loc[a, "trips"] == 3
+
+
+def test_build_od_removes_stale_tables(tmp_path: Path, monkeypatch) -> None:
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    monkeypatch.setattr(od_module, "ANALYTICS_DIR", tmp_path)
+    cells = latlng_to_cells(np.array([19.43, 19.42]), np.array([-99.13, -99.16]))
+    trips = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(["2024-01-01 08:00", "2024-01-01 09:00"]),
+            "zone_id": pd.array(cells, dtype="UInt64"),
+            "zone_id_end": pd.array(cells[::-1], dtype="UInt64"),
+        }
+    )
+    trips.to_parquet(processed / "ecobici_trips.parquet", index=False)
+    outputs = build_od(context=BuildContext(processed))
+    assert outputs and all(path.exists() for path in outputs.values())
+
+    trips.drop(columns="zone_id_end").to_parquet(
+        processed / "ecobici_trips.parquet", index=False
+    )
+    assert build_od(context=BuildContext(processed)) == {}
+    assert not any(path.exists() for path in outputs.values())
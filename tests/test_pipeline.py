@@ -0,0 +1,127 @@
+"""Tests for the build task graph executor."""
+
+from __future__ import annotations
+
+import os
+import time
+from itertools import pairwise
+from pathlib import Path
+
+import pytest
+
+from mobility_pulse.pipeline import (
+    BuildError,
+    Task,
+    build_tasks,
+    run_tasks,
+    task_dependencies,
+)
+
+
+def _copy(src: Path, dest: Path, suffix: str = "") -> None:
+    dest.write_text(src.read_text() + suffix)
+
+
+def _fail() -> None:
+    raise ValueError("boom")
+
+
+def _span(dest: Path) -> None:
+    start = time.monotonic()
+    time.sleep(0.2)
+    dest.write_text(f"{start} {time.monotonic()}")
+
+
+def test_run_tasks_orders_skips_and_reruns(tmp_path: Path) -> None:
+    raw, mid, out = tmp_path / "raw.txt", tmp_path / "mid.txt", tmp_path / "out.txt"
+    raw.write_text("a")
+    state = tmp_path / "state.json"
+    tasks = [
+        Task("second", _copy, (mid,), (out,), {"src": mid, "dest": out}),
+        Task("first", _copy, (raw,), (mid,), {"src": raw, "dest": mid, "suffix": "b"}),
+    ]
+    assert task_dependencies(tasks) == {"first": [], "second": ["first"]}
+
+    status = run_tasks(tasks, workers=2, state_path=state)
+    assert status == {"first": "ran", "second": "ran"}
+    assert out.read_text() == "ab"
+
+    assert set(run_tasks(tasks, workers=2, state_path=state).values()) == {"skipped"}
+
+    out.unlink()
+    status = run_tasks(tasks, workers=2, state_path=state)
+    assert status == {"first": "skipped", "second": "ran"}
+
+    raw.write_text("changed")
+    os.utime(raw, ns=(0, 0))
+    assert run_tasks(tasks, workers=2, state_path=state)["second"] == "ran"
+    assert out.read_text() == "changedb"
+
+
+def test_run_tasks_blocks_dependents_of_failures(tmp_path: Path) -> None:
+    mid, other = tmp_path / "mid.txt", tmp_path / "other.txt"
+    (tmp_path / "raw.txt").write_text("a")
+    tasks = [
+        Task("broken", _fail, (), (mid,)),
+        Task("after", _copy, (mid,), (tmp_path / "out.txt",)),
+        Task(
+            "independent",
+            _copy,
+            (tmp_path / "raw.txt",),
+            (other,),
+            {"src": tmp_path / "raw.txt", "dest": other},
+        ),
+    ]
+    with pytest.raises(BuildError, match="broken"):
+        run_tasks(tasks, workers=2, state_path=tmp_path / "state.json")
+    assert other.read_text() == "a"
+    assert not (tmp_path / "out.txt").exists()
+
+
+def test_run_tasks_runs_heavy_tasks_one_at_a_time(tmp_path: Path) -> None:
+    spans = {name: tmp_path / f"{name}.txt" for name in ("a", "b", "c", "light")}
+    tasks = [
+        Task(name, _span, (), (path,), {"dest": path}, heavy=name != "light")
+        for name, path in spans.items()
+    ]
+    status = run_tasks(tasks, workers=4, state_path=tmp_path / "state.json")
+    assert set(status.values()) == {"ran"}
+
+    times = {
+        name: tuple(map(float, p.read_text().split())) for name, p in spans.items()
+    }
+    heavy = sorted(times[name] for name in ("a", "b", "c"))
+    assert all(end <= start for (_, end), (start, _) in pairwise(heavy))
+    # The light task ran beside the first heavy one.
+    assert times["light"][0] < heavy[0][1]
+
+
+def test_task_graph_rejects_cycles_and_shared_outputs(tmp_path: Path) -> None:
+    a, b = tmp_path / "a", tmp_path / "b"
+    with pytest.raises(BuildError, match="cycle"):
+        task_dependencies([Task("x", _fail, (a,), (b,)), Task("y", _fail, (b,), (a,))])
+    with pytest.raises(BuildError, match="same path"):
+        task_dependencies([Task("x", _fail, (), (a,)), Task("y", _fail, (), (a,))])
+
+
+def test_build_graph_runs_trips_after_station_status() -> None:
+    deps = task_dependencies(build_tasks(isochrones=True))
+    assert deps["standardize_ecobici_trips"] == ["standardize_ecobici_rt"]
+    assert deps["standardize_c5"] == []
+    assert "standardize_ecobici_trips" in deps["analytics"]
+    assert deps["isochrones"] == ["analytics"]
+
+
+def test_build_graph_declares_every_analytics_table() -> None:
+    tasks = {task.name: task for task in build_tasks(isochrones=True)}
+    outputs = {path.name for path in tasks["analytics"].outputs}
+    assert {
+        "c5_hourly_r7.parquet",
+        "c5_alerts_zone_hourly.parquet",
+        "c5_kpi_cube.parquet",
+        "ecobici_od_top.parquet",
+        "gps_like_zone_hour.parquet",
+        "impact_zones.parquet",
+    } <= outputs
+    assert not outputs & {path.name for path in tasks["isochrones"].outputs}
+    assert tasks["analytics"].heavy and not tasks["standardize_gtfs"].heavy
@@ -0,0 +1,47 @@
+"""Tests for the PPI scoring engine."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from mobility_pulse.analytics.ppi import PPI_COMPONENTS, score_ppi, weight_matrix
+from mobility_pulse.config import ConfigError, PPIConfig, load_ppi_config
+
+
+def _zscore(values: np.ndarray) -> np.ndarray:
+    std = values.std()
+    return (values - values.mean()) / std if std else np.zeros_like(values)
+
+
+def test_score_ppi_matches_per_combination_formula() -> None:
+    rng = np.random.default_rng(5)
+    counts = rng.integers(0, 20, size=(2, 50, len(PPI_COMPONENTS))).astype(float)
+    counts[1, :, 2] = 3.0  # constant component in one window
+    config = PPIConfig(
+        windows={"all": None, "last_30d": 30},
+        weight_sets={
+            "default": {"incidents": 0.7, "gtfs_stops": 0.3},
+            "combined": {"incidents": 0.6, "gtfs_stops": 0.2, "ecobici_trips": 0.2},
+        },
+    )
+
+    zscores, ppi = score_ppi(counts, weight_matrix(config))
+
+    assert ppi.shape == (2, 2, 50)
+    for w in range(2):
+        z = [_zscore(counts[w, :, k]) for k in range(len(PPI_COMPONENTS))]
+        np.testing.assert_allclose(ppi[w, 0], 0.7 * z[0] + 0.3 * z[1])
+        np.testing.assert_allclose(ppi[w, 1], 0.6 * z[0] + 0.2 * z[1] + 0.2 * z[2])
+    assert not zscores[1, :, 2].any()
+
+
+def test_ppi_config_validation() -> None:
+    config = load_ppi_config()
+    assert "default" in config.weight_sets
+    assert weight_matrix(config).shape == (
+        len(config.weight_sets),
+        len(PPI_COMPONENTS),
+    )
+    with pytest.raises(ConfigError):
+        weight_matrix(PPIConfig(windows={"all": None}, weight_sets={"x": {"bad": 1}}))
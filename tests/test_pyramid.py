@@ -0,0 +1,51 @@
+"""Tests for multi-resolution zone roll-ups."""
+
+from __future__ import annotations
+
+import h3
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.analytics.pyramid import coarsen_zones, zone_pyramid
+from mobility_pulse.transform.geo import cells_to_parent, latlng_to_cells
+
+
+def test_cells_to_parent_matches_h3() -> None:
+    rng = np.random.default_rng(3)
+    cells = latlng_to_cells(
+        rng.uniform(19.3, 19.5, 200), rng.uniform(-99.2, -99.0, 200)
+    )
+    cells[::20] = 0
+    parents = cells_to_parent(cells, 6)
+    expected = [
+        0
+        if cell == 0
+        else h3.str_to_int(h3.cell_to_parent(h3.int_to_str(int(cell)), 6))
+        for cell in cells
+    ]
+    assert parents.tolist() == expected
+    assert (cells_to_parent(parents, 8) == parents).all()
+
+
+def test_pyramid_levels_match_direct_coarsening() -> None:
+    rng = np.random.default_rng(4)
+    cells = latlng_to_cells(
+        rng.uniform(19.3, 19.5, 500), rng.uniform(-99.2, -99.0, 500)
+    )
+    table = pd.DataFrame(
+        {
+            "zone_id": pd.array(cells, dtype="UInt64"),
+            "hour": rng.integers(0, 3, 500),
+            "count": rng.integers(1, 5, 500),
+        }
+    )
+    table.loc[::50, "zone_id"] = pd.NA
+
+    levels = dict(zone_pyramid(table, resolutions=(6, 8)))
+
+    assert list(levels) == [8, 6]
+    for res, level in levels.items():
+        assert level["count"].sum() == table["count"].sum()
+        direct = coarsen_zones(table, res)
+        pd.testing.assert_frame_equal(level, direct)
+        assert level["zone_id"].isna().any()
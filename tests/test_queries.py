@@ -0,0 +1,167 @@
+"""Tests for the dashboard query layer."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.analytics.cube import build_cube, kpi_cube
+from mobility_pulse.app.queries import (
+    dataset_summary,
+    filter_alerts,
+    kpi_summary,
+    load_events,
+    zone_growth,
+)
+from mobility_pulse.storage import DatasetWriter
+
+
+def _events(n: int = 2000) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    ts = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        rng.integers(0, 120 * 24 * 60, n), unit="min"
+    )
+    df = pd.DataFrame(
+        {
+            "timestamp": ts,
+            "zone_id": pd.array(rng.integers(1, 50, n), dtype="UInt64"),
+            "lat": rng.uniform(19.3, 19.5, n),
+            "extra": "x",
+        }
+    )
+    df.loc[::50, "timestamp"] = pd.NaT
+    df.loc[::7, "lat"] = np.nan
+    return df
+
+
+def _mask(df, date_range, hours, days) -> pd.DataFrame:
+    ts = df["timestamp"]
+    mask = (ts >= date_range[0]) & (ts < date_range[1] + pd.Timedelta(days=1))
+    mask &= ts.dt.hour.isin(hours) & ts.dt.day_name().isin(days)
+    return df[mask]
+
+
+def test_load_events_matches_in_memory_filters(tmp_path: Path) -> None:
+    df = _events()
+    single = tmp_path / "single.parquet"
+    df.to_parquet(single, index=False, row_group_size=100)
+    partitioned = tmp_path / "partitioned.parquet"
+    with DatasetWriter(partitioned, partition_cols=["month"]) as writer:
+        writer.write(
+            df.assign(month=df["timestamp"].dt.strftime("%Y-%m").fillna("unknown"))
+        )
+
+    date_range = (pd.Timestamp("2024-02-01"), pd.Timestamp("2024-03-15"))
+    hours, days = (7, 8, 18), ("Lunes", "Friday")
+    expected = _mask(df, date_range, hours, ("Monday", "Friday"))
+    expected = expected.sort_values(["timestamp", "zone_id"], ignore_index=True)
+    for path in (single, partitioned):
+        got = load_events(path, date_range, hours, days, ["timestamp", "zone_id"])
+        assert list(got.columns) == ["timestamp", "zone_id"]
+        got = got.sort_values(["timestamp", "zone_id"], ignore_index=True)
+        pd.testing.assert_frame_equal(
+            got, expected[["timestamp", "zone_id"]], check_dtype=False
+        )
+
+    day = pd.Timestamp("2024-02-14")
+    one_day = load_events(partitioned, (day, day), columns=["timestamp"])
+    assert len(one_day) == (df["timestamp"].dt.normalize() == day).sum() > 0
+
+    summary = dataset_summary(single, ["timestamp", "lat", "missing"])
+    assert summary["rows"] == len(df)
+    assert summary["start"] == df["timestamp"].min()
+    assert summary["end"] == df["timestamp"].max()
+    assert summary["nulls"] == {
+        "timestamp": df["timestamp"].isna().sum(),
+        "lat": df["lat"].isna().sum(),
+    }
+    assert dataset_summary(partitioned, ["month"])["nulls"] == {"month": 0}
+    assert dataset_summary(tmp_path / "absent.parquet") is None
+
+
+def test_kpi_summary_matches_raw_events() -> None:
+    df = _events(5000)
+    cube = kpi_cube(build_cube(df))
+    assert cube["count"].sum() == df["timestamp"].notna().sum()
+
+    start, end = pd.Timestamp("2024-02-01"), pd.Timestamp("2024-03-01")
+    hours, days = (7, 8, 18, 19), ("Lunes", "Friday", "Sábado")
+    ts = df["timestamp"]
+    keep = ts.dt.hour.isin(hours) & ts.dt.day_name().isin(
+        ["Monday", "Friday", "Saturday"]
+    )
+    stop = end + pd.Timedelta(days=1)
+    current = ts[keep & (ts >= start) & (ts < stop)]
+    previous = ts[keep & (ts >= start - (stop - start)) & (ts < start)]
+
+    got = kpi_summary(cube, (start, end), hours, days)
+    assert got["conteo"] == len(current)
+    assert got["delta"] == (len(current) - len(previous)) / len(previous)
+    assert got["peak_hour"] == current.dt.hour.value_counts().idxmax()
+    assert got["peak_day"] == current.dt.day_name().value_counts().idxmax()
+
+    # A single selected day covers that whole day, as in load_events.
+    day = pd.Timestamp("2024-02-14")
+    same_day = ts[ts.dt.normalize() == day]
+    assert len(same_day) > 0
+    assert kpi_summary(cube, (day, day))["conteo"] == len(same_day)
+
+    early = (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-02-01"))
+    assert kpi_summary(cube, early) == {
+        "conteo": 0,
+        "delta": None,
+        "peak_hour": None,
+        "peak_day": None,
+    }
+
+
+def test_zone_growth_and_alert_filters_match_raw_events() -> None:
+    df = _events(20000)
+    start, end = pd.Timestamp("2024-01-10"), pd.Timestamp("2024-03-01")
+    hours, days = tuple(range(6, 20)), ("Lunes", "Martes", "Friday")
+    cube = kpi_cube(build_cube(df))
+
+    ts = df["timestamp"]
+    keep = (ts >= start) & (ts < end + pd.Timedelta(days=1)) & ts.dt.hour.isin(hours)
+    keep &= ts.dt.day_name().isin(["Monday", "Tuesday", "Friday"])
+    daily = (
+        df[keep].groupby([ts[keep].dt.normalize(), "zone_id"]).size().rename("n")
+    ).reset_index()
+    last = daily["timestamp"].max()
+    age = (last - daily["timestamp"]).dt.days
+    expected = (
+        pd.DataFrame(
+            {
+                "last7": daily["n"].where(age < 7, 0),
+                "prev7": daily["n"].where((age >= 7) & (age < 14), 0),
+                "zone_id": daily["zone_id"],
+            }
+        )
+        .groupby("zone_id")[["last7", "prev7"]]
+        .sum()
+    )
+    expected = expected[(expected["last7"] > 0) | (expected["prev7"] > 0)]
+
+    growth = zone_growth(cube, (start, end), hours, days).set_index("zone_id")
+    pd.testing.assert_frame_equal(
+        growth[["last7", "prev7"]].sort_index(),
+        expected.sort_index(),
+        check_dtype=False,
+    )
+    assert growth["delta_pct"].is_monotonic_decreasing
+    assert zone_growth(cube, (start, start + pd.Timedelta(days=5))).empty
+
+    alerts = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2024-01-08", "2024-01-09", "2024-01-12"] * 2),
+            "hour": [7, 7, 7, 3, 3, 3],
+            "count": 10,
+        }
+    )
+    got = filter_alerts(alerts, (start - pd.Timedelta(days=2), end), hours, days)
+    assert got["date"].dt.day_name().tolist() == ["Monday", "Tuesday", "Friday"]
+    assert (got["hour"] == 7).all()
+    daily_alerts = alerts.drop(columns="hour")
+    assert len(filter_alerts(daily_alerts, (start, end), hours, days)) == 2
@@ -4,11 +4,11 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import h3
 import pandas as pd
 
-import mobility_pulse.analytics.aggregates as aggregates
-import mobility_pulse.analytics.ppi as ppi
-import mobility_pulse.validate.quality_report as quality_report
+from mobility_pulse.analytics import aggregates, ppi, zones
+from mobility_pulse.validate import quality_report
 
 
 def _write_parquet(path: Path, df: pd.DataFrame) -> None:
@@ -23,17 +23,19 @@ def test_build_analytics_and_ppi(tmp_path: Path, monkeypatch) -> None:
 
     monkeypatch.setattr(aggregates, "PROCESSED_DIR", processed)
     monkeypatch.setattr(aggregates, "ANALYTICS_DIR", analytics)
+    monkeypatch.setattr(zones, "ANALYTICS_DIR", analytics)
     monkeypatch.setattr(ppi, "PROCESSED_DIR", processed)
     monkeypatch.setattr(ppi, "ANALYTICS_DIR", analytics)
     monkeypatch.setattr(quality_report, "PROCESSED_DIR", processed)
     monkeypatch.setattr(quality_report, "REPORTS_DIR", reports)
 
+    zone_a = h3.str_to_int(h3.latlng_to_cell(19.4, -99.1, 9))
     c5_df = pd.DataFrame(
         {
             "timestamp": pd.to_datetime(["2024-01-01 08:00", "2024-01-01 09:00"]),
             "lat": [19.4, 19.41],
             "lon": [-99.1, -99.11],
-            "zone_id": ["zone_a", "zone_a"],
+            "zone_id": pd.array([zone_a, zone_a], dtype="UInt64"),
             "source": ["c5", "c5"],
         }
     )
@@ -41,18 +43,64 @@ def test_build_analytics_and_ppi(tmp_path: Path, monkeypatch) -> None:
         {
             "lat": [19.4],
             "lon": [-99.1],
-            "zone_id": ["zone_a"],
+            "zone_id": pd.array([zone_a], dtype="UInt64"),
             "source": ["gtfs"],
         }
     )
 
     _write_parquet(processed / "c5_incidents.parquet", c5_df)
     _write_parquet(processed / "gtfs_stops.parquet", gtfs_df)
+    # Flows from an earlier build with trips must not outlive it.
+    _write_parquet(analytics / "gps_like_od.parquet", pd.DataFrame({"flow": [1]}))
 
-    aggregates.build_analytics()
+    outputs = aggregates.build_analytics()
     ppi_path = ppi.build_ppi()
     report_path = quality_report.generate_report()
 
     assert (analytics / "c5_hourly.parquet").exists()
+    assert (analytics / "zone_metadata.parquet").exists()
+    assert (analytics / "zone_geometry.parquet").exists()
+    assert not (analytics / "gps_like_od.parquet").exists()
+    assert set(outputs.values()) <= set(aggregates.analytics_outputs())
+    kpi = pd.read_parquet(analytics / "c5_kpi_cube.parquet")
+    assert list(kpi.columns) == ["date", "hour", "weekday", "zone_id", "count"]
+    assert kpi["count"].sum() == 2
     assert ppi_path is not None and ppi_path.exists()
+    scores = pd.read_parquet(ppi_path)
+    assert set(scores["exposure_source"]) == {"gtfs_stops"}
+    assert scores["exposure"].tolist() == scores["gtfs_stops"].tolist() == [1]
+    assert scores["exposure_z"].tolist() == [0.0]
     assert report_path.exists()
+
+
+def test_accessibility_skips_zones_outside_bbox(tmp_path: Path, monkeypatch) -> None:
+    processed = tmp_path / "processed"
+    analytics = tmp_path / "analytics"
+    monkeypatch.setattr(aggregates, "PROCESSED_DIR", processed)
+    monkeypatch.setattr(aggregates, "ANALYTICS_DIR", analytics)
+    monkeypatch.setattr(zones, "ANALYTICS_DIR", analytics)
+
+    stop = h3.str_to_int(h3.latlng_to_cell(19.43, -99.13, 9))
+    near = h3.str_to_int(h3.latlng_to_cell(19.44, -99.14, 9))
+    # Guadalajara and Null Island: bad coordinates that used to stall the BFS.
+    far = [
+        h3.str_to_int(h3.latlng_to_cell(lat, lon, 9))
+        for lat, lon in ((20.67, -103.35), (0.0, 0.0))
+    ]
+    c5_df = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(["2024-01-01 08:00"] * 3),
+            "zone_id": pd.array([near, *far], dtype="UInt64"),
+        }
+    )
+    stops_df = pd.DataFrame({"zone_id": pd.array([stop], dtype="UInt64")})
+    _write_parquet(processed / "c5_incidents.parquet", c5_df)
+    _write_parquet(processed / "gtfs_stops.parquet", stops_df)
+
+    aggregates.build_analytics()
+
+    access = pd.read_parquet(analytics / "accessibility_zones.parquet")
+    rings = dict(zip(access["zone_id"].astype("uint64"), access["nearest_stop_ring"]))
+    near_ring = h3.grid_distance(h3.int_to_str(stop), h3.int_to_str(near))
+    assert rings[stop] == 0 and rings[near] == near_ring
+    assert rings[far[0]] == rings[far[1]] == near_ring + 1
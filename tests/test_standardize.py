@@ -0,0 +1,127 @@
+"""Tests for standardization transforms."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from mobility_pulse.transform import geo, standardize, stations
+
+
+def _write_c5_csv(raw: Path) -> None:
+    (raw / "c5").mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(
+        {
+            "folio": [f"C5/{i}" for i in range(7)],
+            "fecha_creacion": [
+                "01/01/2024",
+                "02/01/2024",
+                "13/01/2024",
+                "01/02/2024",
+                "15/02/2024",
+                "29/02/2024",
+                None,
+            ],
+            "hora_creacion": ["08:00:00"] * 6 + [None],
+            "latitud": [19.40, 19.41, None, 19.42, 19.43, 19.44, 19.45],
+            "longitud": [-99.10, -99.11, -99.12, -99.13, -99.14, -99.15, -99.16],
+        }
+    ).to_csv(raw / "c5" / "c5_incidents.csv", index=False)
+
+
+def test_standardize_c5_streaming_matches_single_pass(
+    tmp_path: Path, monkeypatch
+) -> None:
+    raw = tmp_path / "raw"
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    monkeypatch.setattr(standardize, "RAW_DIR", raw)
+    monkeypatch.setattr(standardize, "PROCESSED_DIR", processed)
+    _write_c5_csv(raw)
+
+    single = pd.read_parquet(standardize.standardize_c5())
+    out_path = standardize.standardize_c5(chunk_rows=2)
+    streamed = pd.read_parquet(out_path).sort_values("folio", ignore_index=True)
+
+    assert out_path.is_dir()
+    assert sorted(p.name for p in out_path.iterdir()) == [
+        "month=2024-01",
+        "month=2024-02",
+        "month=unknown",
+    ]
+    assert streamed["timestamp"].tolist() == single["timestamp"].tolist()
+    assert streamed["timestamp"].iloc[2] == pd.Timestamp("2024-01-13 08:00")
+    assert (
+        streamed["zone_id"]
+        .astype("Float64")
+        .equals(single["zone_id"].astype("Float64"))
+    )
+
+
+def test_standardize_trips_uses_station_index(tmp_path: Path, monkeypatch) -> None:
+    raw = tmp_path / "raw"
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    monkeypatch.setattr(standardize, "RAW_DIR", raw)
+    monkeypatch.setattr(standardize, "PROCESSED_DIR", processed)
+    monkeypatch.setattr(stations, "RAW_DIR", raw)
+    monkeypatch.setattr(stations, "PROCESSED_DIR", processed)
+
+    pd.DataFrame(
+        {
+            "station_id": ["27", "31", "27"],
+            "lat": [19.40, 19.50, 19.41],
+            "lon": [-99.10, -99.20, -99.11],
+        }
+    ).to_parquet(processed / "ecobici_rt.parquet", index=False)
+    (raw / "ecobici" / "trips").mkdir(parents=True)
+    pd.DataFrame(
+        {
+            "Ciclo_Estacion_Retiro": [27, 31, 99],
+            "Fecha_Retiro": ["01/01/2024"] * 3,
+            "Hora_Retiro": ["08:00:00"] * 3,
+            "Ciclo_EstacionArribo": [31.0, None, 27.0],
+            "Fecha_Arribo": ["01/01/2024"] * 3,
+            "Hora_Arribo": ["08:20:00"] * 3,
+        }
+    ).to_csv(raw / "ecobici" / "trips" / "ecobici_trips.csv", index=False)
+
+    trips = pd.read_parquet(standardize.standardize_ecobici_trips())
+
+    assert not {"start_lat", "end_lat_x", "end_lat_y"} & set(trips.columns)
+    assert trips["lat"].tolist()[:2] == pytest.approx([19.41, 19.50])
+    assert pd.isna(trips["lat"].iloc[2])
+    assert trips["end_lon"].tolist()[0] == pytest.approx(-99.20)
+    expected = geo.latlng_to_cells([19.41, 19.50], [-99.11, -99.20])
+    assert trips["zone_id"].iloc[:2].astype("uint64").tolist() == expected.tolist()
+    assert trips["zone_id"].isna().tolist() == [False, False, True]
+    assert trips["zone_id_end"].isna().tolist() == [False, True, False]
+    assert trips["zone_id_end"].iloc[2] == expected[0]
+
+
+def test_standardize_trips_reads_newest_raw_source(tmp_path: Path, monkeypatch) -> None:
+    raw = tmp_path / "raw" / "ecobici" / "trips"
+    monkeypatch.setattr(standardize, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(standardize, "PROCESSED_DIR", tmp_path / "processed")
+    monkeypatch.setattr(stations, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(stations, "PROCESSED_DIR", tmp_path / "processed")
+    (tmp_path / "processed").mkdir()
+    trip = {
+        "Ciclo_Estacion_Retiro": "27",
+        "Fecha_Retiro": "01/02/2024",
+        "Hora_Retiro": "08:00:00",
+    }
+    part = raw / "ecobici_trips.parquet" / "month=2024-02" / "part-0.parquet"
+    part.parent.mkdir(parents=True)
+    pd.DataFrame([trip]).to_parquet(part, index=False)
+    csv = raw / "ecobici_trips.csv"
+    pd.DataFrame([trip] * 3).to_csv(csv, index=False)
+
+    os.utime(part, ns=(0, 0))
+    assert len(pd.read_parquet(standardize.standardize_ecobici_trips())) == 3
+    os.utime(csv, ns=(0, 0))
+    os.utime(part, ns=(10**9, 10**9))
+    assert len(pd.read_parquet(standardize.standardize_ecobici_trips())) == 1
@@ -0,0 +1,36 @@
+"""Tests for the shared parquet dataset helpers."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from mobility_pulse.storage import DatasetWriter
+
+
+def test_dataset_writer_accepts_values_after_all_null_first_chunk(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "events.parquet"
+    with DatasetWriter(path, partition_cols=["month"]) as writer:
+        writer.write(
+            pd.DataFrame(
+                {
+                    "month": ["2024-01", "2024-01"],
+                    "comentario": pd.Series([None, None], dtype=object),
+                }
+            )
+        )
+        writer.write(
+            pd.DataFrame(
+                {
+                    "month": ["2024-02", "2024-02"],
+                    "comentario": pd.Series(["choque", None], dtype=object),
+                }
+            )
+        )
+
+    out = pd.read_parquet(path).sort_values("month", kind="stable")
+    assert out["comentario"].isna().tolist() == [True, True, False, True]
+    assert out["comentario"].iloc[2] == "choque"
@@ -0,0 +1,63 @@
+"""Tests for the dashboard's shared table cache."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.app.cache import TableCache, _copy_on_write
+
+
+def test_table_cache_shares_reloads_and_evicts(tmp_path: Path) -> None:
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"t{i}.parquet"
+        pd.DataFrame({"x": np.arange(1000) + i}).to_parquet(path)
+        paths.append(path)
+    loads: list[Path] = []
+
+    def _loader(path: Path):
+        def _load() -> pd.DataFrame:
+            loads.append(path)
+            return pd.read_parquet(path)
+
+        return _load
+
+    one_table = 1000 * 8 + 200
+    cache = TableCache(max_bytes=2 * one_table)
+    first = cache.get([paths[0]], _loader(paths[0]))
+    again = cache.get([paths[0]], _loader(paths[0]))
+    assert loads == [paths[0]]
+    assert (
+        np.shares_memory(first["x"].to_numpy(), again["x"].to_numpy())
+        == _copy_on_write()
+    )
+
+    # Sessions modify their own copy only, in place or not.
+    first.loc[1, "x"] = -1
+    first["x"] = 0
+    first["y"] = 1
+    assert cache.get([paths[0]], _loader(paths[0]))["x"].iloc[1] == 1
+    assert list(cache.get([paths[0]], _loader(paths[0])).columns) == ["x"]
+
+    # A rewritten file is reloaded; other entries stay.
+    cache.get([paths[1]], _loader(paths[1]))
+    pd.DataFrame({"x": np.full(1000, 7)}).to_parquet(paths[0])
+    os.utime(paths[0], ns=(1, 1))
+    assert cache.get([paths[0]], _loader(paths[0]))["x"].iloc[0] == 7
+    cache.get([paths[1]], _loader(paths[1]))
+    assert loads == [paths[0], paths[1], paths[0]]
+
+    # Over budget the least recently used entry goes.
+    cache.get([paths[2]], _loader(paths[2]))
+    assert cache.nbytes <= cache.max_bytes
+    cache.get([paths[0]], _loader(paths[0]))
+    cache.get([paths[1]], _loader(paths[1]))
+    assert loads[-1] == paths[1]
+
+    tiny = TableCache(max_bytes=10)
+    tiny.get([paths[2]], _loader(paths[2]))
+    assert len(tiny) == 0
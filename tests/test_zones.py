@@ -0,0 +1,113 @@
+"""Tests for the precomputed zone metadata table."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import h3
+import numpy as np
+import pandas as pd
+
+from mobility_pulse.analytics.zones import ZoneGeometry, zone_geometry, zone_metadata
+from mobility_pulse.config import H3_PYRAMID_RESOLUTIONS
+from mobility_pulse.transform.geo import cells_to_parent, latlng_to_cells
+
+
+def test_zone_metadata_matches_grouped_mode() -> None:
+    rng = np.random.default_rng(5)
+    n = 3000
+    lat = rng.uniform(19.40, 19.44, n)
+    lon = rng.uniform(-99.16, -99.12, n)
+    incidents = pd.DataFrame(
+        {
+            "zone_id": pd.array(latlng_to_cells(lat, lon), dtype="UInt64"),
+            "alcaldia_catalogo": pd.Categorical(
+                rng.choice(["Cuauhtémoc", "Benito Juárez", None], n)
+            ),
+            "colonia_catalogo": rng.choice(["Roma", "Condesa", "Juárez"], n),
+            "lat": lat,
+            "lon": lon,
+        }
+    )
+    incidents.loc[::11, "zone_id"] = pd.NA
+    stops = pd.DataFrame(
+        {
+            "zone_id": pd.array(latlng_to_cells([19.30], [-99.20]), dtype="UInt64"),
+            "lat": [19.30],
+            "lon": [-99.20],
+        }
+    )
+
+    meta = zone_metadata([incidents, stops, None]).set_index("zone_id")
+
+    def _mode(x: pd.Series):
+        modes = x.mode()
+        return modes.iloc[0] if len(modes) else None
+
+    combined = pd.concat([incidents, stops], ignore_index=True)
+    expected = combined.dropna(subset=["zone_id"]).groupby("zone_id")
+    expected = expected.agg(
+        alcaldia=("alcaldia_catalogo", _mode),
+        colonia=("colonia_catalogo", _mode),
+        lat=("lat", "mean"),
+        lon=("lon", "mean"),
+    )
+    assert meta.index.is_unique and len(meta) == len(expected)
+    for label in ("alcaldia", "colonia"):
+        assert meta[label].dtype == "string"
+        got = meta[label].astype(object).where(meta[label].notna(), None)
+        want = expected[label].astype(object).where(expected[label].notna(), None)
+        assert got.to_dict() == want.reindex(meta.index).to_dict()
+    np.testing.assert_allclose(meta["lat"], expected["lat"].reindex(meta.index))
+    np.testing.assert_allclose(meta["lon"], expected["lon"].reindex(meta.index))
+
+    stop_zone = int(stops["zone_id"].iloc[0])
+    assert meta.loc[stop_zone, "alcaldia"] is pd.NA or pd.isna(
+        meta.loc[stop_zone, "alcaldia"]
+    )
+    for res in H3_PYRAMID_RESOLUTIONS:
+        parents = cells_to_parent(meta.index.to_numpy(dtype=np.uint64), res)
+        assert (meta[f"zone_id_r{res}"].to_numpy(dtype=np.uint64) == parents).all()
+
+
+def test_zone_geometry_lookup_matches_h3(tmp_path: Path) -> None:
+    rng = np.random.default_rng(7)
+    cells = latlng_to_cells(
+        rng.uniform(19.3, 19.5, 500), rng.uniform(-99.2, -99.0, 500)
+    )
+    trips = pd.DataFrame(
+        {
+            "zone_id": pd.array(cells[:250], dtype="UInt64"),
+            "zone_id_end": pd.array(cells[250:], dtype="UInt64"),
+        }
+    )
+    path = tmp_path / "zone_geometry.parquet"
+    zone_geometry([trips, None]).write(path)
+    geometry = ZoneGeometry.read(path)
+    assert len(geometry) == len(np.unique(cells)) + sum(
+        len(np.unique(cells_to_parent(cells, res))) for res in H3_PYRAMID_RESOLUTIONS
+    )
+
+    parent = cells_to_parent(cells[:1], H3_PYRAMID_RESOLUTIONS[-1])[0]
+    unknown = np.uint64(h3.str_to_int(h3.latlng_to_cell(40.4, -3.7, 9)))
+    query = np.array([cells[3], 0, unknown, parent, cells[3]], dtype=np.uint64)
+    lat, lon = geometry.centers(query)
+    for i in (0, 3, 4):
+        np.testing.assert_allclose(
+            (lat[i], lon[i]), h3.cell_to_latlng(h3.int_to_str(int(query[i])))
+        )
+    assert np.isnan(lat[[1, 2]]).all() and np.isnan(lon[[1, 2]]).all()
+
+    rings = geometry.boundaries(query)
+    assert rings[1] is None and rings[2] is None
+    for i in (0, 3):
+        expected = [
+            (lng, la) for la, lng in h3.cell_to_boundary(h3.int_to_str(int(query[i])))
+        ]
+        np.testing.assert_allclose(rings[i], [*expected, expected[0]])
+    np.testing.assert_array_equal(rings[0], rings[4])
+
+    assert geometry.boundaries(np.empty(0, dtype=np.uint64)) == []
+    assert geometry.boundaries(query[[1, 2, 2]]) == [None, None, None]
+    empty = ZoneGeometry.from_cells(np.empty(0, dtype=np.uint64))
+    assert empty.boundaries(query[:2]) == [None, None]